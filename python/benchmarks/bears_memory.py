@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""Peak memory of a typical map build: new_cases -> per_capita -> cmap_ranked_df
+
+Builds a synthetic county-level `Bears` (3,200 regions by one year of days,
+by default) so the benchmark runs offline, then reports the peak resident set
+size and the peak traced allocation of the derivation chain.
+
+Usage::
+
+  cd python
+  python -m benchmarks.bears_memory [--regions 3200] [--days 365]
+"""
+import argparse
+import resource
+import sys
+import tracemalloc
+import numpy as np
+import pandas as pd
+from fp_covid19.data.bears import Bears, copy_on_write_enabled
+from fp_covid19.cases.compute import new_cases, per_capita
+from fp_covid19.visualization.folium_helper import cmap_ranked_df
+
+
+class _SyntheticBears(Bears):
+  """Offline stand-in for `JhuCsse` county data"""
+
+
+def _synthetic_counties(regions: int, days: int):
+  rng = np.random.default_rng(0)
+  dates = pd.date_range('2020-01-22', periods=days)
+  dataframe = pd.DataFrame(
+      np.cumsum(rng.poisson(5, (regions, days)), axis=1),
+      columns=['{}/{}/{}'.format(d.month, d.day, d.year) for d in dates],
+      index=pd.Index(np.arange(regions) + 84000000, name='UID'))
+  for position, (label, column) in enumerate([
+      ('FIPS', (np.arange(regions) + 1000).astype(str)),
+      ('Admin2', ['County {}'.format(i) for i in range(regions)]),
+      ('Province_State', ['State {}'.format(i % 50) for i in range(regions)]),
+      ('Combined_Key', ['County {}, US'.format(i) for i in range(regions)])]):
+    dataframe.insert(position, label, column)
+  population = pd.Series(
+      rng.integers(1000, 1000000, regions), index=dataframe.index)
+  return _SyntheticBears(dataframe=dataframe), population
+
+
+def _max_rss_mib() -> float:
+  scale = 1 if sys.platform == 'darwin' else 1024 # bytes vs. KiB
+  return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+  parser.add_argument('--regions', type=int, default=3200)
+  parser.add_argument('--days', type=int, default=365)
+  args = parser.parse_args()
+
+  counties, population = _synthetic_counties(args.regions, args.days)
+  counts_mib = counties.df[counties.datetime_index].memory_usage().sum() / 2**20
+  rss_before = _max_rss_mib()
+  tracemalloc.start()
+  cmap_ranked_df(per_capita(new_cases(counties), population))
+  _, traced_peak = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  print('Pandas {}, copy-on-write: {}'.format(
+      pd.__version__, copy_on_write_enabled()))
+  print('Count matrix: {:.1f} MiB ({} regions x {} days)'.format(
+      counts_mib, args.regions, args.days))
+  print('Peak traced allocation of the chain: {:.1f} MiB ({:.1f}x)'.format(
+      traced_peak / 2**20, traced_peak / 2**20 / counts_mib))
+  print('Peak RSS: {:.1f} MiB before, {:.1f} MiB after'.format(
+      rss_before, _max_rss_mib()))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""Runs the nightly build: `python -m fp_covid19 [stage ...]`
+
+Examples:
+  cd python
+  python -m fp_covid19                     # everything, mostly from caches
+  python -m fp_covid19 render_maps         # only what the maps need
+  python -m fp_covid19 --force fetch_cases --source jhu_csse
+  python -m fp_covid19 --list
+"""
+import argparse
+import sys
+import time
+from fp_covid19.pipeline import (
+    DEFAULT_CONFIG, NIGHTLY_STAGES, SOURCES, Pipeline, format_timings)
+from fp_covid19.visualization.classify import METHODS
+
+
+def main(argv=None) -> int:
+  parser = argparse.ArgumentParser(
+      prog='python -m fp_covid19', description=__doc__.split('\n')[0],
+      formatter_class=argparse.RawDescriptionHelpFormatter,
+      epilog='\n'.join(__doc__.split('\n')[2:]))
+  parser.add_argument(
+      'targets', nargs='*', metavar='stage',
+      help='Stages to build with their dependencies (default: all)')
+  parser.add_argument('--source', choices=sorted(SOURCES),
+                      default=DEFAULT_CONFIG['source'])
+  parser.add_argument('--cache-dir', default=DEFAULT_CONFIG['cache_dir'])
+  parser.add_argument('--out-dir', default=DEFAULT_CONFIG['out_dir'])
+  parser.add_argument('--offline', action='store_true',
+                      help='Reuse downloaded files without checking for '
+                      'updates')
+  parser.add_argument('--jobs', type=int, default=DEFAULT_CONFIG['jobs'],
+                      help='Maximum number of concurrent stages')
+  parser.add_argument('--periods', type=int,
+                      default=DEFAULT_CONFIG['periods'],
+                      help='Days of new cases per data point')
+  parser.add_argument('--horizon', type=int,
+                      default=DEFAULT_CONFIG['horizon'],
+                      help='Days to project new cases ahead')
+  parser.add_argument('--bins', choices=['ranked'] + METHODS,
+                      default=DEFAULT_CONFIG['bins'],
+                      help='Map colors by daily rank or by global class '
+                      'breaks')
+  parser.add_argument('--force', action='append', default=[],
+                      metavar='stage',
+                      help='Rerun this stage even if cached; repeatable')
+  parser.add_argument('--list', action='store_true',
+                      help='List the stages and their dependencies')
+  args = parser.parse_args(argv)
+
+  if args.list:
+    for stage in NIGHTLY_STAGES:
+      print('{:<16} <- {}'.format(stage.name, ', '.join(stage.deps) or '-'))
+    return 0
+  config = dict(
+      DEFAULT_CONFIG, source=args.source, cache_dir=args.cache_dir,
+      out_dir=args.out_dir, offline=args.offline, jobs=args.jobs,
+      periods=args.periods, horizon=args.horizon, bins=args.bins)
+  pipeline = Pipeline(NIGHTLY_STAGES, config=config)
+  start = time.perf_counter()
+  results = pipeline.run(targets=args.targets or None, force=args.force)
+  print(format_timings(results, time.perf_counter() - start))
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
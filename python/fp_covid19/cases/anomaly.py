@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""Module for detecting reporting dumps and backlog spikes
+
+A backlog dump, e.g. a state reporting weeks of deaths in one day, shows up
+as a daily count far above the recent median. A correction shows up as a
+negative daily count. This module scores every region and day at once
+against rolling robust statistics (median and median absolute deviation) of
+the trailing window on the region-by-day matrix.
+"""
+from __future__ import annotations
+from typing import Dict
+import numpy as np
+import pandas as pd
+from fp_covid19.data.bears import Bears
+
+MAD_TO_STD = 1.4826
+"""Scales the median absolute deviation to a standard deviation for normally
+   distributed data"""
+
+
+def trailing_windows(values: np.ndarray, window: int) -> np.ndarray:
+  """Stacks the `window` days preceding every day, excluding the day itself.
+
+  Args:
+    values (np.ndarray): Region-by-day `float` matrix
+    window (int): Number of trailing days
+
+  Returns:
+    np.ndarray:
+    A read-only view of shape `values.shape + (window,)`. Days before the
+    first one are `NaN`.
+  """
+  padded = np.concatenate(
+      [np.full((values.shape[0], window), np.nan), values], axis=1)
+  return np.lib.stride_tricks.sliding_window_view(
+      padded[:, :-1], window, axis=1)
+
+
+def _nanmedian_last_axis(windows: np.ndarray) -> np.ndarray:
+  """`np.nanmedian(windows, axis=-1)` for many short windows.
+
+  `np.nanmedian` falls back to a Python loop over the windows when they
+  contain `NaN`. Sorting moves `NaN` to the end of every window, so the
+  median is the middle of the first `count` sorted values.
+  """
+  ordered = np.sort(windows, axis=-1)
+  count = np.isfinite(ordered).sum(axis=-1, keepdims=True)
+  lower = np.take_along_axis(
+      ordered, np.maximum((count - 1) // 2, 0), axis=-1)[..., 0]
+  upper = np.take_along_axis(ordered, count // 2 - (count == 0), axis=-1)
+  median = (lower + upper[..., 0]) / 2
+  median[count[..., 0] == 0] = np.nan
+  return median
+
+
+def rolling_median_mad(values: np.ndarray, window: int, min_periods: int):
+  """Computes trailing medians and median absolute deviations for all rows.
+
+  Args:
+    values (np.ndarray): Region-by-day `float` matrix
+    window (int): Number of trailing days, excluding the current day
+    min_periods (int): Minimum number of non-`NaN` trailing days. Fewer
+      yields `NaN` statistics.
+
+  Returns:
+    Tuple[np.ndarray, np.ndarray]:
+    `(median, mad)`, each the shape of `values`
+  """
+  windows = trailing_windows(values, window)
+  valid = np.isfinite(windows).sum(axis=-1) >= min_periods
+  median = _nanmedian_last_axis(windows)
+  mad = _nanmedian_last_axis(np.abs(windows - median[..., np.newaxis]))
+  median[~valid], mad[~valid] = np.nan, np.nan
+  return median, mad
+
+
+def _redistribute(
+    daily: np.ndarray, excess: np.ndarray, window: int) -> np.ndarray:
+  """Moves `excess` from each day evenly onto its trailing `window` days.
+
+  The share that day :math:`t` sends to each of the days
+  :math:`[\\max(0, t - w), t - 1]` is :math:`e_t / \\min(t, w)`. Summed over
+  :math:`t`, the days receiving mass from day :math:`t` form a moving window,
+  so the whole transfer is one cumulative sum along the date axis.
+  """
+  num_days = daily.shape[1]
+  recipients = np.minimum(np.arange(num_days), window)
+  share = np.divide(
+      excess, recipients, out=np.zeros_like(excess), where=recipients > 0)
+  # Day 0 has nowhere to send its excess
+  excess = np.where(recipients > 0, excess, 0.)
+  cumsum = np.concatenate(
+      [np.zeros((daily.shape[0], 1)), np.cumsum(share, axis=1)], axis=1)
+  upper = np.minimum(np.arange(num_days) + window, num_days - 1) + 1
+  received = cumsum[:, upper] - cumsum[:, 1:]
+  return daily - excess + received
+
+
+def detect_anomalies(
+    bears: Bears,
+    window: int = 14,
+    threshold: float = 10.,
+    min_excess: float = 10.,
+    min_periods: int = 7,
+    cumulative: bool = True,
+    redistribute: bool = False) -> Dict:
+  """Flags backlog spikes and negative corrections in every region.
+
+  A day is a spike if its daily count exceeds the trailing median by more
+  than `threshold` scaled median absolute deviations and by at least
+  `min_excess` cases. A day is a negative correction if its daily count is
+  negative.
+
+  Args:
+    bears (Bears): Time-series of cumulative counts, e.g. from
+      `get_covid19_us_bears()`, or daily counts if `cumulative` is `False`
+    window (int): Number of trailing days for the robust statistics
+    threshold (float): Robust z-score above which a day is a spike
+    min_excess (float): Minimum number of cases above the trailing median
+      for a spike. Also the floor of the scaled deviation, which keeps
+      regions with flat, all-zero windows from flagging every small blip.
+    min_periods (int): Minimum number of trailing days needed to flag a day
+    cumulative (bool): `True` if `bears` holds cumulative counts. Missing
+      (`NaN`) totals carry the last reported total forward, so the new
+      cases of a missing day count on the next reported day.
+    redistribute (bool): Also returns a `Bears` in which the excess of each
+      spike (count minus median) and the mass of each negative correction
+      are spread evenly over the preceding `window` days. The total over all
+      days is unchanged.
+
+  Returns:
+    Dict:
+    ::
+
+    {'flags': pd.DataFrame, 'adjusted': Bears}
+
+    * `flags` has one row per flagged region and day, sorted by region then
+      date, with the columns `<bears.df.index.name>`, `date`, `kind`
+      (`'spike'` or `'negative'`), `value`, `median`, `mad`, and `score`.
+    * `adjusted` is a `Bears` of the same type and form (cumulative or not)
+      as `bears`, or `None` if `redistribute` is `False`. Days missing in
+      `bears` stay `NaN`.
+  """
+  datetime_index = bears.datetime_index
+  values = bears.df[datetime_index].to_numpy(dtype=float)
+  missing = np.isnan(values)
+  if cumulative:
+    # A NaN total would otherwise blank every later day of the cumsum
+    filled = pd.DataFrame(values).ffill(axis='columns').fillna(0.)
+    daily = np.diff(filled.to_numpy(), axis=1, prepend=0.)
+  else:
+    daily = values.copy()
+
+  median, mad = rolling_median_mad(daily, window, min_periods)
+  excess = daily - median
+  with np.errstate(invalid='ignore', divide='ignore'):
+    score = excess / np.fmax(MAD_TO_STD * mad, min_excess)
+    spike = (score > threshold) & (excess >= min_excess)
+  negative = daily < 0
+  flagged = spike | negative
+
+  rows, cols = np.nonzero(flagged)
+  index_name = bears.df.index.name or 'index'
+  flags = pd.DataFrame({
+      index_name: bears.df.index.to_numpy()[rows],
+      'date': np.asarray(datetime_index, dtype=object)[cols],
+      'kind': np.where(negative[rows, cols], 'negative', 'spike'),
+      'value': daily[rows, cols],
+      'median': median[rows, cols],
+      'mad': mad[rows, cols],
+      'score': score[rows, cols]})
+
+  adjusted = None
+  if redistribute:
+    moved = np.zeros_like(daily)
+    moved[spike & ~negative] = excess[spike & ~negative]
+    moved[negative] = daily[negative]
+    adjusted_values = _redistribute(daily, moved, window)
+    if cumulative:
+      adjusted_values = np.cumsum(adjusted_values, axis=1)
+      adjusted_values[missing] = np.nan
+    adjusted = bears.derive(adjusted_values)
+  return {'flags': flags, 'adjusted': adjusted}
@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
 """Module for computing cases"""
 from typing import Dict, List
-from time import strptime, mktime
+from calendar import timegm
+from datetime import timezone
+from time import strptime
 from dateutil.parser import parse
 import numpy as np
 import pandas as pd
@@ -55,14 +57,113 @@ def new_cases(bears: Bears, periods=1) -> Bears:
     The difference time-series :math:`y[n] = x[n] - x[n - p]`
   """
   assert len(bears.datetime_index) > 1
-  new_df, datetime_index = bears.df.copy(), bears.datetime_index
-  new_df[datetime_index] = (
+  datetime_index = bears.datetime_index
+  return bears.derive(
       bears.df[datetime_index].diff(periods=periods, axis='columns'))
-  return type(bears)(dataframe=new_df)
+
+class PopulationNormalizer:
+  """Scales `Bears` by population with a precomputed row alignment.
+
+  `per_capita()` used to realign the population to the rows of every
+  `Bears` it scaled. This class aligns once, stores the reciprocal
+  population as a vector, and scales a region-by-day matrix with one
+  broadcast multiply. Reuse one normalizer for every `Bears` with the same
+  rows, e.g. confirmed and deaths from the same loader. Rows are matched by
+  their `FIPS` column if they have one, since the USAFacts loader indexes
+  counties by position, and by the row index otherwise.
+
+  Examples:
+    >>> population = get_us_population()
+    >>> counties = covid19['confirmed']['counties']
+    >>> normalizer = PopulationNormalizer(
+    ...     population['counties']['Population'], counties)
+    >>> confirmed_per_100k = normalizer.apply(counties, per=100000)
+    >>> deaths_per_100k = normalizer.apply(
+    ...     covid19['deaths']['counties'], per=100000)
+
+  Args:
+    population (pd.Series): Population indexed like the `Bears` rows, for
+      instance, `get_us_population()['counties']['Population']`. A
+      `pd.DataFrame` must have a `Population` column.
+    bears (Bears or pd.Index): The `Bears` (or its row index) to align to
+  """
+  def __init__(self, population, bears):
+    if isinstance(population, pd.DataFrame):
+      population = population['Population']
+    if isinstance(bears, pd.Index):
+      self.index, self.key_col = bears, None
+    else:
+      self.index = bears.df.index
+      self.key_col = 'FIPS' if 'FIPS' in bears.df.columns else None
+    self.keys = self._keys(bears)
+    """Row keys that `apply()` checks: the FIPS codes or the row index"""
+    aligned = population.reindex(self.index).to_numpy(dtype=float)
+    self.valid = np.isfinite(aligned) & (aligned > 0)
+    """`True` for rows with a known, positive population"""
+    self.reciprocal = np.divide(
+        1., aligned, out=np.zeros_like(aligned), where=self.valid)
+    self._factors = {}
+
+  def _keys(self, bears) -> pd.Index:
+    if isinstance(bears, pd.Index):
+      return bears
+    if self.key_col is None:
+      return bears.df.index
+    return pd.Index(bears.df[self.key_col])
+
+  def factor(self, per: float = 1., dtype=np.float64) -> np.ndarray:
+    """Returns the cached column vector `per / population` in `dtype`"""
+    key = (per, np.dtype(dtype))
+    if key not in self._factors:
+      self._factors[key] = (self.reciprocal * per).astype(dtype)[:, np.newaxis]
+    return self._factors[key]
+
+  def apply(
+      self,
+      bears: Bears,
+      per: float = 1.,
+      dtype=np.float64,
+      inplace: bool = False,
+      drop_invalid: bool = True) -> Bears:
+    """Scales every date column of `bears` by `per / population`.
+
+    Args:
+      bears (Bears): Time-series with the rows, in the same order, this
+        normalizer was built with
+      per (float): Population unit, e.g. `1` for per capita and `100000`
+        for per 100k
+      dtype: Output `dtype`, e.g. `np.float32` to halve the memory
+      inplace (bool): Replace the dataframe of `bears` with the scaled one
+        and return `bears` instead of a new object. The scaled values are a
+        new matrix either way, so other references to the old dataframe
+        keep the unscaled values.
+      drop_invalid (bool): Drop rows with unknown or zero population
+
+    Returns:
+      Bears:
+      Per-capita :py:class:`Bears` time-series
+    """
+    keys = self._keys(bears)
+    assert keys is self.keys or keys.equals(self.keys), (
+        'Rows of the Bears do not match the rows of the normalizer')
+    datetime_index = bears.datetime_index
+    values = bears.df[datetime_index].to_numpy(dtype=dtype, copy=True)
+    np.multiply(values, self.factor(per, dtype), out=values)
+    scaled = bears.derive(values)
+    if drop_invalid and not self.valid.all():
+      scaled.df = scaled.df[self.valid]
+    if inplace:
+      bears.df = scaled.df
+      return bears
+    return scaled
+
 
 def per_capita(bears: Bears, population: pd.DataFrame) -> Bears:
   """Computes per-capita cases.
 
+  Drops rows with unknown or zero population. To scale several `Bears`
+  with the same rows, build one :py:class:`PopulationNormalizer` instead.
+
   Args:
     bears (Bears): `Bears` time-series
     population (pd.DataFrame): Population dataframe with only one column,
@@ -72,22 +173,58 @@ def per_capita(bears: Bears, population: pd.DataFrame) -> Bears:
     Bears
     Per-capita :py:class:`Bears` time-series
   """
-  per_capita_b = bears.copy(deep=True)
-  per_capita_b.df.loc[:, bears.datetime_index] = (
-      bears.df.loc[:, bears.datetime_index].truediv(population, axis='index'))
-  per_capita_b.df = per_capita_b.df[
-      ~per_capita_b.df.isin([np.nan, np.inf, -np.inf]).any(1)]
-  return per_capita_b
+  return PopulationNormalizer(population, bears).apply(bears)
 
 
 def assert_all_not_na(dataframe, col=None):
-  """Asserts all fields in a col are not N/A."""
-  notna_bool = (dataframe.notna().all() if col is None
+  """Asserts all fields in a col are not N/A.
+
+  See :py:func:`fp_covid19.data.validation.validate` to check every column
+  and date at once.
+  """
+  notna_bool = (dataframe.notna().all(axis='columns') if col is None
                 else dataframe[col].notna())
   assert notna_bool.all(), (
-      'Found N/A cells in column {}: {}'.format(
-          col, dataframe[not notna_bool] if col
-          else dataframe[dataframe.notna()]))
+      'Found {} rows with N/A cells in column {}, e.g.\n{}'.format(
+          (~notna_bool).sum(), col, dataframe[~notna_bool].head(3)))
+
+
+def rollup_df(
+    dataframe: pd.DataFrame,
+    sum_col_index: List[str],
+    index: str) -> pd.DataFrame:
+  """Sums rows that share a key in one grouped array reduction.
+
+  Sorts the rows by group once and calls `np.add.reduceat` over the whole
+  `sum_col_index` block, instead of grouping column by column. Like
+  `pd.pivot_table(..., aggfunc='sum')`, `NaN` counts as zero and rows whose
+  key is `NaN` are dropped.
+
+  Args:
+    dataframe: Fine-grained `DataFrame`, e.g. counties or provinces
+    sum_col_index (`[str]`): List of columns to be summed in parallel. The
+      output keeps this column order.
+    index: Column label of the group key. Becomes the output row index.
+
+  Returns:
+    pd.DataFrame:
+    Group sums indexed by the sorted unique keys in `index`
+  """
+  codes, groups = pd.factorize(dataframe[index], sort=True)
+  values = dataframe[sum_col_index].to_numpy()
+  if values.dtype.kind == 'f':
+    values = np.nan_to_num(values, nan=0.)
+  keep = codes >= 0
+  codes, values = codes[keep], values[keep]
+  order = np.argsort(codes, kind='stable')
+  codes, values = codes[order], values[order]
+  if len(codes):
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    sums = np.add.reduceat(values, starts, axis=0)
+  else:
+    sums = np.zeros((0, len(sum_col_index)), dtype=values.dtype)
+  return pd.DataFrame(
+      sums, index=pd.Index(groups, name=index), columns=sum_col_index)
 
 
 def counties2states_df(
@@ -99,24 +236,23 @@ def counties2states_df(
   Args:
     counties_df: County-level `DataFrame`
     sum_col_index (`[str]`): List of columns to be summed in parallel.
-      Pandas' `pivot_table()` may reorder columns, so this function calls
-      `reindex()` to preserve column order in `sum_col_index`.
+      The output preserves the column order in `sum_col_index`.
     index: Output `DataFrame` row index as a string
 
   Returns:
     pd.DataFrame:
     States dataframe pivot table
   """
-  return pd.pivot_table(
-      counties_df.loc[:, [index] + sum_col_index],
-      index=index,
-      values=sum_col_index,
-      aggfunc='sum').reindex(sum_col_index, axis=1)
+  return rollup_df(counties_df, sum_col_index, index=index)
 
 
 def to_epoch(date_str: str, date_format: str = None) -> int:
   """Converts string to datetime to POSIX time.
 
+  Dates without a time zone are UTC, regardless of the local time zone. To
+  convert a whole `datetime_index`, use `bears.date_axis.epochs` or
+  :py:func:`fp_covid19.data.date_axis.to_epochs` instead.
+
   Args:
     date_str (str): Date as a string
     date_format (str): Date format, e.g. `%m/%d/%y`. If `None`, uses
@@ -126,5 +262,9 @@ def to_epoch(date_str: str, date_format: str = None) -> int:
     int:
     POSIX time, a.k.a. seconds since the Epoch, Unix time, and Epoch time
   """
-  return int(mktime(strptime(date_str, date_format)) if date_format
-             else parse(date_str).timestamp())
+  if date_format:
+    return timegm(strptime(date_str, date_format))
+  date_time = parse(date_str)
+  if date_time.tzinfo is None:
+    date_time = date_time.replace(tzinfo=timezone.utc)
+  return int(date_time.timestamp())
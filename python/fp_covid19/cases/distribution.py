@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""Module for cross-sectional summaries of all regions, day by day
+
+National overview charts show, for every day, how the county values are
+distributed: quantiles, means, and how many counties exceed alert levels.
+Instead of one `pd.Series.describe()` per date column, every statistic is a
+reduction along the region axis of the whole region-by-day matrix, and
+quantiles come from one `np.partition` of that matrix.
+
+Examples:
+  >>> scaled = per_capita(new_cases(counties, periods=7), population)
+  >>> weights = population['counties']['Population']
+  >>> summary = summarize(scaled, weights=weights, thresholds=[100, 500])
+  >>> summary[['p50', 'weighted_mean', 'above_100']].plot()
+  >>> summary = update_summary(summary, tomorrows_scaled, weights=weights,
+  ...                          thresholds=[100, 500])
+"""
+from __future__ import annotations
+from typing import List, Sequence
+import numpy as np
+import pandas as pd
+from fp_covid19.data.bears import Bears
+
+DEFAULT_QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+"""Quantiles of :py:func:`summarize`"""
+MAX_PARTITION_KTH = 64
+"""Sort instead of partitioning if the quantiles need more order statistics"""
+
+
+def quantile_label(quantile: float) -> str:
+  """Column label of a quantile, e.g. `'p50'` for 0.5"""
+  return 'p{:g}'.format(quantile * 100)
+
+
+def nan_quantiles(
+    values: np.ndarray, quantiles: Sequence[float]) -> np.ndarray:
+  """Quantiles of every column, ignoring `NaN`, like `np.nanquantile`.
+
+  `NaN` is moved past the largest value, so the valid values of a column
+  with `c` of them are its first `c` order statistics. The positions that
+  the quantiles interpolate between depend only on `c`, which is the same
+  for most days, so one `np.partition` with those positions as `kth`
+  replaces a full sort.
+
+  Args:
+    values (np.ndarray): Region-by-day matrix
+    quantiles (Sequence[float]): Quantiles between 0 and 1
+
+  Returns:
+    np.ndarray:
+    `(len(quantiles), num_days)` linearly interpolated quantiles, `NaN` for
+    days without values
+  """
+  quantiles = np.asarray(quantiles, dtype=float)
+  if len(values) == 0:
+    return np.full((len(quantiles), values.shape[1]), np.nan)
+  filled = np.where(np.isnan(values), np.inf, values)
+  counts = np.count_nonzero(~np.isnan(values), axis=0)
+  positions = quantiles[:, np.newaxis] * np.maximum(counts - 1, 0)
+  lower = np.floor(positions).astype(np.intp)
+  upper = np.minimum(lower + 1, np.maximum(counts - 1, 0))
+  kth = np.unique(np.concatenate([lower.ravel(), upper.ravel()]))
+  if len(kth) > MAX_PARTITION_KTH:
+    ordered = np.sort(filled, axis=0)
+  else:
+    ordered = np.partition(filled, kth, axis=0)
+  below = np.take_along_axis(ordered, lower, axis=0)
+  above = np.take_along_axis(ordered, upper, axis=0)
+  with np.errstate(invalid='ignore'):
+    result = below + (positions - lower) * (above - below)
+  result[:, counts == 0] = np.nan
+  return result
+
+
+def summarize(
+    bears: Bears,
+    weights: pd.Series = None,
+    quantiles: Sequence[float] = DEFAULT_QUANTILES,
+    thresholds: Sequence[float] = (),
+    datetime_index: List[str] = None) -> pd.DataFrame:
+  """Summarizes the regions of every day.
+
+  Args:
+    bears (Bears): Region-by-day values, e.g. per-capita new cases
+    weights (pd.Series): Weights indexed like the `Bears` rows, e.g.
+      `get_us_population()['counties']['Population']`. Rows without a
+      positive weight are left out of `weighted_mean`.
+    quantiles (Sequence[float]): Quantiles between 0 and 1
+    thresholds (Sequence[float]): Values to count regions above
+    datetime_index (List[str]): Date labels to summarize. Defaults to all
+      dates.
+
+  Returns:
+    pd.DataFrame:
+    One row per date label and the columns `count` (regions with a value),
+    `mean`, `weighted_mean` (if `weights` is given), `min`, one column per
+    quantile (see :py:func:`quantile_label`), `max`, and `above_<threshold>`
+    (regions whose value exceeds the threshold)
+  """
+  if datetime_index is None:
+    datetime_index = bears.datetime_index
+  values = bears.df[datetime_index].to_numpy(dtype=float)
+  valid = ~np.isnan(values)
+  counts = valid.sum(axis=0)
+  zeroed = np.where(valid, values, 0.)
+  columns = {'count': counts}
+  with np.errstate(invalid='ignore', divide='ignore'):
+    columns['mean'] = zeroed.sum(axis=0) / counts
+    if weights is not None:
+      aligned = weights.reindex(bears.df.index).to_numpy(dtype=float)
+      aligned = np.where(np.isfinite(aligned) & (aligned > 0), aligned, 0.)
+      columns['weighted_mean'] = (
+          (aligned @ zeroed) / (aligned @ valid))
+  columns['min'] = np.where(valid, values, np.inf).min(axis=0, initial=np.inf)
+  columns['max'] = np.where(valid, values, -np.inf).max(
+      axis=0, initial=-np.inf)
+  for name in ['min', 'max']:
+    columns[name] = np.where(counts > 0, columns[name], np.nan)
+  for quantile, row in zip(quantiles, nan_quantiles(values, quantiles)):
+    columns[quantile_label(quantile)] = row
+  for threshold in thresholds:
+    columns['above_{:g}'.format(threshold)] = (
+        np.where(valid, values, -np.inf) > threshold).sum(axis=0)
+  order = (['count', 'mean']
+           + (['weighted_mean'] if weights is not None else []) + ['min']
+           + [quantile_label(quantile) for quantile in quantiles]
+           + ['max'] + ['above_{:g}'.format(t) for t in thresholds])
+  return pd.DataFrame(
+      {name: columns[name] for name in order},
+      index=pd.Index(datetime_index, name='date'))
+
+
+def update_summary(
+    summary: pd.DataFrame,
+    bears: Bears,
+    weights: pd.Series = None,
+    quantiles: Sequence[float] = DEFAULT_QUANTILES,
+    thresholds: Sequence[float] = (),
+    revise: int = 0) -> pd.DataFrame:
+  """Summarizes only the dates of `bears` that `summary` lacks.
+
+  Args:
+    summary (pd.DataFrame): Earlier output of :py:func:`summarize` with the
+      same `weights`, `quantiles`, and `thresholds`
+    bears (Bears): Region-by-day values, including the new dates
+    weights (pd.Series): As in :py:func:`summarize`
+    quantiles (Sequence[float]): As in :py:func:`summarize`
+    thresholds (Sequence[float]): As in :py:func:`summarize`
+    revise (int): Also recomputes this many of the latest summarized dates,
+      e.g. to pick up data revisions of the last week
+
+  Returns:
+    pd.DataFrame:
+    The summary of every date of `bears`, in its date order
+  """
+  datetime_index = bears.datetime_index
+  known = set(summary.index[:len(summary.index) - revise])
+  new = [date for date in datetime_index if date not in known]
+  if not new:
+    return summary.reindex(datetime_index)
+  recent = summarize(
+      bears, weights=weights, quantiles=quantiles, thresholds=thresholds,
+      datetime_index=new)
+  kept = summary[summary.index.isin(known)]
+  return pd.concat([kept, recent]).reindex(datetime_index)
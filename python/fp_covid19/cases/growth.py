@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""Module for estimating growth rates and reproduction numbers
+
+Every estimator here works on the whole region-by-day matrix of new cases,
+e.g. from :py:func:`fp_covid19.cases.compute.new_cases`, at once instead of
+fitting one series at a time.
+"""
+from __future__ import annotations
+from typing import Dict, Tuple
+import math
+import numpy as np
+from fp_covid19.data.bears import Bears
+
+
+def _daily_counts(bears: Bears) -> np.ndarray:
+  """New-case matrix with `NaN` and negative corrections set to zero"""
+  values = bears.df[bears.datetime_index].to_numpy(dtype=float)
+  return np.clip(np.nan_to_num(values, nan=0.), 0., None)
+
+
+def serial_interval_kernel(
+    mean: float = 4.7, std: float = 2.9, max_days: int = 20) -> np.ndarray:
+  """Discretizes a gamma-distributed serial interval.
+
+  The defaults are the estimates of Nishiura, Linton, and Akhmetzhanov,
+  "Serial interval of novel coronavirus (COVID-19) infections" (2020).
+
+  Args:
+    mean (float): Mean serial interval in days
+    std (float): Standard deviation of the serial interval in days
+    max_days (int): Length of the kernel
+
+  Returns:
+    np.ndarray:
+    Weights :math:`w_1, \\dots, w_S` for lags of 1 to `max_days` days,
+    summing to one
+  """
+  shape, scale = (mean/std)**2, std**2/mean
+  days = np.arange(1, max_days + 1, dtype=float)
+  log_pdf = ((shape - 1) * np.log(days) - days/scale
+             - math.lgamma(shape) - shape * math.log(scale))
+  kernel = np.exp(log_pdf)
+  return kernel / kernel.sum()
+
+
+def infection_pressure(counts: np.ndarray, kernel: np.ndarray) -> np.ndarray:
+  """Convolves every row with the serial-interval kernel along the date axis.
+
+  Computes :math:`\\Lambda_t = \\sum_{s=1}^{S} w_s I_{t-s}` for all regions
+  and days with one tensor contraction over a sliding-window view.
+
+  Args:
+    counts (np.ndarray): Region-by-day new cases :math:`I_t`
+    kernel (np.ndarray): Weights :math:`w_1, \\dots, w_S`
+
+  Returns:
+    np.ndarray:
+    :math:`\\Lambda_t`, the shape of `counts`. Days before the first one
+    count as zero cases.
+  """
+  lags = len(kernel)
+  padded = np.concatenate(
+      [np.zeros((counts.shape[0], lags)), counts], axis=1)
+  windows = np.lib.stride_tricks.sliding_window_view(
+      padded[:, :-1], lags, axis=1)
+  # windows[..., -1] is the previous day, i.e. lag 1
+  return windows @ kernel[::-1]
+
+
+def _linear_fit(log_counts: np.ndarray) -> Tuple[np.ndarray, ...]:
+  """Least-squares lines through the last axis of `log_counts`.
+
+  The days are centered, so the slope and the intercept are independent
+  contractions with fixed weights, for any number of leading axes.
+
+  Returns:
+    Tuple[np.ndarray, ...]:
+    `(days, intercept, slope, residual_std)`: the centered days of the
+    window, and per line the mean, the slope, and the residual standard
+    error with `window - 2` degrees of freedom
+  """
+  window = log_counts.shape[-1]
+  days = np.arange(window, dtype=float) - (window - 1)/2
+  slope = log_counts @ (days/(days @ days))
+  intercept = log_counts.mean(axis=-1)
+  residuals = (log_counts - intercept[..., np.newaxis]
+               - slope[..., np.newaxis] * days)
+  residual_std = np.sqrt((residuals**2).sum(axis=-1) / (window - 2))
+  return days, intercept, slope, residual_std
+
+
+def growth_rates(
+    bears: Bears, window: int = 7, z: float = 1.96) -> Dict[str, Bears]:
+  """Estimates daily exponential growth rates for all regions.
+
+  Fits :math:`\\log(1 + I_t) = a + r t` by least squares over the `window`
+  days ending on each day. The days within a window are the same for every
+  fit, so the slope and its standard error are closed-form contractions of
+  the sliding-window view with fixed weights.
+
+  Args:
+    bears (Bears): New cases, e.g. from `new_cases()`
+    window (int): Number of days per fit
+    z (float): Normal quantile of the confidence bounds, e.g. 1.96 for 95%
+
+  Returns:
+    Dict[str, Bears]:
+    ::
+
+    {'growth_rate': Bears, 'lower': Bears, 'upper': Bears,
+     'doubling_time': Bears}
+
+    Growth rates per day. The first `window - 1` days are `NaN`.
+    `doubling_time` is :math:`\\log 2 / r` in days, `NaN` where
+    :math:`r \\le 0`.
+  """
+  num_days = len(bears.datetime_index)
+  assert 2 < window <= num_days, (
+      'Need between 3 and {} days per fit'.format(num_days))
+  log_counts = np.log1p(_daily_counts(bears))
+  windows = np.lib.stride_tricks.sliding_window_view(
+      log_counts, window, axis=1)
+  days, _, slope, residual_std = _linear_fit(windows)
+  std_err = residual_std / np.sqrt(days @ days)
+
+  pad = np.full((log_counts.shape[0], window - 1), np.nan)
+  def _padded(values):
+    return np.concatenate([pad, values], axis=1)
+  rate = _padded(slope)
+  with np.errstate(divide='ignore', invalid='ignore'):
+    doubling_time = np.where(rate > 0, np.log(2)/rate, np.nan)
+  return {
+      'growth_rate': bears.derive(rate),
+      'lower': bears.derive(_padded(slope - z*std_err)),
+      'upper': bears.derive(_padded(slope + z*std_err)),
+      'doubling_time': bears.derive(doubling_time)}
+
+
+def _gamma_quantile(
+    shape: np.ndarray, scale: np.ndarray, z: float) -> np.ndarray:
+  """Wilson-Hilferty approximation of gamma quantiles"""
+  return shape * scale * (1 - 1/(9*shape) + z*np.sqrt(1/(9*shape)))**3
+
+
+def reproduction_numbers(
+    bears: Bears,
+    kernel: np.ndarray = None,
+    window: int = 7,
+    prior_shape: float = 1.,
+    prior_scale: float = 5.,
+    z: float = 1.96,
+    min_pressure: float = 1.) -> Dict[str, Bears]:
+  """Estimates the effective reproduction number :math:`R_t` for all regions.
+
+  Uses the renewal equation :math:`E[I_t] = R_t \\Lambda_t` with
+  :math:`R_t` constant over the `window` days ending on each day, and the
+  gamma posterior of Cori et al., "A New Framework and Software to Estimate
+  Time-Varying Reproduction Numbers During Epidemics" (2013):
+
+  .. math::
+
+    R_t \\sim \\Gamma\\left(a + \\sum I_k, \\;
+                         \\left(1/b + \\sum \\Lambda_k\\right)^{-1}\\right)
+
+  Args:
+    bears (Bears): New cases, e.g. from `new_cases()`
+    kernel (np.ndarray): Serial-interval weights for lags of 1, 2, ...
+      days. Defaults to :py:func:`serial_interval_kernel()`.
+    window (int): Number of days over which :math:`R_t` is constant
+    prior_shape (float): Shape :math:`a` of the gamma prior
+    prior_scale (float): Scale :math:`b` of the gamma prior
+    z (float): Normal quantile of the credible bounds, e.g. 1.96 for 95%
+    min_pressure (float): Days whose summed :math:`\\Lambda` is below this
+      are `NaN`, since the posterior is just the prior there.
+
+  Returns:
+    Dict[str, Bears]:
+    ::
+
+    {'rt': Bears, 'lower': Bears, 'upper': Bears}
+
+    Posterior means and approximate credible bounds of :math:`R_t`. The
+    first `window - 1` days are `NaN`.
+  """
+  num_days = len(bears.datetime_index)
+  assert 0 < window <= num_days, (
+      'Need between 1 and {} days per window'.format(num_days))
+  kernel = serial_interval_kernel() if kernel is None else np.asarray(
+      kernel, dtype=float)
+  counts = _daily_counts(bears)
+  pressure = infection_pressure(counts, kernel)
+
+  def _window_sums(values):
+    cumsum = np.cumsum(values, axis=1)
+    sums = np.full_like(cumsum, np.nan)
+    sums[:, window - 1:] = cumsum[:, window - 1:] - np.concatenate(
+        [np.zeros((len(cumsum), 1)), cumsum[:, :-window]], axis=1)
+    return sums
+  shape = prior_shape + _window_sums(counts)
+  pressure_sums = _window_sums(pressure)
+  scale = 1/(1/prior_scale + pressure_sums)
+  undefined = ~(pressure_sums >= min_pressure)
+  estimates = {
+      'rt': shape * scale,
+      'lower': np.maximum(_gamma_quantile(shape, scale, -z), 0.),
+      'upper': _gamma_quantile(shape, scale, z)}
+  for values in estimates.values():
+    values[undefined] = np.nan
+  return {
+      name: bears.derive(values) for name, values in estimates.items()}
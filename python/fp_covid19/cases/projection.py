@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""Module for short-term projections of new cases
+
+Fits one trend per region to the last weeks of the region-by-day matrix of
+new cases, e.g. from :py:func:`fp_covid19.cases.compute.new_cases`, and
+extrapolates it. The days of a fit are the same for every region, so the
+least-squares coefficients of all regions are matrix products with one fixed
+design, like :py:func:`fp_covid19.cases.growth.growth_rates`, and projecting
+thousands of counties takes one pass.
+
+Examples:
+  >>> daily = new_cases(covid19['confirmed']['counties'])
+  >>> projected = project(daily, horizon=14, model='damped')
+  >>> projected['projection'].df[projected['projection'].datetime_index[-14:]]
+"""
+from __future__ import annotations
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+from fp_covid19.cases.growth import _linear_fit
+from fp_covid19.data.bears import Bears
+
+MODELS = ['log_linear', 'damped']
+"""Trend models of :py:func:`project`"""
+
+
+def future_datetime_index(bears: Bears, horizon: int) -> List[str]:
+  """Date labels of the `horizon` days after the last date of `bears`, in
+  the `M/D/YYYY` form of `Bears.datetime_index`"""
+  last = bears.date_axis.datetimes[-1].tz_localize(None)
+  days = pd.date_range(last + pd.Timedelta(days=1), periods=horizon, freq='D')
+  return ['{}/{}/{}'.format(day.month, day.day, day.year) for day in days]
+
+
+def trend_offsets(
+    window: int, horizon: int, model: str = 'log_linear',
+    damping: float = 0.9) -> np.ndarray:
+  """Trend multipliers of the projected days.
+
+  The fit centers the days of the window, so the last observed day is
+  :math:`(W - 1)/2`. A log-linear trend adds the slope once per day; a
+  damped trend adds :math:`\\phi^k` times the slope on the `k`-th day ahead,
+  so growth levels off.
+
+  Args:
+    window (int): Number of days per fit, :math:`W`
+    horizon (int): Number of days to project, :math:`H`
+    model (str): One of :py:data:`MODELS`
+    damping (float): :math:`\\phi` of the damped trend
+
+  Returns:
+    np.ndarray:
+    Centered day offsets :math:`t_1, \\dots, t_H` of the projected days
+  """
+  assert model in MODELS, 'model must be one of {}'.format(MODELS)
+  steps = np.arange(1, horizon + 1, dtype=float)
+  if model == 'damped':
+    assert 0 < damping <= 1, 'damping must be in (0, 1]'
+    steps = np.cumsum(damping**steps)
+  return (window - 1)/2 + steps
+
+
+def project(
+    bears: Bears,
+    horizon: int = 28,
+    window: int = 21,
+    model: str = 'log_linear',
+    damping: float = 0.9,
+    z: float = 1.96) -> Dict[str, Bears]:
+  """Projects new cases of all regions.
+
+  Fits :math:`\\log(1 + I_t) = a + b t` by least squares over the last
+  `window` days of every region at once and extrapolates the trend, see
+  :py:func:`trend_offsets`. The log-scale prediction intervals
+
+  .. math::
+
+    \\hat{y}_h \\pm z s \\sqrt{1 + 1/W + t_h^2 / \\sum t^2}
+
+  use the residual standard error :math:`s` of each region's fit and are
+  transformed back to counts with the projections.
+
+  Args:
+    bears (Bears): Daily new cases, e.g. from `new_cases()`. `NaN` and
+      negative corrections count as zero.
+    horizon (int): Number of days to project, e.g. 7 to 28
+    window (int): Number of trailing days per fit
+    model (str): `'log_linear'` (exponential growth or decay) or
+      `'damped'` (a trend that levels off by `damping` per day)
+    damping (float): Daily damping factor of the `'damped'` model
+    z (float): Normal quantile of the prediction intervals, e.g. 1.96 for
+      95%
+
+  Returns:
+    Dict[str, Bears]:
+    ::
+
+    {'projection': Bears, 'lower': Bears, 'upper': Bears}
+
+    `datetime_index` extends that of `bears` by `horizon` days. The
+    observed days of `projection` are the input counts; those of `lower`
+    and `upper` are `NaN`.
+  """
+  datetime_index = bears.datetime_index
+  assert 2 < window <= len(datetime_index), (
+      'Need between 3 and {} days per fit'.format(len(datetime_index)))
+  assert horizon > 0, 'horizon must be positive'
+  observed = bears.df[datetime_index].to_numpy(dtype=float)
+  log_counts = np.log1p(np.clip(
+      np.nan_to_num(observed[:, -window:], nan=0.), 0., None))
+  days, intercept, slope, std_err = _linear_fit(log_counts)
+  sum_squares = days @ days
+
+  offsets = trend_offsets(window, horizon, model=model, damping=damping)
+  center = intercept[:, np.newaxis] + slope[:, np.newaxis] * offsets
+  spread = z * std_err[:, np.newaxis] * np.sqrt(
+      1 + 1/window + offsets**2/sum_squares)
+  with np.errstate(over='ignore'):
+    projected = {
+        'projection': np.expm1(center),
+        'lower': np.maximum(np.expm1(center - spread), 0.),
+        'upper': np.expm1(center + spread)}
+
+  blank = np.full(observed.shape, np.nan)
+  extended_index = datetime_index + future_datetime_index(bears, horizon)
+  return {
+      name: bears.derive(
+          np.concatenate(
+              [observed if name == 'projection' else blank, values], axis=1),
+          datetime_index=extended_index)
+      for name, values in projected.items()}
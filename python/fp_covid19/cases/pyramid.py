@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""Module for multi-resolution (daily, weekly, monthly) aggregates
+
+A chart of a whole year does not need 365 columns per region. The temporal
+pyramid precomputes weekly and monthly sums, means, and end-of-period
+cumulatives from the daily count matrix with `np.add.reduceat`, keeps them up
+to date as days are appended, and serves every level as a `Bears`, just like
+the daily data.
+"""
+from __future__ import annotations
+from typing import Dict, List
+import numpy as np
+from fp_covid19.data.bears import Bears
+
+PYRAMID_LEVELS = {'W': 'weekly', 'M': 'monthly'}
+"""Pandas period frequencies and their names. Weeks end on Sunday."""
+PYRAMID_STATS = ['sum', 'mean', 'cumulative']
+
+
+def period_starts(bears: Bears, freq: str) -> np.ndarray:
+  """Returns the column positions where a new `freq` period starts.
+
+  Args:
+    bears (Bears): Daily time-series
+    freq (str): Pandas period frequency, e.g. `'W'` or `'M'`
+
+  Returns:
+    np.ndarray:
+    Positions in `bears.datetime_index`, starting with 0
+  """
+  codes = bears.date_axis.datetimes.tz_localize(None).to_period(freq).asi8
+  return np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+
+
+class _Level:
+  """Aggregates of one level of the pyramid"""
+  def __init__(self, freq: str):
+    self.freq = freq
+    self.starts = np.zeros(0, dtype=np.int64)
+    self.sums = None
+    self.counts = None
+    self.cumulatives = None
+    self.datetime_index = []
+
+  def update(self, bears: Bears, daily: np.ndarray, valid: np.ndarray,
+             cumulative: np.ndarray, first_day: int):
+    """Recomputes the periods that contain `first_day` or later days.
+    `daily` has `NaN` as zero and `valid` flags the days that were not
+    `NaN`."""
+    starts = period_starts(bears, self.freq)
+    first_period = np.searchsorted(starts, first_day, side='right') - 1
+    first_period = max(first_period, 0)
+    start_day = starts[first_period]
+    ends = np.r_[starts[1:], daily.shape[1]] - 1
+    offsets = starts[first_period:] - start_day
+    sums = np.add.reduceat(daily[:, start_day:], offsets, axis=1)
+    counts = np.add.reduceat(
+        valid[:, start_day:].astype(np.int64), offsets, axis=1)
+    cumulatives = cumulative[:, ends[first_period:]]
+    if first_period and self.sums is not None:
+      sums = np.concatenate([self.sums[:, :first_period], sums], axis=1)
+      counts = np.concatenate(
+          [self.counts[:, :first_period], counts], axis=1)
+      cumulatives = np.concatenate(
+          [self.cumulatives[:, :first_period], cumulatives], axis=1)
+    self.starts, self.sums, self.counts = starts, sums, counts
+    self.cumulatives = cumulatives
+    datetime_index = bears.datetime_index
+    self.datetime_index = [datetime_index[end] for end in ends]
+
+
+class TemporalPyramid:
+  """Daily, weekly, and monthly aggregates of a `Bears`.
+
+  Every level is labeled with the last observed date of each period, so a
+  partial last week or month is labeled with the latest date and is
+  completed as days are appended.
+
+  Examples:
+    >>> pyramid = TemporalPyramid(covid19['confirmed']['counties'])
+    >>> pyramid.get('M', 'sum') # new cases per month
+    >>> pyramid.get('W', 'cumulative') # cases at the end of every week
+    >>> pyramid.update(tomorrows_bears) # recomputes only the last periods
+
+  Args:
+    bears (Bears): Daily time-series
+    levels (List[str]): Pandas period frequencies to precompute
+    cumulative (bool): `True` if `bears` holds cumulative counts, as from the
+      loaders, `False` if it holds daily counts. The daily count of the first
+      date is its cumulative count.
+  """
+  def __init__(
+      self, bears: Bears, levels: List[str] = tuple(PYRAMID_LEVELS),
+      cumulative: bool = True):
+    self.cumulative = cumulative
+    self.levels: Dict[str, _Level] = {freq: _Level(freq) for freq in levels}
+    self.bears = None
+    self.daily = None
+    self.cumulatives = None
+    self.update(bears)
+
+  def update(self, bears: Bears) -> List[str]:
+    """Aggregates the days appended to `bears` since the last update.
+
+    Only the last period of every level and the periods after it are
+    recomputed. If the rows or earlier date labels changed, every period is
+    recomputed.
+
+    Args:
+      bears (Bears): The same regions as before with zero or more days
+        appended
+
+    Returns:
+      List[str]:
+      The new date labels
+    """
+    datetime_index = bears.datetime_index
+    old_days = 0 if self.bears is None else self.daily.shape[1]
+    if (old_days and not (
+        bears.df.index.equals(self.bears.df.index)
+        and datetime_index[:old_days] == self.bears.datetime_index)):
+      old_days = 0
+    new_index = datetime_index[old_days:]
+    values = bears.df[new_index].to_numpy(dtype=float)
+    previous = (self.cumulatives[:, -1:] if old_days
+                else np.zeros((len(values), 1)))
+    if self.cumulative:
+      cumulatives = values
+      daily = np.diff(values, axis=1, prepend=previous)
+    else:
+      daily = values
+      cumulatives = previous + np.nancumsum(values, axis=1)
+    if old_days:
+      daily = np.concatenate([self.daily, daily], axis=1)
+      cumulatives = np.concatenate([self.cumulatives, cumulatives], axis=1)
+    self.bears, self.daily, self.cumulatives = bears, daily, cumulatives
+    for level in self.levels.values():
+      level.update(bears, np.nan_to_num(daily), ~np.isnan(daily),
+                   cumulatives, old_days)
+    return list(new_index)
+
+  def get(self, level: str = 'D', stat: str = 'sum') -> Bears:
+    """Returns one level of the pyramid as a `Bears`.
+
+    Args:
+      level (str): `'D'` for daily or one of the precomputed frequencies,
+        e.g. `'W'` or `'M'`
+      stat (str): `'sum'` of the daily counts, daily `'mean'`, or
+        `'cumulative'` count at the end of each period. Sums count `NaN`
+        days as zero; means average the days that are not `NaN` and are
+        `NaN` for periods without any.
+
+    Returns:
+      Bears:
+      The same rows and non-datetime columns as the input, with one date
+      column per period labeled by its last observed date
+    """
+    assert stat in PYRAMID_STATS, 'stat must be one of {}'.format(
+        PYRAMID_STATS)
+    if level == 'D':
+      values = self.cumulatives if stat == 'cumulative' else self.daily
+      return self.bears.derive(values)
+    aggregates = self.levels[level]
+    if stat == 'cumulative':
+      values = aggregates.cumulatives
+    elif stat == 'sum':
+      values = aggregates.sums
+    else:
+      with np.errstate(invalid='ignore', divide='ignore'):
+        values = np.where(
+            aggregates.counts > 0, aggregates.sums / aggregates.counts,
+            np.nan)
+    return self.bears.derive(values, datetime_index=aggregates.datetime_index)
+
+  def level_for_span(self, num_days: int, max_columns: int = 60) -> str:
+    """Picks the finest level that shows `num_days` in at most `max_columns`
+    columns.
+
+    Args:
+      num_days (int): Number of days the view spans
+      max_columns (int): Most columns (points or slider steps) wanted
+
+    Returns:
+      str:
+      `'D'` or one of the precomputed frequencies
+    """
+    days_per_column = {'D': 1, 'W': 7, 'M': 30.4375, 'Q': 91.3, 'Y': 365.25}
+    candidates = ['D'] + sorted(
+        self.levels, key=lambda freq: days_per_column.get(freq[0], 1))
+    for level in candidates:
+      if num_days / days_per_column.get(level[0], 1) <= max_columns:
+        return level
+    return candidates[-1]
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""Module for ranking regions day by day
+
+Answers queries such as "the 25 counties with the most 7-day per-capita new
+cases, every day" without calling `rank()` or `nlargest()` once per column:
+ranks come from one sort and top-K sets from one `np.argpartition` along the
+region axis of the whole region-by-day matrix.
+"""
+from __future__ import annotations
+from typing import List
+import numpy as np
+import pandas as pd
+from fp_covid19.data.bears import Bears
+
+
+def min_ranks(values: np.ndarray, na_option='top') -> np.ndarray:
+  """Ranks every column, like `pd.DataFrame.rank(method='min')`.
+
+  Only `NaN` is missing; `-inf` and `inf` rank as the smallest and largest
+  values.
+
+  Args:
+    values (np.ndarray): Region-by-day matrix
+    na_option (str): `'top'` ranks `NaN` lowest, `'bottom'` highest, and
+      `'keep'` leaves their ranks `NaN`, as in `pd.DataFrame.rank()`
+
+  Returns:
+    np.ndarray:
+    `float` ranks starting at 1. Ties share the lowest rank of the group.
+  """
+  # `np.argsort` puts `NaN` last, so they rank as `'bottom'` first
+  order = np.argsort(values, axis=0, kind='stable')
+  ordered = np.take_along_axis(values, order, axis=0)
+  ordered_nan = np.isnan(ordered)
+  positions = np.arange(len(values))[:, np.newaxis]
+  first_of_group = np.ones(ordered.shape, dtype=bool)
+  first_of_group[1:] = (
+      (ordered[1:] != ordered[:-1]) & ~(ordered_nan[1:] & ordered_nan[:-1]))
+  first_position = np.maximum.accumulate(
+      np.where(first_of_group, positions, 0), axis=0)
+  ranks = np.empty(values.shape)
+  np.put_along_axis(ranks, order, first_position + 1., axis=0)
+  nan = np.isnan(values)
+  if na_option == 'top':
+    ranks = np.where(nan, 1., ranks + nan.sum(axis=0))
+  elif na_option == 'keep':
+    ranks[nan] = np.nan
+  return ranks
+
+
+def top_k_positions(
+    values: np.ndarray, k: int, largest=True) -> np.ndarray:
+  """Finds the `k` largest (or smallest) rows of every column.
+
+  `np.argpartition` selects the `k` rows in linear time; only those `k` are
+  then sorted. `NaN` never makes the top (or bottom) unless a column has
+  fewer than `k` other values.
+
+  Args:
+    values (np.ndarray): Region-by-day matrix
+    k (int): Number of rows per column
+    largest (bool): `True` for the top `k`, `False` for the bottom `k`
+
+  Returns:
+    np.ndarray:
+    `(k, num_days)` row positions, best first
+  """
+  k = min(k, len(values))
+  # `NaN` sort after `inf` in `np.argpartition` and `np.argsort`
+  keys = -values if largest else values
+  if k < len(values):
+    candidates = np.argpartition(keys, k - 1, axis=0)[:k]
+  else:
+    candidates = np.broadcast_to(
+        np.arange(len(values))[:, np.newaxis], values.shape)
+  order = np.argsort(
+      np.take_along_axis(keys, candidates, axis=0), axis=0, kind='stable')
+  return np.take_along_axis(candidates, order, axis=0)
+
+
+class RankingEngine:
+  """Per-day ranks, percentiles, and top-K/bottom-K sets of a `Bears`.
+
+  Examples:
+    >>> weekly = new_cases(covid19['confirmed']['counties'], periods=7)
+    >>> engine = RankingEngine(per_capita(weekly, population), k=25)
+    >>> engine.top_k() # 25 worst counties, every day
+    >>> engine.update(tomorrows_bears) # ranks only the appended days
+
+  Args:
+    bears (Bears): Values to rank, e.g. per-capita new cases
+    k (int): Size of the top-K and bottom-K sets kept for every day
+    na_option (str): How `NaN` ranks. See :py:func:`min_ranks`.
+  """
+  def __init__(self, bears: Bears, k: int = 25, na_option='top'):
+    self.k = k
+    self.na_option = na_option
+    self.bears = None
+    self.datetime_index = []
+    self.ranks = None
+    """Region-by-day `float` ranks, 1 is the smallest value"""
+    self.counts = None
+    """Number of ranked values per day, the percentile denominators"""
+    self.top = None
+    """`(k, num_days)` row positions of the largest values, largest first"""
+    self.bottom = None
+    """`(k, num_days)` row positions of the smallest values, smallest first"""
+    self.update(bears)
+
+  def _rank(self, values: np.ndarray):
+    counts = ((~np.isnan(values)).sum(axis=0) if self.na_option == 'keep'
+              else np.full(values.shape[1], len(values)))
+    return (min_ranks(values, self.na_option), counts,
+            top_k_positions(values, self.k, largest=True),
+            top_k_positions(values, self.k, largest=False))
+
+  def update(self, bears: Bears) -> List[str]:
+    """Ranks the days appended to `bears` since the last update.
+
+    Recomputes every day if the rows changed or if an earlier date label
+    differs. Revised values on earlier dates with the same labels are not
+    detected; build a new engine after a revision.
+
+    Args:
+      bears (Bears): The same regions as before with zero or more days
+        appended
+
+    Returns:
+      List[str]:
+      The date labels that were ranked
+    """
+    datetime_index = bears.datetime_index
+    old_days = len(self.datetime_index)
+    incremental = (
+        self.bears is not None
+        and bears.df.index.equals(self.bears.df.index)
+        and datetime_index[:old_days] == self.datetime_index)
+    new_index = datetime_index[old_days:] if incremental else datetime_index
+    if new_index:
+      values = bears.df[new_index].to_numpy(dtype=float)
+      ranked = self._rank(values)
+      if incremental and old_days:
+        ranked = [np.concatenate([old, new], axis=-1) for old, new in zip(
+            (self.ranks, self.counts, self.top, self.bottom), ranked)]
+      self.ranks, self.counts, self.top, self.bottom = ranked
+    self.bears = bears
+    self.datetime_index = list(datetime_index)
+    return list(new_index)
+
+  def rank_bears(self) -> Bears:
+    """Returns the ranks as a `Bears`, like `rank(method='min')`"""
+    return self.bears.derive(self.ranks)
+
+  def percentile_bears(self) -> Bears:
+    """Returns the percentiles as a `Bears`, like
+    `rank(method='min', pct=True)`"""
+    return self.bears.derive(self.ranks / self.counts)
+
+  def _labels(self, positions: np.ndarray, k: int, dates) -> pd.DataFrame:
+    if k is None:
+      k = self.k
+    assert k <= self.k, 'The engine keeps only the top {}'.format(self.k)
+    columns = (range(len(self.datetime_index)) if dates is None
+               else [self.datetime_index.index(date) for date in dates])
+    columns = list(columns)
+    labels = self.bears.df.index.to_numpy()[positions[:k, columns]]
+    return pd.DataFrame(
+        labels, index=pd.RangeIndex(1, len(labels) + 1, name='rank'),
+        columns=[self.datetime_index[i] for i in columns])
+
+  def top_k(self, k: int = None, dates: List[str] = None) -> pd.DataFrame:
+    """Returns the row labels of the `k` largest values per day.
+
+    Args:
+      k (int): At most the `k` the engine was built with
+      dates (List[str]): Date labels. Defaults to all dates.
+
+    Returns:
+      pd.DataFrame:
+      Row labels of `bears.df`, indexed by rank (1 is the largest), one
+      column per date
+    """
+    return self._labels(self.top, k, dates)
+
+  def bottom_k(self, k: int = None, dates: List[str] = None) -> pd.DataFrame:
+    """Returns the row labels of the `k` smallest values per day.
+
+    Args:
+      k (int): At most the `k` the engine was built with
+      dates (List[str]): Date labels. Defaults to all dates.
+
+    Returns:
+      pd.DataFrame:
+      Row labels of `bears.df`, indexed by rank (1 is the smallest), one
+      column per date
+    """
+    return self._labels(self.bottom, k, dates)
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""Module for reconciling two data sources, e.g. JHU CSSE vs. USAFacts"""
+from __future__ import annotations
+from typing import Dict, Tuple
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from fp_covid19.data.bears import Bears
+
+Alignment = namedtuple(
+    'Alignment', ['fips', 'datetime_index', 'rows', 'cols'])
+""" Row and column index maps shared by two `Bears`
+
+.. py:attribute:: fips
+
+    Canonical FIPS codes (`np.int64`) found in both sources, sorted
+
+.. py:attribute:: datetime_index
+
+    Date column labels found in both sources, in date order
+
+.. py:attribute:: rows
+
+    Pair of integer arrays. `rows[i][k]` is the position in source `i`
+    of the row with FIPS `fips[k]`.
+
+.. py:attribute:: cols
+
+    Pair of integer arrays. `cols[i][k]` is the position in source `i`
+    of the date column `datetime_index[k]`.
+"""
+
+
+def canonical_fips(fips: pd.Series) -> np.ndarray:
+  """Converts FIPS codes to integers so `'06037'`, `'6037'`, and `6037.0`
+  compare equal.
+
+  Args:
+    fips (pd.Series): FIPS codes as strings or numbers
+
+  Returns:
+    np.ndarray:
+    `np.int64` FIPS codes. Missing or malformed codes become `-1`.
+  """
+  return (pd.to_numeric(pd.Series(fips), errors='coerce')
+          .fillna(-1).to_numpy().astype(np.int64))
+
+
+def _positions(keys: np.ndarray, common: np.ndarray) -> np.ndarray:
+  """Positions of `common` in `keys`, first occurrence wins"""
+  unique_keys, first = np.unique(keys, return_index=True)
+  return first[np.searchsorted(unique_keys, common)]
+
+
+def align(bears_a: Bears, bears_b: Bears, fips_col='FIPS') -> Alignment:
+  """Precomputes the row and column index maps between two `Bears`.
+
+  Compute the alignment once and pass it to :py:func:`reconcile` for every
+  metric that shares the same rows and dates, e.g. confirmed and deaths.
+
+  Note:
+    If a source lists a FIPS code more than once, e.g. several unassigned
+    areas, only its first row takes part in the comparison.
+
+  Args:
+    bears_a (Bears): First source, e.g. JHU CSSE counties
+    bears_b (Bears): Second source, e.g. USAFacts counties
+    fips_col (str): Column label of the FIPS codes in both sources
+
+  Returns:
+    Alignment:
+    Index maps onto the common FIPS codes and dates
+  """
+  fips = [canonical_fips(bears.df[fips_col]) for bears in (bears_a, bears_b)]
+  common_fips = np.intersect1d(fips[0][fips[0] >= 0], fips[1][fips[1] >= 0])
+  datetime_index = [bears.datetime_index for bears in (bears_a, bears_b)]
+  dates = [pd.to_datetime(pd.Index(index), format='%m/%d/%Y')
+           for index in datetime_index]
+  common_dates = dates[0].intersection(dates[1]).sort_values()
+  return Alignment(
+      fips=common_fips,
+      datetime_index=[
+          datetime_index[0][i] for i in dates[0].get_indexer(common_dates)],
+      rows=tuple(_positions(keys, common_fips) for keys in fips),
+      cols=tuple(
+          np.asarray(bears.df.columns.get_indexer(
+              [index[i] for i in date.get_indexer(common_dates)]))
+          for bears, index, date in zip(
+              (bears_a, bears_b), datetime_index, dates)))
+
+
+def aligned_values(
+    bears_a: Bears, bears_b: Bears, alignment: Alignment) -> Tuple:
+  """Extracts the two region-by-day count matrices on the common axes.
+
+  Returns:
+    Tuple[np.ndarray, np.ndarray]:
+    `float` arrays of shape `(len(alignment.fips),
+    len(alignment.datetime_index))`
+  """
+  return tuple(
+      bears.df.iloc[rows, cols].to_numpy(dtype=float)
+      for bears, rows, cols in zip(
+          (bears_a, bears_b), alignment.rows, alignment.cols))
+
+
+def reconcile(
+    bears_a: Bears,
+    bears_b: Bears,
+    names: Tuple[str, str] = ('jhu_csse', 'usafacts'),
+    alignment: Alignment = None,
+    sort_by='max_abs_diff',
+    blend_weight: float = None,
+    fips_col='FIPS') -> Dict:
+  """Ranks the regions and days where two sources disagree the most.
+
+  Computes the absolute difference :math:`|a - b|` and the relative
+  difference :math:`|a - b| / \\max(|a|, |b|)` for every region and day in
+  one pass over the aligned count matrices.
+
+  Args:
+    bears_a (Bears): First source, e.g. JHU CSSE counties
+    bears_b (Bears): Second source, e.g. USAFacts counties
+    names (Tuple[str, str]): Source names used in the report column labels
+    alignment (Alignment): Output of :py:func:`align`. Computed if `None`.
+    sort_by (str): Column label of the region report to rank by, descending
+    blend_weight (float): If not `None`, also returns the blended series
+      `blend_weight * a + (1 - blend_weight) * b`, falling back to whichever
+      source is available where the other one is `NaN`.
+    fips_col (str): Column label of the FIPS codes in both sources
+
+  Returns:
+    Dict:
+    ::
+
+    {'regions': pd.DataFrame, 'days': pd.DataFrame, 'blended': Bears}
+
+    * `regions` has one row per common FIPS code, sorted by `sort_by`,
+      with the columns `FIPS`, `Combined_Key` (if `bears_a` has it),
+      `max_abs_diff`, `max_abs_diff_date`, `mean_abs_diff`,
+      `max_rel_diff`, `latest_<name>` for both sources, `latest_abs_diff`,
+      and `latest_rel_diff`.
+    * `days` is indexed by date with the columns `total_<name>` for both
+      sources, `total_abs_diff`, `total_rel_diff`, and
+      `regions_disagreeing`.
+    * `blended` is a `Bears` of type `bears_a` with the common rows and
+      dates, or `None` if `blend_weight` is `None`.
+  """
+  if alignment is None:
+    alignment = align(bears_a, bears_b, fips_col=fips_col)
+  values_a, values_b = aligned_values(bears_a, bears_b, alignment)
+  abs_diff = np.abs(values_a - values_b)
+  scale = np.fmax(np.abs(values_a), np.abs(values_b))
+  with np.errstate(invalid='ignore', divide='ignore'):
+    rel_diff = np.where(scale > 0, abs_diff / scale, 0.)
+  rel_diff[np.isnan(abs_diff)] = np.nan
+
+  datetime_index = alignment.datetime_index
+  has_diff = ~np.isnan(abs_diff)
+  any_diff = has_diff.any(axis=1)
+  regions = pd.DataFrame({'FIPS': alignment.fips.astype(str)})
+  if 'Combined_Key' in bears_a.df.columns:
+    regions['Combined_Key'] = (
+        bears_a.df['Combined_Key'].to_numpy()[alignment.rows[0]])
+  argmax = np.argmax(np.where(has_diff, abs_diff, -np.inf), axis=1)
+  regions['max_abs_diff'] = np.where(
+      any_diff, abs_diff[np.arange(len(abs_diff)), argmax], np.nan)
+  regions['max_abs_diff_date'] = np.where(
+      any_diff, np.asarray(datetime_index, dtype=object)[argmax], None)
+  regions['mean_abs_diff'] = (
+      np.where(has_diff, abs_diff, 0.).sum(axis=1)
+      / np.maximum(has_diff.sum(axis=1), 1))
+  regions['max_rel_diff'] = np.where(
+      any_diff, np.where(has_diff, rel_diff, -np.inf).max(axis=1), np.nan)
+  regions['latest_' + names[0]] = values_a[:, -1]
+  regions['latest_' + names[1]] = values_b[:, -1]
+  regions['latest_abs_diff'] = abs_diff[:, -1]
+  regions['latest_rel_diff'] = rel_diff[:, -1]
+  regions = regions.sort_values(
+      by=sort_by, ascending=False, na_position='last', kind='stable')
+
+  totals_a, totals_b = np.nansum(values_a, axis=0), np.nansum(values_b, axis=0)
+  days = pd.DataFrame(
+      {'total_' + names[0]: totals_a,
+       'total_' + names[1]: totals_b,
+       'total_abs_diff': np.nansum(abs_diff, axis=0),
+       'regions_disagreeing': (abs_diff > 0).sum(axis=0)},
+      index=pd.Index(datetime_index, name='date'))
+  total_scale = np.fmax(np.abs(totals_a), np.abs(totals_b))
+  days.insert(
+      3, 'total_rel_diff',
+      np.abs(totals_a - totals_b) / np.where(total_scale > 0, total_scale, 1))
+
+  blended = None
+  if blend_weight is not None:
+    blended_values = np.where(
+        np.isnan(values_a), values_b,
+        np.where(np.isnan(values_b), values_a,
+                 blend_weight * values_a + (1 - blend_weight) * values_b))
+    blended = bears_a.copy(deep=False)
+    blended.df = bears_a.df.iloc[alignment.rows[0]]
+    blended = blended.derive(blended_values, datetime_index=datetime_index)
+  return {'regions': regions, 'days': days, 'blended': blended}
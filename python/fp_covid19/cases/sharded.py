@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""Module for running region-wise transforms on all cores
+
+Rolling metrics, smoothing, anomaly detection, and projections treat every
+region on its own, so they split across processes by rows.
+:py:func:`map_shards` partitions a `Bears` by state (or into row blocks), runs
+a function on every shard in a process pool, and stitches the results back in
+the original row order.
+
+The count matrix travels through shared memory: the parent copies it into one
+`SharedMemory` block that every worker maps, and workers hand their result
+matrices back in blocks of their own. Only the shard row positions, the
+metadata columns, and the date labels are pickled.
+
+Examples:
+  >>> daily = map_shards(new_cases, counties)
+  >>> rates = map_shards(growth_rates, daily, window=7, max_workers=16)
+  >>> projected = map_shards(project, daily, by=None, horizon=14)
+"""
+from __future__ import annotations
+from typing import Callable, Dict, List, Tuple
+import concurrent.futures
+import os
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from fp_covid19.data.bears import Bears
+
+
+def shard_positions(
+    bears: Bears, by: str = 'Province_State',
+    num_shards: int = None) -> List[np.ndarray]:
+  """Partitions the rows of `bears` into shards of similar size.
+
+  Args:
+    bears (Bears): Time-series to partition
+    by (str): Column label whose groups stay in one shard, e.g.
+      `'Province_State'` so state-level aggregations see whole states, or
+      `None` for contiguous row blocks. Falls back to row blocks if `bears`
+      has no such column.
+    num_shards (int): Number of shards. Defaults to four per CPU.
+
+  Returns:
+    List[np.ndarray]:
+    Sorted row positions of every non-empty shard. Every row is in exactly
+    one shard.
+  """
+  num_rows = len(bears.df)
+  if num_shards is None:
+    num_shards = 4 * (os.cpu_count() or 1)
+  num_shards = max(1, min(num_shards, num_rows))
+  if by is None or by not in bears.df.columns:
+    return [positions for positions in np.array_split(
+        np.arange(num_rows), num_shards) if len(positions)]
+  codes, _ = pd.factorize(bears.df[by], use_na_sentinel=False)
+  order = np.argsort(codes, kind='stable')
+  sizes = np.bincount(codes)
+  starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+  # Largest groups first, each into the currently smallest shard
+  shard_of_group = np.empty(len(sizes), dtype=np.intp)
+  loads = np.zeros(num_shards, dtype=np.int64)
+  for group in np.argsort(sizes, kind='stable')[::-1]:
+    shard = loads.argmin()
+    shard_of_group[group] = shard
+    loads[shard] += sizes[group]
+  shards = [[] for _ in range(num_shards)]
+  for group, shard in enumerate(shard_of_group):
+    shards[shard].append(order[starts[group]:starts[group] + sizes[group]])
+  return [np.sort(np.concatenate(groups)) for groups in shards if groups]
+
+
+def _to_shared(
+    values: np.ndarray) -> Tuple[shared_memory.SharedMemory, Tuple]:
+  """Copies `values` into a new shared block.
+
+  Returns:
+    Tuple[shared_memory.SharedMemory, Tuple]:
+    The block and its `(name, shape, dtype)` spec for other processes
+  """
+  block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+  np.ndarray(values.shape, values.dtype, buffer=block.buf)[...] = values
+  return block, (block.name, values.shape, values.dtype.str)
+
+
+def _from_shared(spec: Tuple[str, Tuple, str]) -> np.ndarray:
+  """Copies a shared block made by another process and frees it"""
+  name, shape, dtype = spec
+  block = shared_memory.SharedMemory(name=name)
+  try:
+    return np.ndarray(shape, dtype, buffer=block.buf).copy()
+  finally:
+    block.close()
+    block.unlink()
+
+
+def _free(spec: Tuple[str, Tuple, str]):
+  """Frees a shared block made by another process unless it is gone"""
+  try:
+    block = shared_memory.SharedMemory(name=spec[0])
+  except FileNotFoundError:
+    return
+  block.close()
+  block.unlink()
+
+
+def _result_specs(result) -> List[Tuple[str, Tuple, str]]:
+  """Specs of the shared result blocks in an output of `_run_shard`"""
+  if isinstance(result, dict):
+    return [spec for item in result.values() for spec in _result_specs(item)]
+  if isinstance(result, tuple) and result and result[0] == 'bears':
+    return [result[2]]
+  return []
+
+
+def _run_shard(
+    func: Callable, kwargs: Dict, spec: Tuple[str, Tuple, str],
+    positions: np.ndarray, bears_type: type, metadata: pd.DataFrame,
+    datetime_index: List[str]):
+  """Runs `func` on the rows `positions` of the shared count matrix.
+
+  Returns:
+    The output of `func` with the values of every `Bears` replaced by a
+    `('bears', datetime_index, spec)` tuple of a shared result block
+  """
+  name, shape, dtype = spec
+  block = shared_memory.SharedMemory(name=name)
+  try:
+    values = np.ndarray(shape, dtype, buffer=block.buf)
+    if positions[-1] - positions[0] + 1 == len(positions):
+      rows = values[positions[0]:positions[-1] + 1].copy()
+    else:
+      rows = values[positions]
+  finally:
+    block.close()
+  shard = bears_type(dataframe=pd.concat(
+      [metadata, pd.DataFrame(rows, index=metadata.index,
+                              columns=datetime_index)], axis='columns'))
+  result = func(shard, **kwargs)
+
+  def share(item):
+    if isinstance(item, Bears):
+      item_index = item.datetime_index
+      assert len(item.df) == len(positions), (
+          'Sharded functions must keep every row of their input')
+      block, item_spec = _to_shared(
+          item.df[item_index].to_numpy(dtype=float))
+      # The parent frees the block after copying it
+      block.close()
+      return ('bears', item_index, item_spec)
+    return item
+  if isinstance(result, dict):
+    return {key: share(item) for key, item in result.items()}
+  return share(result)
+
+
+def _stitch(bears: Bears, shards: List[np.ndarray], results: List):
+  """Reassembles shard results in the original row order"""
+  first = results[0]
+  if isinstance(first, dict):
+    return {key: _stitch(bears, shards, [result[key] for result in results])
+            for key in first}
+  if isinstance(first, tuple) and first and first[0] == 'bears':
+    datetime_index = first[1]
+    values = np.empty((len(bears.df), len(datetime_index)))
+    for positions, (_, _, spec) in zip(shards, results):
+      values[positions] = _from_shared(spec)
+    return bears.derive(values, datetime_index=datetime_index)
+  if isinstance(first, pd.DataFrame):
+    return pd.concat(results, ignore_index=True)
+  if all(result is None for result in results):
+    return None
+  return results
+
+
+def map_shards(
+    func: Callable,
+    bears: Bears,
+    by: str = 'Province_State',
+    num_shards: int = None,
+    max_workers: int = None,
+    **kwargs):
+  """Runs `func(shard, **kwargs)` on shards of `bears` in parallel.
+
+  Args:
+    func (Callable): Module-level function of a `Bears` that keeps its rows,
+      e.g. `new_cases`, `growth_rates`, or `project`. It may return a
+      `Bears` or a dictionary of them.
+    bears (Bears): Time-series to process
+    by (str): Column whose groups stay in one shard, or `None` for row
+      blocks, see :py:func:`shard_positions`
+    num_shards (int): Number of shards. Defaults to four per worker.
+    max_workers (int): Number of processes. Defaults to the number of CPUs.
+      `1` runs the shards one after another in this process.
+    kwargs: Keyword arguments of `func`
+
+  Returns:
+    The output of `func` for all of `bears`: every `Bears` (also in a
+    dictionary) has the rows of `bears` in their original order. Data
+    frames, e.g. the flags of `detect_anomalies`, are concatenated in shard
+    order; `None` stays `None`; other values are returned as a list with
+    one item per shard. The values of the `Bears` are `float64`, also for
+    integer inputs.
+
+  If `func` fails on a shard, the exception is raised here once the shards
+  already running have finished, and their result blocks are freed.
+  """
+  if max_workers is None:
+    max_workers = os.cpu_count() or 1
+  if num_shards is None:
+    num_shards = 4 * max_workers
+  shards = shard_positions(bears, by=by, num_shards=num_shards)
+  datetime_index = bears.datetime_index
+  non_datetime_index = bears.non_datetime_index
+  block, spec = _to_shared(bears.df[datetime_index].to_numpy(dtype=float))
+  results = [None] * len(shards)
+  try:
+    tasks = [(func, kwargs, spec, positions, type(bears),
+              bears.df[non_datetime_index].iloc[positions], datetime_index)
+             for positions in shards]
+    if max_workers == 1:
+      for number, task in enumerate(tasks):
+        results[number] = _run_shard(*task)
+    else:
+      with concurrent.futures.ProcessPoolExecutor(max_workers) as executor:
+        futures = {executor.submit(_run_shard, *task): number
+                   for number, task in enumerate(tasks)}
+        try:
+          for future in concurrent.futures.as_completed(futures):
+            results[futures[future]] = future.result()
+        finally:
+          # Collect the shards still running so their blocks can be freed
+          executor.shutdown(cancel_futures=True)
+          for future, number in futures.items():
+            if not future.cancelled() and future.exception() is None:
+              results[number] = future.result()
+    return _stitch(bears, shards, results)
+  except BaseException:
+    for result in results:
+      for result_spec in _result_specs(result):
+        _free(result_spec)
+    raise
+  finally:
+    block.close()
+    block.unlink()
@@ -4,9 +4,11 @@ from __future__ import annotations
 from abc import ABC
 from typing import List, Tuple
 import copy
+import functools
 from collections import namedtuple
 from dateutil.parser import parse, ParserError
 import pandas as pd
+from fp_covid19.data.date_axis import DateAxis, date_axis
 
 CsvSpecs = namedtuple('CsvSpecs', ['url', 'uid_col_label', 'encoding'])
 """ CSV Specifications
@@ -37,9 +39,9 @@ class Bears(ABC):
     assert from_csv or dataframe is not None, (
         'Use either `from_csv` and `csv_specs` or `dataframe`')
     if from_csv:
-      self._df = self.read_time_series_csv(csv_specs)
+      self.df = self.read_time_series_csv(csv_specs)
     else:
-      self._df = dataframe
+      self.df = dataframe
 
   def __repr__(self) -> str:
     """Returns a string representation of this object"""
@@ -66,7 +68,9 @@ class Bears(ABC):
 
   @df.setter
   def df(self, dataframe): # pylint: disable=invalid-name
-    self._df = dataframe
+    """Sets the dataframe, relabeling its date columns `%m/%d/%Y` in a new
+    `pd.DataFrame` rather than in place"""
+    self._df = _with_date_labels(dataframe)
 
   @property
   def non_datetime_index(self):
@@ -80,6 +84,12 @@ class Bears(ABC):
     _, datetime_index = self.partition_datetime_columns()
     return datetime_index
 
+  @property
+  def date_axis(self) -> DateAxis:
+    """Returns the memoized :py:class:`DateAxis` of `datetime_index`, e.g.
+    `bears.date_axis.epochs` for `TimeSliderChoropleth` timestamps"""
+    return date_axis(self.datetime_index)
+
   def read_time_series_csv(
       self, csv_specs: CsvSpecs, drop_all_na_columns=True) -> pd.DataFrame:
     """Initializes obejct from a CSV file
@@ -106,53 +116,144 @@ class Bears(ABC):
     return self.df
 
   def partition_datetime_columns(self) -> Tuple[List, List]:
-    """Partitions dataframe columns into non-datetime vs. datetime"""
-    # Time-series column labels are packed to the right
-    first_date_col = None
-    for first_date_col_label in self.df.columns:
-      first_date_col = 0 if first_date_col is None else first_date_col + 1
-      try:
-        parse(first_date_col_label)
-        break
-      except ParserError:
-        continue
-    assert first_date_col is not None and first_date_col < self.df.shape[1], (
-        'Could not find time-series column labels. Expected '
-        'a consecutive list of date labels but instead saw this list of '
-        'column labels: {col_labels}').format(col_labels=self.df.columns)
-    for should_be_date_label in self.df.columns[first_date_col:]:
-      try:
-        parse(should_be_date_label)
-      except ParserError as mesg:
-        raise ParserError((
-            'Expecting all column labels to be dates starting with {} in '
-            '{}. {}').format(self.df[first_date_col], self.df.columns, mesg))
-    # rename date columns to %m/%d/%yy
-    column_rename_dict = {}
-    for date in self.df.columns[first_date_col:].tolist():
-      datecode = parse(date)
-      column_rename_dict[date] = '{}/{}/{}'.format(
-          datecode.month, datecode.day, datecode.year)
-    self.df.rename(columns=column_rename_dict, inplace=True)
-    return (self.df.columns[0:first_date_col].tolist(),
-            self.df.columns[first_date_col:].tolist())
-
-  def copy(self, deep=True) -> Bears:
+    """Partitions dataframe columns into non-datetime vs. datetime.
+
+    Never modifies `self.df`, so concurrent readers of one `Bears` are safe.
+    Date labels are normalized when the dataframe is set; a dataframe whose
+    labels were changed in place since is relabeled into a new object.
+    """
+    labels = tuple(self._df.columns)
+    first_date_col, date_labels = _partition_labels(labels)
+    if date_labels != labels[first_date_col:]:
+      self._df = self._df.set_axis(
+          list(labels[:first_date_col] + date_labels), axis='columns')
+    return list(labels[:first_date_col]), list(date_labels)
+
+  def copy(self, deep=None) -> Bears:
     """Makes a copy of the Pandas `DataFrame`.
 
     Args:
       deep (bool): `True` if deep copy. Calls `pd.DataFrame.copy(deep)`.
+        `None` (default) copies on write: a shallow copy if Pandas has
+        copy-on-write enabled, in which case the first write to either
+        object copies only the columns it touches, and a deep copy
+        otherwise.
 
     Returns:
       A new instance of `Bears`
     """
+    if deep is None:
+      deep = not copy_on_write_enabled()
     new_self = copy.copy(self)
     new_self.df = self.df.copy(deep)
     return new_self
 
-  def latest(self, deep=True) -> Bears:
-    """Returns the latest date in the time series"""
-    new_self = self.copy(deep)
-    new_self.df = new_self.df[
-        new_self.non_datetime_index + [new_self.datetime_index[-1]]]
+  def derive(self, values=None, datetime_index: List = None) -> Bears:
+    """Makes a new `Bears` that shares the non-datetime columns of this one.
+
+    Derived time-series such as new or per-capita cases keep the metadata
+    columns and replace every date column, so copying the whole
+    `DataFrame` first and then overwriting the dates holds two full copies
+    at once. This method allocates only the new datetime block.
+
+    Args:
+      values (np.ndarray or pd.DataFrame): Region-by-day values in row order
+        of `self.df`. If `None`, selects the existing `datetime_index`
+        columns.
+      datetime_index (List[str]): Datetime column labels of the new object.
+        Defaults to `self.datetime_index`.
+
+    Returns:
+      A new instance of the same type as `self`
+    """
+    non_datetime_index, all_datetime_index = self.partition_datetime_columns()
+    if datetime_index is None:
+      datetime_index = all_datetime_index
+    if values is None:
+      values = self.df[datetime_index]
+    elif not isinstance(values, pd.DataFrame):
+      values = pd.DataFrame(
+          values, index=self.df.index, columns=datetime_index)
+    new_self = copy.copy(self)
+    new_self.df = pd.concat(
+        [self.df[non_datetime_index], values], axis='columns')
     return new_self
+
+  def latest(self, deep=None) -> Bears:
+    """Returns the latest date in the time series
+
+    Args:
+      deep (bool): Copies the result like :py:meth:`copy`. Only the
+        metadata and the latest date column are copied.
+    """
+    return self.derive(datetime_index=self.datetime_index[-1:]).copy(deep)
+
+
+@functools.lru_cache(maxsize=256)
+def _partition_labels(labels: tuple) -> Tuple[int, tuple]:
+  """Finds the first date column and normalizes the date labels.
+
+  Memoized, so the labels of a dataframe are parsed only once.
+
+  Args:
+    labels (tuple): Column labels
+
+  Returns:
+    Tuple[int, tuple]:
+    Position of the first date column and the date labels as `%m/%d/%Y`
+    without leading zeros
+  """
+  # Time-series column labels are packed to the right
+  first_date_col = None
+  for position, first_date_col_label in enumerate(labels):
+    try:
+      parse(first_date_col_label)
+      first_date_col = position
+      break
+    except (ParserError, TypeError):
+      continue
+  assert first_date_col is not None, (
+      'Could not find time-series column labels. Expected '
+      'a consecutive list of date labels but instead saw this list of '
+      'column labels: {col_labels}').format(col_labels=list(labels))
+  date_labels = []
+  for should_be_date_label in labels[first_date_col:]:
+    try:
+      datecode = parse(should_be_date_label)
+    except ParserError as mesg:
+      raise ParserError((
+          'Expecting all column labels to be dates starting with {} in '
+          '{}. {}').format(labels[first_date_col], list(labels), mesg))
+    date_labels.append('{}/{}/{}'.format(
+        datecode.month, datecode.day, datecode.year))
+  return first_date_col, tuple(date_labels)
+
+
+def _with_date_labels(dataframe: pd.DataFrame) -> pd.DataFrame:
+  """Returns `dataframe`, or a relabeled shallow copy if its date labels are
+  not yet `%m/%d/%Y`. Dataframes without date columns are returned as is."""
+  if dataframe is None:
+    return dataframe
+  labels = tuple(dataframe.columns)
+  try:
+    first_date_col, date_labels = _partition_labels(labels)
+  except (AssertionError, ParserError, TypeError):
+    return dataframe
+  if date_labels == labels[first_date_col:]:
+    return dataframe
+  return dataframe.set_axis(
+      list(labels[:first_date_col] + date_labels), axis='columns')
+
+
+def copy_on_write_enabled() -> bool:
+  """Returns `True` if Pandas defers copies until an object is written to.
+
+  Copy-on-write is always on as of Pandas 3.0 and opt-in as of 2.0 via
+  `pd.set_option('mode.copy_on_write', True)`.
+  """
+  if int(pd.__version__.split('.')[0]) >= 3:
+    return True
+  try:
+    return pd.get_option('mode.copy_on_write') is True
+  except KeyError: # Pandas < 2.0: `OptionError` is a `KeyError`
+    return False
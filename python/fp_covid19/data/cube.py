@@ -0,0 +1,371 @@
+# -*- coding: utf-8 -*-
+"""Multi-Source Case Cube
+
+The loaders return one nested `{db_type: {geo_level: Bears}}` dictionary per
+source, each with its own rows and dates, so every comparison realigns them.
+:py:class:`CaseCube` aligns them once: source x metric x region x day counts
+in one `np.ndarray` with shared, canonical axes. Regions are integer FIPS
+codes for counties (see :py:func:`fp_covid19.cases.reconcile.canonical_fips`)
+and state names for states; days are the union of the source dates.
+
+Selections and reductions name their axis, and arithmetic between cubes
+broadcasts over named axes, so cross-source, cross-metric, and cross-region
+computations are single array operations:
+
+  >>> cube = CaseCube.from_sources({
+  ...     'jhu_csse': jhu_csse.get_covid19_us_bears(),
+  ...     'usafacts': usafacts.get_covid19_us_bears()})
+  >>> cfr = cube.sel(metric='deaths') / cube.sel(metric='confirmed')
+  >>> gap = cube.sel(source='jhu_csse') - cube.sel(source='usafacts')
+  >>> share = cube / cube.sum('region') # share of the national count
+  >>> states = cube.rollup('region', cube.regions['Province_State'])
+"""
+from __future__ import annotations
+from typing import Callable, Dict, List, Sequence
+import numpy as np
+import pandas as pd
+from fp_covid19.cases.reconcile import canonical_fips
+from fp_covid19.data.bears import Bears
+
+CUBE_DIMS = ('source', 'metric', 'region', 'day')
+"""Axis names of a cube built by :py:meth:`CaseCube.from_sources`"""
+REGION_INFO_COLS = ['Combined_Key', 'Admin2', 'Province_State', 'FIPS']
+"""Non-datetime columns kept in :py:attr:`CaseCube.regions`"""
+
+_REDUCTIONS = {
+    'sum': np.nansum, 'mean': np.nanmean, 'median': np.nanmedian,
+    'min': np.nanmin, 'max': np.nanmax, 'std': np.nanstd,
+    'count': lambda values, axis: np.sum(~np.isnan(values), axis=axis),
+}
+
+
+class CaseCube:
+  """Counts on named axes, e.g. source x metric x region x day.
+
+  Args:
+    values (np.ndarray): `float` array with one axis per entry of `axes`
+    axes (Dict[str, Sequence]): Axis name to axis labels, in axis order.
+      `'day'` labels are dates.
+    regions (pd.DataFrame): Metadata of the `'region'` labels, e.g. county
+      names and states, indexed by region
+  """
+  def __init__(
+      self, values: np.ndarray, axes: Dict[str, Sequence],
+      regions: pd.DataFrame = None):
+    self.axes = {dim: pd.Index(labels) for dim, labels in axes.items()}
+    if 'day' in self.axes:
+      self.axes['day'] = pd.DatetimeIndex(self.axes['day'], name='day')
+    self.values = np.asarray(values, dtype=float)
+    assert self.values.shape == tuple(len(labels)
+                                      for labels in self.axes.values()), (
+        'values of shape {} do not match axes {}'.format(
+            self.values.shape, self.shape))
+    self.regions = regions
+    """Metadata of the region labels, or `None`"""
+
+  @property
+  def dims(self) -> List[str]:
+    """Axis names in axis order"""
+    return list(self.axes)
+
+  @property
+  def shape(self) -> Dict[str, int]:
+    """Axis name to axis length"""
+    return {dim: len(labels) for dim, labels in self.axes.items()}
+
+  def __repr__(self) -> str:
+    return 'CaseCube({})'.format(', '.join(
+        '{}: {}'.format(dim, length) for dim, length in self.shape.items()))
+
+  @classmethod
+  def from_sources(
+      cls,
+      sources: Dict[str, Dict[str, Dict[str, Bears]]],
+      geo_level: str = 'counties',
+      metrics: List[str] = None,
+      join: str = 'outer',
+      fips_col: str = 'FIPS') -> CaseCube:
+    """Aligns the loader outputs of several sources into one cube.
+
+    Regions or days missing from a source are `NaN`. If a source lists a
+    FIPS code more than once, e.g. several unassigned areas, its first row
+    is used.
+
+    Args:
+      sources (Dict[str, Dict[str, Dict[str, Bears]]]): Source name to
+        `{db_type: {geo_level: Bears}}`, e.g. from `get_covid19_us_bears()`
+      geo_level (str): `'counties'` (regions are FIPS codes) or `'states'`
+        (regions are the row index, i.e. state names)
+      metrics (List[str]): `db_type` keys. Defaults to those of every
+        source, e.g. `['confirmed', 'deaths']`.
+      join (str): `'outer'` keeps regions and days of any source,
+        `'inner'` only those of every source and metric
+      fips_col (str): Column label of the FIPS codes
+
+    Returns:
+      CaseCube:
+      Axes `('source', 'metric', 'region', 'day')`
+    """
+    assert join in ('outer', 'inner'), 'join must be outer or inner'
+    if metrics is None:
+      metrics = sorted(set.intersection(
+          *[set(nested) for nested in sources.values()]))
+    blocks = {}
+    for source, nested in sources.items():
+      for metric in metrics:
+        bears = nested[metric][geo_level]
+        if geo_level == 'counties':
+          keys = canonical_fips(bears.df[fips_col])
+        else:
+          keys = bears.df.index.astype(str).to_numpy()
+        datetime_index = bears.datetime_index
+        blocks[source, metric] = (
+            bears, keys, datetime_index,
+            bears.date_axis.datetimes.tz_localize(None))
+
+    combine = (lambda a, b: a.union(b)) if join == 'outer' else (
+        lambda a, b: a.intersection(b))
+    region_axis = day_axis = None
+    for bears, keys, _, dates in blocks.values():
+      valid = pd.Index(keys[keys >= 0] if keys.dtype.kind == 'i' else keys)
+      region_axis = valid if region_axis is None else combine(
+          region_axis, valid)
+      day_axis = dates if day_axis is None else combine(day_axis, dates)
+    region_axis = region_axis.unique().sort_values()
+    day_axis = day_axis.unique().sort_values()
+
+    values = np.full((len(sources), len(metrics), len(region_axis),
+                      len(day_axis)), np.nan)
+    regions = None
+    for (source, metric), (bears, keys, datetime_index, dates) in (
+        blocks.items()):
+      unique_keys, first = np.unique(keys, return_index=True)
+      rows = region_axis.get_indexer(unique_keys)
+      found = rows >= 0
+      cols = day_axis.get_indexer(dates)
+      day_found = cols >= 0
+      block = bears.df[datetime_index].to_numpy(dtype=float)
+      values[list(sources).index(source), metrics.index(metric)][
+          np.ix_(rows[found], cols[day_found])] = (
+              block[np.ix_(first[found], np.flatnonzero(day_found))])
+      info_cols = [col for col in REGION_INFO_COLS if col in bears.df.columns]
+      if info_cols:
+        info = bears.df.iloc[first[found]][info_cols].set_axis(
+            region_axis[rows[found]])
+        regions = info if regions is None else regions.combine_first(info)
+    if regions is not None:
+      regions = regions.reindex(region_axis)[
+          [col for col in REGION_INFO_COLS if col in regions.columns]]
+    return cls(
+        values,
+        {'source': list(sources), 'metric': list(metrics),
+         'region': pd.Index(region_axis, name='region'), 'day': day_axis},
+        regions=regions)
+
+  def _derived(self, values: np.ndarray, axes: Dict) -> CaseCube:
+    regions = self.regions
+    if regions is not None and 'region' in axes:
+      regions = regions.reindex(axes['region'])
+    return CaseCube(values, axes, regions=regions if 'region' in axes else None)
+
+  def _positions(self, dim: str, selector):
+    """Integer positions of `selector` on axis `dim`, or a single position
+    if `selector` is a scalar label"""
+    labels = self.axes[dim]
+    if isinstance(selector, slice):
+      if dim == 'day':
+        selector = slice(
+            None if selector.start is None else pd.Timestamp(selector.start),
+            None if selector.stop is None else pd.Timestamp(selector.stop))
+      return np.arange(len(labels))[labels.slice_indexer(
+          selector.start, selector.stop, selector.step)]
+    if np.ndim(selector) == 0:
+      if dim == 'day':
+        selector = pd.Timestamp(selector)
+      return labels.get_loc(selector)
+    if dim == 'day':
+      selector = pd.DatetimeIndex(pd.to_datetime(list(selector)))
+    positions = labels.get_indexer(selector)
+    assert (positions >= 0).all(), 'Labels not on axis {}: {}'.format(
+        dim, list(np.asarray(selector)[positions < 0]))
+    return positions
+
+  def sel(self, **selectors) -> CaseCube:
+    """Selects labels by axis name.
+
+    A scalar label drops its axis; a list of labels or a slice keeps it.
+    Days accept anything `pd.Timestamp` accepts, e.g. `'2020-04-01'` or a
+    `Bears` date label.
+
+    Examples:
+      >>> cube.sel(source='usafacts', metric='confirmed')
+      >>> cube.sel(region=[6037, 36061], day=slice('2020-04-01', None))
+
+    Returns:
+      CaseCube
+    """
+    index = []
+    axes = {}
+    for dim, labels in self.axes.items():
+      if dim not in selectors:
+        index.append(slice(None))
+        axes[dim] = labels
+        continue
+      positions = self._positions(dim, selectors[dim])
+      index.append(positions)
+      if np.ndim(positions):
+        axes[dim] = labels[positions]
+    # One advanced index at a time keeps every list-selected axis in place
+    values = self.values
+    for axis, positions in reversed(list(enumerate(index))):
+      if not isinstance(positions, slice):
+        values = np.take(values, positions, axis=axis)
+    return self._derived(values, axes)
+
+  def reduce(self, dim: str, func='sum') -> CaseCube:
+    """Reduces axis `dim`, ignoring `NaN`.
+
+    Args:
+      dim (str): Axis name
+      func (str or Callable): `'sum'`, `'mean'`, `'median'`, `'min'`,
+        `'max'`, `'std'`, `'count'`, or `func(values, axis=...)`
+
+    Returns:
+      CaseCube:
+      Without axis `dim`
+    """
+    func = _REDUCTIONS.get(func, func)
+    axis = self.dims.index(dim)
+    with np.errstate(invalid='ignore', divide='ignore'):
+      values = func(self.values, axis=axis)
+    return self._derived(
+        values, {name: labels for name, labels in self.axes.items()
+                 if name != dim})
+
+  def sum(self, dim: str) -> CaseCube:
+    """Sums axis `dim`, `NaN` as zero"""
+    return self.reduce(dim, 'sum')
+
+  def mean(self, dim: str) -> CaseCube:
+    """Averages axis `dim`, ignoring `NaN`"""
+    return self.reduce(dim, 'mean')
+
+  def max(self, dim: str) -> CaseCube:
+    """Maximum along axis `dim`, ignoring `NaN`"""
+    return self.reduce(dim, 'max')
+
+  def rollup(self, dim: str, keys: Sequence) -> CaseCube:
+    """Sums the labels of axis `dim` that share a key, e.g. counties into
+    states, in one grouped reduction like
+    :py:func:`fp_covid19.cases.compute.rollup_df`.
+
+    Args:
+      dim (str): Axis name
+      keys (Sequence): Group key of every label of `dim`, e.g.
+        `cube.regions['Province_State']`. Labels with a `NaN` key are
+        dropped.
+
+    Returns:
+      CaseCube:
+      Axis `dim` relabeled by the sorted unique keys
+    """
+    codes, groups = pd.factorize(pd.Series(np.asarray(keys)), sort=True)
+    axis = self.dims.index(dim)
+    keep = np.flatnonzero(codes >= 0)
+    order = keep[np.argsort(codes[keep], kind='stable')]
+    sorted_codes = codes[order]
+    values = np.nan_to_num(np.take(self.values, order, axis=axis), nan=0.)
+    if len(order):
+      starts = np.flatnonzero(
+          np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+      values = np.add.reduceat(values, starts, axis=axis)
+    axes = dict(self.axes)
+    axes[dim] = pd.Index(groups, name=dim)
+    return CaseCube(values, axes)
+
+  def diff(self, dim: str = 'day', periods: int = 1) -> CaseCube:
+    """Differences along axis `dim`, e.g. new cases from cumulative ones.
+    The first `periods` labels are `NaN`."""
+    axis = self.dims.index(dim)
+    values = np.full(self.values.shape, np.nan)
+    source = [slice(None)] * self.values.ndim
+    target = list(source)
+    source[axis], target[axis] = slice(None, -periods), slice(periods, None)
+    values[tuple(target)] = (
+        self.values[tuple(target)] - self.values[tuple(source)])
+    return self._derived(values, self.axes)
+
+  def _binary(self, other, operator: Callable) -> CaseCube:
+    """Applies `operator` elementwise, broadcasting over named axes.
+
+    Shared axes must have identical labels; an axis that only one operand
+    has is broadcast.
+    """
+    if not isinstance(other, CaseCube):
+      with np.errstate(invalid='ignore', divide='ignore'):
+        return self._derived(operator(self.values, other), self.axes)
+    axes = dict(self.axes)
+    for dim, labels in other.axes.items():
+      if dim in axes:
+        assert axes[dim].equals(labels), (
+            'Axis {} differs between the operands; select the common '
+            'labels first'.format(dim))
+      else:
+        axes[dim] = labels
+
+    def expand(cube):
+      order = [cube.dims.index(dim) for dim in axes if dim in cube.axes]
+      values = np.transpose(cube.values, order)
+      return values.reshape([len(labels) if dim in cube.axes else 1
+                             for dim, labels in axes.items()])
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+      values = operator(expand(self), expand(other))
+    regions = self.regions if self.regions is not None else other.regions
+    cube = CaseCube(values, axes)
+    if 'region' in axes and regions is not None:
+      cube.regions = regions.reindex(axes['region'])
+    return cube
+
+  def __add__(self, other):
+    return self._binary(other, np.add)
+
+  def __sub__(self, other):
+    return self._binary(other, np.subtract)
+
+  def __mul__(self, other):
+    return self._binary(other, np.multiply)
+
+  def __truediv__(self, other):
+    """Division; zero denominators give `NaN` (or `inf`), never errors"""
+    return self._binary(other, np.divide)
+
+  def to_dataframe(self) -> pd.DataFrame:
+    """Converts a cube with at most two axes to a `pd.DataFrame`, the first
+    axis as rows"""
+    assert self.values.ndim <= 2, 'Select or reduce to two axes first'
+    labels = list(self.axes.values())
+    if self.values.ndim == 1:
+      return pd.DataFrame({'value': self.values}, index=labels[0])
+    return pd.DataFrame(self.values, index=labels[0], columns=labels[1])
+
+  def to_bears(self) -> Bears:
+    """Converts a region x day cube to a `Bears`.
+
+    Rows keep the region metadata columns, and date columns are labeled
+    `M/D/YYYY` like the loaders.
+
+    Returns:
+      Bears
+    """
+    assert self.dims == ['region', 'day'], (
+        'Select or reduce to the region and day axes first, got {}'.format(
+            self.dims))
+    days = self.axes['day']
+    dataframe = pd.DataFrame(
+        self.values, index=self.axes['region'],
+        columns=['{}/{}/{}'.format(day.month, day.day, day.year)
+                 for day in days])
+    if self.regions is not None:
+      dataframe = pd.concat([self.regions, dataframe], axis='columns')
+    return Bears(dataframe=dataframe)
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""Vectorized Conversions of `Bears` Date Column Labels
+
+`Bears.datetime_index` is a list of `%m/%d/%Y` strings. Slider timestamps,
+charts, and exports need the same dates as POSIX time, ISO 8601 strings, or
+day offsets. This module converts a whole axis in one call and memoizes the
+result, so every `Bears` with the same dates, e.g. confirmed and deaths
+counties and states, shares one set of conversions.
+
+All dates are midnight UTC. Unlike `time.mktime`, the epochs do not depend on
+the time zone of the machine that builds the map.
+"""
+from __future__ import annotations
+from typing import List, Sequence
+import functools
+import numpy as np
+import pandas as pd
+
+DATE_LABEL_FORMAT = '%m/%d/%Y'
+"""Format of `Bears.datetime_index` labels after
+   `Bears.partition_datetime_columns()`"""
+
+
+class DateAxis:
+  """Conversions of one sequence of date labels, computed once.
+
+  Use :py:func:`date_axis` rather than the constructor, so `Bears` that share
+  a date axis share one instance.
+
+  Args:
+    labels (Sequence[str]): Date labels, e.g. `Bears.datetime_index`
+    date_format (str): `strptime` format of the labels. If `None`, Pandas
+      infers the format.
+  """
+  def __init__(self, labels: Sequence[str], date_format=DATE_LABEL_FORMAT):
+    self.labels = tuple(labels)
+    self.date_format = date_format
+
+  def __len__(self) -> int:
+    return len(self.labels)
+
+  def __repr__(self) -> str:
+    return 'DateAxis({} days, {} to {})'.format(
+        len(self), self.labels[0] if self.labels else None,
+        self.labels[-1] if self.labels else None)
+
+  @functools.cached_property
+  def datetimes(self) -> pd.DatetimeIndex:
+    """Dates as a UTC `pd.DatetimeIndex`"""
+    try:
+      return pd.to_datetime(
+          pd.Index(self.labels), format=self.date_format, utc=True)
+    except ValueError:
+      return pd.to_datetime(pd.Index(self.labels), utc=True)
+
+  @functools.cached_property
+  def epochs(self) -> np.ndarray:
+    """Dates as POSIX time (`np.int64` seconds since the Epoch)"""
+    epochs = ((self.datetimes - pd.Timestamp(0, tz='UTC'))
+              // pd.Timedelta(seconds=1)).to_numpy(dtype=np.int64)
+    epochs.flags.writeable = False
+    return epochs
+
+  @functools.cached_property
+  def epoch_strings(self) -> List[str]:
+    """POSIX times as strings, the `styledict` time keys of
+    `TimeSliderChoropleth`"""
+    return [str(epoch) for epoch in self.epochs.tolist()]
+
+  @functools.cached_property
+  def iso(self) -> List[str]:
+    """Dates as ISO 8601 strings, `YYYY-MM-DD`"""
+    return self.datetimes.strftime('%Y-%m-%d').tolist()
+
+  def day_offsets(self, origin=None) -> np.ndarray:
+    """Days since `origin`.
+
+    Args:
+      origin: Anything `pd.Timestamp` accepts. Defaults to the first date
+        of the axis.
+
+    Returns:
+      np.ndarray:
+      `np.int64` day offsets
+    """
+    origin = self.datetimes[0] if origin is None else pd.Timestamp(origin)
+    if origin.tzinfo is None:
+      origin = origin.tz_localize('UTC')
+    return ((self.datetimes - origin) // pd.Timedelta(days=1)).to_numpy()
+
+  def is_contiguous(self) -> bool:
+    """Returns `True` if the dates are consecutive days"""
+    return bool((np.diff(self.epochs) == 86400).all())
+
+
+@functools.lru_cache(maxsize=64)
+def _date_axis(labels: tuple, date_format: str) -> DateAxis:
+  return DateAxis(labels, date_format=date_format)
+
+
+def date_axis(labels: Sequence[str], date_format=DATE_LABEL_FORMAT) -> DateAxis:
+  """Returns the memoized :py:class:`DateAxis` of `labels`.
+
+  Args:
+    labels (Sequence[str]): Date labels, e.g. `Bears.datetime_index`
+    date_format (str): `strptime` format of the labels
+
+  Returns:
+    DateAxis:
+    The same instance for equal `labels` and `date_format`
+  """
+  return _date_axis(tuple(labels), date_format)
+
+
+def to_epochs(labels: Sequence[str], date_format=DATE_LABEL_FORMAT) -> np.ndarray:
+  """Converts date labels to POSIX time in one call.
+
+  Args:
+    labels (Sequence[str]): Date labels, e.g. `Bears.datetime_index`
+    date_format (str): `strptime` format of the labels. If `None`, Pandas
+      infers the format.
+
+  Returns:
+    np.ndarray:
+    `np.int64` seconds since the Epoch, at midnight UTC
+  """
+  return date_axis(labels, date_format=date_format).epochs
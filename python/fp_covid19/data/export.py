@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""Partitioned Parquet Export of the Case Cube
+
+Writes nested `{db_type: {geo_level: Bears}}` dictionaries, e.g. cumulative
+cases from the loaders and the derived new-case and per-capita series, as one
+long-format Arrow dataset with one row per region and date::
+
+  <directory>/series=new/db_type=confirmed/geo_level=counties/
+      state=Ohio/month=2020-04/part-2020-04-01-2020-04-30-<token>-0.parquet
+
+Within a file, rows are sorted by region and date, region keys are
+dictionary-encoded, and every row group keeps min/max statistics, so readers
+skip files by partition and row groups by region or date::
+
+  >>> import pyarrow.dataset as ds
+  >>> cube = ds.dataset('cube', partitioning='hive')
+  >>> cube.to_table(filter=(ds.field('series') == 'per_capita')
+  ...                      & (ds.field('state') == 'Ohio')
+  ...                      & (ds.field('date') >= datetime.date(2020, 4, 1)))
+
+In append mode, only the dates after the last export of each series are
+written, so a nightly export stays cheap as the history grows.
+"""
+from __future__ import annotations
+from typing import Dict
+import json
+import os
+import shutil
+import uuid
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from fp_covid19.data.bears import Bears
+
+PARTITION_FIELDS = ['series', 'db_type', 'geo_level', 'state', 'month']
+"""Hive partition keys, outermost first"""
+MANIFEST_FILE = '_manifest.json'
+"""Last exported date of every `series/db_type/geo_level`"""
+
+
+def region_keys(bears: Bears):
+  """Returns the region keys and states of the rows of `bears`.
+
+  Regions are the `Combined_Key` column if there is one, else the row index,
+  e.g. the state names of state-level `Bears`. States are the
+  `Province_State` column if there is one, else the region keys.
+
+  Returns:
+    Tuple[pd.Index, pd.Index]:
+    `(regions, states)` as strings
+  """
+  dataframe = bears.df
+  regions = (dataframe['Combined_Key'] if 'Combined_Key' in dataframe.columns
+             else dataframe.index.to_series())
+  regions = pd.Index(regions.astype(str))
+  states = (pd.Index(dataframe['Province_State'].astype(str))
+            if 'Province_State' in dataframe.columns else regions)
+  return regions, states
+
+
+def long_table(bears: Bears, datetime_index=None) -> pa.Table:
+  """Converts `bears` to a long-format Arrow table.
+
+  Args:
+    bears (Bears): Region-by-day time-series
+    datetime_index (List[str]): Date labels to convert. Defaults to all
+      dates.
+
+  Returns:
+    pa.Table:
+    Columns `state`, `month` (`YYYY-MM`), `region` (dictionary-encoded),
+    `FIPS` (dictionary-encoded, if `bears` has FIPS codes, null for rows
+    without one), `date` (`date32`), and `value` (`float64`), sorted by
+    state, region, and date.
+    Missing values are dropped.
+  """
+  all_dates = bears.datetime_index
+  if datetime_index is None:
+    datetime_index = all_dates
+  positions = [all_dates.index(date) for date in datetime_index]
+  dates = bears.date_axis.datetimes[positions].tz_localize(None)
+  regions, states = region_keys(bears)
+  region_codes, region_labels = pd.factorize(regions, sort=True)
+  values = bears.df[datetime_index].to_numpy(dtype=float)
+
+  num_regions, num_days = values.shape
+  state_codes, _ = pd.factorize(states, sort=True)
+  order = np.lexsort((region_codes, state_codes))
+  rows = np.repeat(order, num_days)
+  days = np.tile(np.arange(num_days), num_regions)
+  values = values[order].ravel()
+  keep = ~np.isnan(values)
+  rows, days, values = rows[keep], days[keep], values[keep]
+
+  columns = {
+      'state': pa.array(np.asarray(states)[rows], type=pa.string()),
+      'month': pa.array(np.asarray(dates.strftime('%Y-%m'))[days],
+                        type=pa.string()),
+      'region': pa.DictionaryArray.from_arrays(
+          pa.array(region_codes[rows], type=pa.int32()),
+          pa.array(np.asarray(region_labels), type=pa.string())),
+  }
+  if 'FIPS' in bears.df.columns:
+    fips_codes, fips_labels = pd.factorize(
+        bears.df['FIPS'].astype(str), sort=True)
+    fips_codes = fips_codes[rows]
+    # Rows without FIPS, coded -1, become null
+    columns['FIPS'] = pa.DictionaryArray.from_arrays(
+        pa.array(fips_codes, mask=fips_codes < 0, type=pa.int32()),
+        pa.array(np.asarray(fips_labels), type=pa.string()))
+  columns['date'] = pa.array(
+      dates.to_numpy(dtype='datetime64[D]')[days], type=pa.date32())
+  columns['value'] = pa.array(values, type=pa.float64())
+  return pa.table(columns)
+
+
+def read_manifest(directory: str) -> Dict[str, Dict]:
+  """Returns `{'series/db_type/geo_level': {'last_date': 'YYYY-MM-DD',
+  'rows': int}}` of the last exports, or `{}`"""
+  path = os.path.join(directory, MANIFEST_FILE)
+  if not os.path.exists(path):
+    return {}
+  with open(path) as manifest_file:
+    return json.load(manifest_file)
+
+
+def _write_manifest(directory: str, manifest: Dict):
+  path = os.path.join(directory, MANIFEST_FILE)
+  with open(path + '.tmp', 'w') as manifest_file:
+    json.dump(manifest, manifest_file, indent=1, sort_keys=True)
+  os.replace(path + '.tmp', path)
+
+
+def export_cube(
+    cube: Dict[str, Dict[str, Dict[str, Bears]]],
+    directory: str,
+    mode: str = 'append',
+    max_rows_per_group: int = 65536) -> Dict[str, int]:
+  """Writes series of nested `Bears` dictionaries as a partitioned dataset.
+
+  Examples:
+    >>> export_cube({'cumulative': covid19, 'new': new_cases_dict,
+    ...              'per_capita': per_capita_dict}, 'cube')
+
+  Args:
+    cube (Dict[str, Dict[str, Dict[str, Bears]]]): `{series: {db_type:
+      {geo_level: Bears}}}`, e.g. `{'cumulative': get_covid19_us_bears()}`
+    directory (str): Root of the dataset
+    mode (str): `'append'` writes only the dates after the last export of
+      each series. Revisions of exported dates are not detected; export
+      with `'overwrite'` after a revision. `'overwrite'` deletes and rewrites
+      every series in `cube`.
+    max_rows_per_group (int): Parquet row group size. Smaller groups prune
+      more finely.
+
+  Returns:
+    Dict[str, int]:
+    Number of rows written per `series/db_type/geo_level`
+  """
+  assert mode in ('append', 'overwrite'), 'mode must be append or overwrite'
+  os.makedirs(directory, exist_ok=True)
+  manifest = read_manifest(directory)
+  written = {}
+  for series, db_types in cube.items():
+    for db_type, levels in db_types.items():
+      for geo_level, bears in levels.items():
+        name = '/'.join([series, db_type, geo_level])
+        datetime_index = bears.datetime_index
+        iso = bears.date_axis.iso
+        last_date = manifest.get(name, {}).get('last_date')
+        if mode == 'overwrite' or last_date is None:
+          shutil.rmtree(os.path.join(
+              directory, 'series=' + series, 'db_type=' + db_type,
+              'geo_level=' + geo_level), ignore_errors=True)
+          manifest.pop(name, None)
+          new = list(range(len(iso)))
+        else:
+          new = [i for i, date in enumerate(iso) if date > last_date]
+        written[name] = 0
+        if not new:
+          continue
+        table = long_table(bears, [datetime_index[i] for i in new])
+        num_rows = table.num_rows
+        for label, value in [('geo_level', geo_level), ('db_type', db_type),
+                             ('series', series)]:
+          table = table.add_column(
+              0, label, pa.array([value] * num_rows, type=pa.string()))
+        ds.write_dataset(
+            table, directory, format='parquet',
+            partitioning=ds.partitioning(
+                table.select(PARTITION_FIELDS).schema, flavor='hive'),
+            basename_template='part-{}-{}-{}-{{i}}.parquet'.format(
+                iso[new[0]], iso[new[-1]], uuid.uuid4().hex[:8]),
+            existing_data_behavior='overwrite_or_ignore',
+            max_rows_per_group=max_rows_per_group,
+            min_rows_per_group=min(max_rows_per_group, 4096))
+        written[name] = num_rows
+        manifest[name] = {
+            'last_date': iso[new[-1]],
+            'rows': manifest.get(name, {}).get('rows', 0) + num_rows}
+        _write_manifest(directory, manifest)
+  return written
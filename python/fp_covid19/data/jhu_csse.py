@@ -5,8 +5,9 @@ from typing import Dict
 import numpy as np
 import pandas as pd
 from fp_covid19.data.bears import Bears, CsvSpecs
-from fp_covid19.cases.compute import (
-    counties2states_df, assert_all_not_na)
+from fp_covid19.cases.compute import counties2states_df, rollup_df
+from fp_covid19.data.validation import (
+    GLOBAL_PROVINCES_SCHEMA, US_COUNTIES_SCHEMA, assert_valid)
 
 CSV_URL_ROOT = (
     'https://raw.githubusercontent.com/'
@@ -16,6 +17,14 @@ CSV_FILE_PREFIX = 'time_series_covid19'
 CSV_COL_UID = 'UID'
 CSV_ENCODING = 'ISO-8859-1'
 CSV_COLUMN_RENAME_DICT = {} # de facto standard
+CSV_GLOBAL_COLUMN_RENAME_DICT = {
+    'Province/State': 'Province_State',
+    'Country/Region': 'Country_Region',
+    'Long': 'Long_',
+}
+GEO_DF_URL = (
+    'https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/'
+    'csse_covid_19_data/UID_ISO_FIPS_LookUp_Table.csv')
 
 def attribution() -> str:
   """Returns data attribution string"""
@@ -58,6 +67,7 @@ class JhuCsse(Bears):
 
     Note:
       This function converts the FIPS code into a string without leading zeros.
+      Rows without FIPS keep `NaN`.
 
     Note:
       As of 4/4/2020, the U.S. county file
@@ -87,16 +97,62 @@ class JhuCsse(Bears):
     """
     dataframe = super().read_time_series_csv(
         csv_specs=csv_specs, drop_all_na_columns=drop_all_na_columns)
-    # Turn FIPS into strings without leading zeros to match most GeoJSON files
-    dataframe.loc[:, 'FIPS'] = (
-        dataframe.FIPS.values.astype(np.int64).astype(str))
+    # Turn FIPS into strings without leading zeros to match most GeoJSON
+    # files. Rows without FIPS keep N/A.
+    fips = dataframe['FIPS']
+    dataframe['FIPS'] = fips.astype('Int64').astype(str).where(
+        fips.notna(), np.nan)
     return dataframe
 
 
+def global_combined_key(dataframe: pd.DataFrame) -> pd.Series:
+  """Forms `Combined_Key` from `Province_State` and `Country_Region`.
+
+  Matches the JHU look-up table: `'Hubei, China'` for provinces and `'Italy'`
+  for country-level rows.
+  """
+  province = dataframe['Province_State']
+  country = dataframe['Country_Region'].astype(str)
+  return pd.Series(
+      np.where(province.isna(), country, province.astype(str) + ', ' + country),
+      index=dataframe.index)
+
+
+class JhuCsseGlobal(Bears):
+  """JHU CSSE global data import"""
+  def read_time_series_csv(
+      self, csv_specs: CsvSpecs, drop_all_na_columns=True) -> pd.DataFrame:
+    """Converts JHU CSSE global time-series CSV to Pandas `DataFrame`.
+
+    Column labels:
+    `Province/State,Country/Region,Lat,Long,<date0>,<date1>,...`
+
+    Note:
+      The global files have no `UID`. This function renames the columns to
+      the U.S. labels, `Province_State,Country_Region,Lat,Long_`, and uses
+      `Combined_Key`, e.g. `'Hubei, China'` or `'Italy'`, as the unique ID.
+      `csv_specs.uid_col_label` is ignored.
+
+    Args:
+      csv_specs (CsvSpecs): CSV URL and encoding specifications
+      drop_all_na_columns (bool): Drop columns that are completely empty
+        (`pd.Dataframe.isna`).
+
+    Returns:
+      pd.DataFrame:
+      Pandas dataframe object of the input CSV file
+    """
+    dataframe = super().read_time_series_csv(
+        csv_specs=csv_specs._replace(uid_col_label=None),
+        drop_all_na_columns=drop_all_na_columns)
+    dataframe = dataframe.rename(columns=CSV_GLOBAL_COLUMN_RENAME_DICT)
+    # Do not add new column in the time-series columns area!
+    dataframe.insert(0, 'Combined_Key', global_combined_key(dataframe))
+    return dataframe.set_index('Combined_Key')
+
+
 def get_geo_df(
-    url=(
-        'https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/'
-        'csse_covid_19_data/UID_ISO_FIPS_LookUp_Table.csv'),
+    url=GEO_DF_URL,
     uid_col_label=CSV_COL_UID) -> pd.DataFrame:
   """Creates Pandas data frame from the JHU geo code look-up table.
 
@@ -148,7 +204,13 @@ def get_covid19_us_bears(
                 db_type, 'US', url_root=url_root, file_prefix=file_prefix),
             uid_col_label=uid_col_label,
             encoding=encoding))
-    assert_all_not_na(covid19[db_type]['counties'].df, 'Province_State')
+  # Only the deaths file has a Population column
+  population = covid19['deaths']['counties'].df.dropna(
+      subset=['FIPS']).drop_duplicates('FIPS').set_index('FIPS')['Population']
+  for db_type in ['confirmed', 'deaths']:
+    assert_valid(
+        covid19[db_type]['counties'], US_COUNTIES_SCHEMA,
+        population=population)
   for db_type in ['confirmed', 'deaths']:
     counties = covid19[db_type]['counties']
     covid19[db_type]['states'] = JhuCsse(
@@ -156,7 +218,11 @@ def get_covid19_us_bears(
   return covid19
 
 
-def get_us_population() -> Dict:
+def get_us_population(
+    url_root=CSV_URL_ROOT,
+    file_prefix=CSV_FILE_PREFIX,
+    uid_col_label=CSV_COL_UID,
+    encoding=CSV_ENCODING) -> Dict:
   """Creates U.S. state and county population dataframes.
 
   Args:
@@ -164,6 +230,7 @@ def get_us_population() -> Dict:
     file_prefix (str): CSV file prefix
     uid_col_label (str): Unique ID column label. Used as the
       Pandas index.
+    encoding (str): CSV encoding
 
   Examples:
     >>> population = get_us_population()
@@ -241,10 +308,10 @@ def get_us_population() -> Dict:
       csv_specs=CsvSpecs(
           url=stitch_time_series_csv_url(
               'deaths', 'US',
-              url_root=CSV_URL_ROOT,
-              file_prefix=CSV_FILE_PREFIX),
-          uid_col_label=CSV_COL_UID,
-          encoding=CSV_ENCODING))
+              url_root=url_root,
+              file_prefix=file_prefix),
+          uid_col_label=uid_col_label,
+          encoding=encoding))
   population_col = covid19.non_datetime_index[-1]
   assert population_col == 'Population'
   population = {}
@@ -257,3 +324,116 @@ def get_us_population() -> Dict:
   population['states'].set_index('index', inplace=True)
   population['states']['Province_State'] = population['states'].index
   return population
+
+
+def get_global_population(geo_df: pd.DataFrame = None) -> Dict:
+  """Creates province and country population dataframes.
+
+  Args:
+    geo_df (pd.DataFrame): JHU look-up table from :py:func:`get_geo_df`.
+      Downloaded if `None`.
+
+  Returns:
+    Dict[pd.DataFrame]:
+    ::
+
+    {'provinces': pd.DataFrame, 'countries': pd.DataFrame}
+
+      * The province population dataframe is indexed by `Combined_Key` and
+        the column labels are `['Province_State', 'Country_Region',
+        'Population']`. It has one row per province plus one row per country
+        that the global time-series files list without provinces.
+      * The country population dataframe is indexed by the name of the
+        country. The column labels are `['Population', 'Country_Region']`.
+  """
+  if geo_df is None:
+    geo_df = get_geo_df()
+  # Skip U.S. counties and the like; keep provinces and countries
+  geo_df = geo_df[geo_df['Admin2'].isna()]
+  population = {}
+  population['provinces'] = geo_df[
+      ['Province_State', 'Country_Region', 'Population']].set_index(
+          global_combined_key(geo_df).to_numpy())
+  population['provinces'].index.name = 'Combined_Key'
+  population['provinces'] = population['provinces'][
+      ~population['provinces'].index.duplicated()]
+  countries = geo_df[geo_df['Province_State'].isna()]
+  population['countries'] = pd.DataFrame(
+      {'Population': countries['Population'].to_numpy(),
+       'Country_Region': countries['Country_Region'].to_numpy()},
+      index=pd.Index(countries['Country_Region'].to_numpy(), name='index'))
+  population['countries'] = population['countries'][
+      ~population['countries'].index.duplicated()]
+  return population
+
+
+def get_covid19_global_bears(
+    url_root=CSV_URL_ROOT,
+    file_prefix=CSV_FILE_PREFIX,
+    encoding=CSV_ENCODING,
+    geo_df: pd.DataFrame = None) -> Dict[Dict[Bears]]:
+  """Converts JHU CSSE global confirmed, deaths, and recovered CSV files to
+  province and country `Bears` in a dictionary of dictionaries.
+
+  Provinces are rolled up to countries with :py:func:`rollup_df`, the same
+  grouped reduction that rolls U.S. counties up to states, so world and U.S.
+  views come from one code path.
+
+  Args:
+    url_root (str): URL prefix for the CSV
+    file_prefix (str): CSV file prefix
+    encoding (str): CSV encoding
+    geo_df (pd.DataFrame): JHU look-up table from :py:func:`get_geo_df`.
+      Downloaded if `None`. Supplies the `Population` column of the province
+      `Bears`.
+
+  Returns:
+    Dict[Dict[Bears]]:
+    ::
+
+    {'confirmed': {'provinces': Bears,
+                   'countries': Bears},
+     'deaths': {'provinces': Bears,
+                'countries': Bears},
+     'recovered': {'provinces': Bears,
+                   'countries': Bears}}
+
+    Province `Bears` are indexed by `Combined_Key` and carry
+    `Province_State,Country_Region,Lat,Long_,Population`
+    before the date columns. Country `Bears` are indexed by `Country_Region`
+    and carry `Population`, taken from the country rows of the look-up table
+    or, for countries without one, summed over the provinces.
+  """
+  population = get_global_population(geo_df)
+  db_types = ['confirmed', 'deaths', 'recovered']
+  covid19 = {db_type: {'provinces': None, 'countries': None}
+             for db_type in db_types}
+  for db_type in db_types:
+    provinces = JhuCsseGlobal(
+        from_csv=True,
+        csv_specs=CsvSpecs(
+            url=stitch_time_series_csv_url(
+                db_type, 'global', url_root=url_root, file_prefix=file_prefix),
+            uid_col_label=None,
+            encoding=encoding))
+    non_datetime_index = provinces.non_datetime_index
+    provinces.df.insert(
+        len(non_datetime_index), 'Population',
+        population['provinces']['Population'].reindex(
+            provinces.df.index).to_numpy())
+    assert_valid(
+        provinces, GLOBAL_PROVINCES_SCHEMA,
+        population=provinces.df['Population'])
+    covid19[db_type]['provinces'] = provinces
+  for db_type in db_types:
+    provinces = covid19[db_type]['provinces']
+    countries_df = rollup_df(
+        provinces.df, provinces.datetime_index, index='Country_Region')
+    province_sums = rollup_df(
+        provinces.df, ['Population'], index='Country_Region')['Population']
+    countries_df.insert(
+        0, 'Population',
+        population['countries']['Population'].reindex(
+            countries_df.index).fillna(province_sums).to_numpy())
+    covid19[db_type]['countries'] = JhuCsseGlobal(dataframe=countries_df)
+  return covid19
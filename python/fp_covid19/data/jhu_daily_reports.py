@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""Johns Hopkins CSSE COVID-19 Daily Report Import
+
+The JHU CSSE repository publishes one CSV file per day, named `MM-DD-YYYY.csv`,
+in `csse_covid_19_daily_reports` (global) and `csse_covid_19_daily_reports_us`
+(U.S. states). Unlike the wide time-series files, these daily reports carry
+per-day fields such as `Active`, `Incident_Rate`, and `Total_Test_Results`,
+and their column labels changed several times during 2020.
+
+This module reads a directory of daily reports in a process pool, maps every
+schema to the JHU time-series column labels, and assembles one region-by-day
+`Bears` per field.
+"""
+from __future__ import annotations
+from typing import Dict, List, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import datetime
+import os
+import re
+import numpy as np
+import pandas as pd
+from fp_covid19.data.jhu_csse import JhuCsse, CSV_ENCODING
+
+DAILY_REPORTS_URL_ROOT = (
+    'https://raw.githubusercontent.com/'
+    'CSSEGISandData/COVID-19/master/csse_covid_19_data/'
+    'csse_covid_19_daily_reports/')
+DAILY_REPORTS_US_URL_ROOT = (
+    'https://raw.githubusercontent.com/'
+    'CSSEGISandData/COVID-19/master/csse_covid_19_data/'
+    'csse_covid_19_daily_reports_us/')
+DAILY_REPORT_FILE_NAME_REGEX = re.compile(
+    r'^(?P<month>\d{2})-(?P<day>\d{2})-(?P<year>\d{4})\.csv$')
+DAILY_REPORT_COLUMN_RENAME_DICT = {
+    'Province/State': 'Province_State',
+    'Country/Region': 'Country_Region',
+    'Last Update': 'Last_Update',
+    'Latitude': 'Lat',
+    'Longitude': 'Long_',
+    'Long': 'Long_',
+    'Incidence_Rate': 'Incident_Rate',
+    'Case-Fatality_Ratio': 'Case_Fatality_Ratio',
+    'Mortality_Rate': 'Case_Fatality_Ratio',
+    'People_Tested': 'Total_Test_Results',
+    'People_Hospitalized': 'Hospitalized',
+    'ISO3': 'iso3',
+}
+"""Maps every historical daily-report column label to the JHU time-series
+   label (the de facto standard)"""
+DAILY_REPORT_COUNTRY_RENAME_DICT = {
+    'Mainland China': 'China',
+    'South Korea': 'Korea, South',
+    'Republic of Korea': 'Korea, South',
+    'Iran (Islamic Republic of)': 'Iran',
+    'UK': 'United Kingdom',
+    'Taiwan': 'Taiwan*',
+}
+"""Maps country names used in early (January to March 2020) daily reports to
+   the names used in later reports"""
+DAILY_REPORT_METADATA_COLS = [
+    'UID', 'iso3', 'FIPS', 'Admin2', 'Province_State', 'Country_Region',
+    'Lat', 'Long_', 'Combined_Key']
+"""Non-datetime columns carried over to the output `Bears`, in order"""
+DAILY_REPORT_FIELDS = [
+    'Confirmed', 'Deaths', 'Recovered', 'Active', 'Incident_Rate',
+    'Case_Fatality_Ratio', 'Total_Test_Results', 'Testing_Rate',
+    'Hospitalized', 'Hospitalization_Rate']
+"""Per-day numeric fields, each of which becomes a `Bears`"""
+
+
+def daily_report_date(file_name: str) -> datetime.date:
+  """Parses the date of a daily report from its file name, `MM-DD-YYYY.csv`.
+
+  Args:
+    file_name (str): File name with or without a directory
+
+  Returns:
+    datetime.date:
+    The report date, or `None` if the file name does not match
+  """
+  match = DAILY_REPORT_FILE_NAME_REGEX.match(os.path.basename(file_name))
+  if match is None:
+    return None
+  return datetime.date(
+      int(match.group('year')), int(match.group('month')),
+      int(match.group('day')))
+
+
+def list_daily_reports(directory: str) -> List[Tuple[datetime.date, str]]:
+  """Lists daily-report CSV files in a directory in chronological order.
+
+  Args:
+    directory (str): Local directory, e.g. a checkout of
+      `csse_covid_19_data/csse_covid_19_daily_reports_us`
+
+  Returns:
+    List[Tuple[datetime.date, str]]:
+    `(date, path)` pairs sorted by date. Files whose names are not
+    `MM-DD-YYYY.csv` are ignored.
+  """
+  reports = []
+  for file_name in os.listdir(directory):
+    date = daily_report_date(file_name)
+    if date is not None:
+      reports.append((date, os.path.join(directory, file_name)))
+  return sorted(reports)
+
+
+def _combined_key(dataframe: pd.DataFrame) -> pd.Series:
+  """Recreates `Combined_Key` for early reports that lack the column"""
+  parts = [
+      dataframe[col].astype('string').str.strip()
+      for col in ['Admin2', 'Province_State', 'Country_Region']
+      if col in dataframe.columns]
+  combined_key = parts[0]
+  for part in parts[1:]:
+    combined_key = combined_key.str.cat(part, sep=', ', na_rep='')
+  return combined_key.str.replace(r'^(, )+', '', regex=True)
+
+
+def canonical_daily_report_df(
+    dataframe: pd.DataFrame, fields: List[str]) -> pd.DataFrame:
+  """Maps a daily-report `DataFrame` of any vintage to canonical columns.
+
+  Note:
+    This function converts the FIPS code into a string without leading zeros
+    to match `JhuCsse`. Rows without FIPS keep `NaN`.
+
+  Args:
+    dataframe (pd.DataFrame): Raw daily report
+    fields (List[str]): Numeric fields to keep
+
+  Returns:
+    pd.DataFrame:
+    A `DataFrame` with the columns in `DAILY_REPORT_METADATA_COLS` that the
+    report has, followed by `fields`. Missing fields are all `NaN`.
+  """
+  dataframe = dataframe.rename(columns=DAILY_REPORT_COLUMN_RENAME_DICT)
+  if 'Country_Region' in dataframe.columns:
+    dataframe['Country_Region'] = dataframe['Country_Region'].replace(
+        DAILY_REPORT_COUNTRY_RENAME_DICT)
+  if 'Combined_Key' not in dataframe.columns:
+    dataframe['Combined_Key'] = _combined_key(dataframe)
+  else:
+    dataframe['Combined_Key'] = (
+        dataframe['Combined_Key'].astype('string').str.strip())
+  if 'FIPS' in dataframe.columns:
+    fips = pd.to_numeric(dataframe['FIPS'], errors='coerce')
+    dataframe['FIPS'] = (
+        fips.astype('Int64').astype(str).where(fips.notna(), np.nan))
+  for field in fields:
+    dataframe[field] = (
+        pd.to_numeric(dataframe[field], errors='coerce')
+        if field in dataframe.columns else np.nan)
+  metadata_cols = [
+      col for col in DAILY_REPORT_METADATA_COLS if col in dataframe.columns]
+  return dataframe[metadata_cols + list(fields)]
+
+
+def _read_daily_report(args: Tuple) -> pd.DataFrame:
+  """Process-pool worker: reads and canonicalizes one daily report"""
+  path, fields, encoding = args
+  return canonical_daily_report_df(
+      pd.read_csv(path, encoding=encoding, dtype={'FIPS': str}), fields)
+
+
+def read_daily_reports(
+    directory: str,
+    fields: List[str] = None,
+    uid_col_label: str = 'Combined_Key',
+    max_workers: int = None,
+    encoding: str = CSV_ENCODING) -> Dict[str, JhuCsse]:
+  """Converts a directory of JHU CSSE daily reports to one `Bears` per field.
+
+  Reads the CSV files in a process pool, then scatters each day's values into
+  preallocated region-by-day arrays instead of merging one `DataFrame` per day.
+
+  Note:
+    Some daily reports list a region more than once. The last row wins.
+
+  Args:
+    directory (str): Local directory of `MM-DD-YYYY.csv` daily reports
+    fields (List[str]): Numeric fields to assemble. Defaults to
+      `DAILY_REPORT_FIELDS`.
+    uid_col_label (str): Column label identifying a region across days.
+      `Combined_Key` exists (or is recreated) in every vintage. `UID` only
+      exists in U.S. daily reports.
+    max_workers (int): Number of worker processes. `None` uses
+      `os.cpu_count()`. `1` reads the files in this process.
+    encoding (str): CSV encoding
+
+  Returns:
+    Dict[str, JhuCsse]:
+    ::
+
+    {'confirmed': JhuCsse, 'deaths': JhuCsse, 'active': JhuCsse, ...}
+
+    One `Bears` per field, keyed by the lower-case field name and indexed by
+    `uid_col_label`, with the metadata columns followed by `%m/%d/%Y` date
+    columns. Days on which a region is missing from the report are `NaN`.
+  """
+  fields = list(DAILY_REPORT_FIELDS if fields is None else fields)
+  reports = list_daily_reports(directory)
+  assert reports, 'Found no MM-DD-YYYY.csv daily reports in {}'.format(
+      directory)
+  jobs = [(path, fields, encoding) for _, path in reports]
+  if max_workers == 1:
+    daily_dfs = [_read_daily_report(job) for job in jobs]
+  else:
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+      daily_dfs = list(executor.map(
+          _read_daily_report, jobs,
+          chunksize=max(1, len(jobs) // (4 * (max_workers or os.cpu_count())))))
+
+  for daily_df in daily_dfs:
+    daily_df.dropna(subset=[uid_col_label], inplace=True)
+    daily_df.drop_duplicates(subset=[uid_col_label], keep='last', inplace=True)
+  # Later reports carry the most complete metadata, so they come first
+  metadata = (
+      pd.concat(
+          [daily_df.drop(columns=fields) for daily_df in reversed(daily_dfs)],
+          ignore_index=True)
+      .drop_duplicates(subset=[uid_col_label], keep='first'))
+  regions = pd.Index(metadata[uid_col_label]).sort_values()
+  metadata = metadata.set_index(uid_col_label).reindex(regions)
+
+  matrices = {
+      field: np.full((len(regions), len(reports)), np.nan) for field in fields}
+  for day, daily_df in enumerate(daily_dfs):
+    rows = regions.get_indexer(daily_df[uid_col_label])
+    values = daily_df[fields].to_numpy(dtype=float)
+    for i, field in enumerate(fields):
+      matrices[field][rows, day] = values[:, i]
+
+  date_labels = [
+      '{}/{}/{}'.format(date.month, date.day, date.year)
+      for date, _ in reports]
+  metadata_cols = [
+      col for col in DAILY_REPORT_METADATA_COLS
+      if col in metadata.columns and col != uid_col_label]
+  daily_reports = {}
+  for field in fields:
+    dataframe = pd.concat(
+        [metadata[metadata_cols],
+         pd.DataFrame(matrices[field], index=regions, columns=date_labels)],
+        axis='columns')
+    dataframe.index.name = uid_col_label
+    daily_reports[field.lower()] = JhuCsse(dataframe=dataframe)
+  return daily_reports
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+"""Zero-Copy Sharing of Loaded Datasets Between Processes
+
+Web servers run several worker processes, and every worker that calls the
+loaders holds its own copy of all `Bears`. Instead, one process publishes
+the nested `{db_type: {geo_level: Bears}}` loader output with
+:py:class:`SharedPublisher`, and workers attach with :py:class:`SharedReader`:
+
+* A release is one named shared memory block `<name>_<version>`: the count
+  matrices of all `Bears`, then a pickled manifest with their metadata
+  columns, date labels, and `info`, e.g. the population dataframes. The
+  block is never written again after publication.
+* A control block `<name>` holds the version counter. Publishing writes the
+  next release block and then bumps the counter, so readers see either the
+  old or the new release, never a partial one.
+* Readers map the release block and wrap its matrices in read-only
+  `np.ndarray` views, so the date columns of their `Bears` are the shared
+  pages themselves. Only the metadata columns, a few hundred kilobytes for
+  counties, are unpickled in every worker, and memory stays flat as
+  workers are added.
+* A release stays mapped in a reader until the last of its `Bears` is
+  garbage-collected, so `Bears` taken before a newer release stay valid.
+
+The shared matrices are read-only. `Bears` from `Snapshot.bears()` copy the
+columns they write to, like every copy-on-write copy.
+
+Examples:
+  >>> # In the loader process
+  >>> publisher = SharedPublisher('fp_covid19')
+  >>> publisher.publish(usafacts.get_covid19_us_bears(),
+  ...                   info={'population': usafacts.get_us_population()})
+  >>> # In every worker, e.g. once per request
+  >>> reader = SharedReader('fp_covid19')
+  >>> snapshot = reader.snapshot()  # Reattaches only after a new release
+  >>> counties = snapshot.bears('confirmed', 'counties')
+  >>> population = snapshot.info['population']
+"""
+from __future__ import annotations
+from typing import Dict, List, Tuple
+import pickle
+import threading
+import weakref
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+import pandas as pd
+from fp_covid19.data.bears import Bears
+from fp_covid19.data.snapshot import Snapshot
+
+ALIGNMENT = 64
+"""Byte alignment of the matrices in a release block"""
+_ATTACH_LOCK = threading.Lock()
+_HEADER = np.dtype([('manifest_offset', '<i8'), ('manifest_size', '<i8')])
+
+
+def _release_name(name: str, version: int) -> str:
+  return '{}_{}'.format(name, version)
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+  """Attaches an existing block without registering it with the resource
+  tracker, which would unlink it when this process exits"""
+  try:
+    return shared_memory.SharedMemory(name=name, track=False)
+  except TypeError: # Python < 3.13 always registers
+    pass
+  # Unregistering afterwards would also drop the registration of the
+  # publisher if both share a tracker, so skip registering instead
+  with _ATTACH_LOCK:
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+      return shared_memory.SharedMemory(name=name)
+    finally:
+      resource_tracker.register = register
+
+
+def _aligned(offset: int) -> int:
+  return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+class SharedPublisher:
+  """Publishes versions of a dataset into named shared memory.
+
+  Run one publisher per `name`. Re-creating a publisher after a restart
+  continues the version counter of the existing control block.
+
+  Args:
+    name (str): Shared memory name prefix, unique on the host
+  """
+  def __init__(self, name: str):
+    self.name = name
+    try:
+      self._control = shared_memory.SharedMemory(
+          name=name, create=True, size=_HEADER.itemsize)
+      self._counter[0] = 0
+    except FileExistsError:
+      self._control = _attach(name)
+    self._release = None
+
+  @property
+  def _counter(self) -> np.ndarray:
+    return np.ndarray((1,), '<i8', buffer=self._control.buf)
+
+  @property
+  def version(self) -> int:
+    """Version of the latest release, `0` before the first one"""
+    return int(self._counter[0])
+
+  def publish(self, data: Dict[str, Dict[str, Bears]],
+              info: Dict = None) -> int:
+    """Publishes `data` as the next version.
+
+    Workers holding the previous release keep it until they drop it; its
+    memory is freed when the last of them does.
+
+    Args:
+      data (Dict[str, Dict[str, Bears]]): Loader output
+      info (Dict): Picklable data to publish along, e.g. the population
+
+    Returns:
+      int:
+      The new version
+    """
+    entries, matrices = {}, []
+    offset = _HEADER.itemsize
+    for db_type, levels in data.items():
+      entries[db_type] = {}
+      for geo_level, bears in levels.items():
+        non_datetime_index, datetime_index = (
+            bears.partition_datetime_columns())
+        values = bears.df[datetime_index].to_numpy(dtype=float)
+        offset = _aligned(offset)
+        entries[db_type][geo_level] = {
+            'type': type(bears), 'metadata': bears.df[non_datetime_index],
+            'datetime_index': datetime_index, 'offset': offset,
+            'shape': values.shape}
+        matrices.append((offset, values))
+        offset += values.nbytes
+    manifest = pickle.dumps(
+        {'entries': entries, 'info': dict(info or {})},
+        protocol=pickle.HIGHEST_PROTOCOL)
+
+    version = self.version + 1
+    release = shared_memory.SharedMemory(
+        name=_release_name(self.name, version), create=True,
+        size=offset + len(manifest))
+    np.ndarray((1,), _HEADER, buffer=release.buf)[0] = (offset, len(manifest))
+    for start, values in matrices:
+      np.ndarray(values.shape, float, buffer=release.buf,
+                 offset=start)[...] = values
+    release.buf[offset:offset + len(manifest)] = manifest
+    self._counter[0] = version # Readers switch here
+    previous, self._release = self._release, release
+    if previous is not None:
+      previous.close()
+      previous.unlink()
+    return version
+
+  def close(self, unlink: bool = True):
+    """Detaches, and by default removes the latest release and the counter
+    so that no new reader can attach"""
+    for block in [self._release, self._control]:
+      if block is not None:
+        block.close()
+        if unlink:
+          block.unlink()
+    self._release = self._control = None
+
+
+class SharedReader:
+  """Attaches to the releases of a :py:class:`SharedPublisher`.
+
+  Args:
+    name (str): Name of the publisher
+  """
+  def __init__(self, name: str):
+    self.name = name
+    self._control = _attach(name)
+    self._snapshot = None
+    self._releases = weakref.WeakValueDictionary()
+
+  @property
+  def version(self) -> int:
+    """Latest published version, `0` before the first release"""
+    return int(np.ndarray((1,), '<i8', buffer=self._control.buf)[0])
+
+  def snapshot(self) -> Snapshot:
+    """The latest release as a :py:class:`Snapshot`, or `None` before the
+    first one.
+
+    Checking for a new release reads one counter. Attaching a release
+    maps its block and unpickles only its manifest.
+    """
+    while True:
+      version = self.version
+      if version == 0:
+        return None
+      if self._snapshot is not None and self._snapshot.version == version:
+        return self._snapshot
+      try:
+        block = _attach(_release_name(self.name, version))
+      except FileNotFoundError:
+        if self.version != version:
+          continue # Replaced by a newer release in the meantime
+        return self._snapshot # The publisher closed
+      break
+    release = _Release(block)
+    manifest = release.manifest()
+    data = {}
+    for db_type, levels in manifest['entries'].items():
+      data[db_type] = {}
+      for geo_level, entry in levels.items():
+        data[db_type][geo_level] = _shared_bears(
+            entry, release.matrix(entry['offset'], entry['shape']))
+    self._releases[version] = release
+    self._snapshot = Snapshot(data, version=version, info=manifest['info'])
+    return self._snapshot
+
+  @property
+  def versions_in_use(self) -> List[int]:
+    """Versions still mapped because some `Bears` refers to them"""
+    return sorted(self._releases.keys())
+
+  def close(self):
+    """Forgets the latest snapshot and detaches from the version counter.
+
+    Releases stay mapped for as long as any of their `Bears` is alive.
+    """
+    self._snapshot = None
+    self._control.close()
+
+
+class _Release:
+  """One mapped release block.
+
+  The matrices of the release are built from :py:meth:`matrix` views, whose
+  `np.ndarray.base` chain ends at this object, so the block stays mapped
+  until the last `Bears` using it is garbage-collected, and is unmapped by
+  `SharedMemory.__del__` then. Closing it explicitly while arrays point into
+  it would leave them dangling: `np.ndarray(buffer=...)` keeps no buffer
+  export that would make `SharedMemory.close()` fail.
+  """
+  def __init__(self, block: shared_memory.SharedMemory):
+    self.block = block
+    self.address = np.frombuffer(block.buf, np.uint8).ctypes.data
+
+  def __repr__(self) -> str:
+    return '_Release({!r})'.format(self.block.name)
+
+  def manifest(self) -> Dict:
+    """Unpickled manifest of the release"""
+    offset, size = np.ndarray((1,), _HEADER, buffer=self.block.buf)[0]
+    return pickle.loads(self.block.buf[offset:offset + size])
+
+  def matrix(self, offset: int, shape: Tuple[int, int]) -> np.ndarray:
+    """Read-only `float` view of the matrix at `offset`"""
+    return np.asarray(_ArrayInterface(self, offset, shape))
+
+
+class _ArrayInterface:
+  """Exposes one matrix of a :py:class:`_Release` to `np.asarray` and
+  keeps the release alive as the base of the array"""
+  def __init__(self, release: _Release, offset: int, shape: Tuple[int, int]):
+    self.release = release
+    self.__array_interface__ = {
+        'shape': tuple(shape), 'typestr': np.dtype(float).str,
+        'data': (release.address + offset, True), 'version': 3}
+
+
+def _shared_bears(entry: Dict, values: np.ndarray) -> Bears:
+  """A `Bears` whose date columns are the read-only `values` view"""
+  metadata = entry['metadata']
+  dataframe = pd.DataFrame(
+      values, index=metadata.index, columns=entry['datetime_index'],
+      copy=False)
+  for position, label in enumerate(metadata.columns):
+    dataframe.insert(position, label, metadata[label])
+  return entry['type'](dataframe=dataframe)
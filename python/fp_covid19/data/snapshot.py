@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""Immutable, Versioned Snapshots of Loaded Datasets
+
+A long-running service reads the nested `{db_type: {geo_level: Bears}}`
+dictionaries of the loaders from many threads while a refresh downloads the
+next release. :py:class:`Snapshot` freezes one release: it never hands out
+its own `Bears`, only shallow copy-on-write copies, so no reader can change
+what another reader sees. :py:class:`SnapshotStore` builds the next snapshot
+in a background thread and publishes it by rebinding one attribute, which is
+atomic. Readers take `store.current` once per request and use that snapshot
+throughout, without locks.
+
+Examples:
+  >>> store = SnapshotStore(usafacts.get_covid19_us_bears)
+  >>> store.refresh().result()   # first load
+  >>> snapshot = store.current   # in a request handler
+  >>> counties = snapshot.bears('confirmed', 'counties')
+  >>> store.refresh()            # nightly, while requests keep being served
+"""
+from __future__ import annotations
+from typing import Callable, Dict, Iterator
+import concurrent.futures
+import threading
+import time
+from fp_covid19.data.bears import Bears
+
+
+class Snapshot:
+  """One immutable version of a nested `{db_type: {geo_level: Bears}}`
+  dataset.
+
+  Args:
+    data (Dict[str, Dict[str, Bears]]): Loader output. The snapshot keeps
+      shallow copies, so later changes to `data` do not show.
+    version (int): Version number, increasing with every publication
+    info (Dict): Anything to publish along, e.g. the source URLs
+  """
+  __slots__ = ('_data', '_version', '_created', '_info')
+
+  def __init__(self, data: Dict[str, Dict[str, Bears]], version: int = 0,
+               info: Dict = None):
+    frozen = {}
+    for db_type, levels in data.items():
+      frozen[db_type] = {}
+      for geo_level, bears in levels.items():
+        bears = bears.copy()
+        # Parse the labels and dates now rather than in the readers
+        bears.date_axis.epochs # pylint: disable=pointless-statement
+        frozen[db_type][geo_level] = bears
+    object.__setattr__(self, '_data', frozen)
+    object.__setattr__(self, '_version', version)
+    object.__setattr__(self, '_created', time.time())
+    object.__setattr__(self, '_info', dict(info or {}))
+
+  def __setattr__(self, name, value):
+    raise AttributeError('Snapshot is immutable')
+
+  def __repr__(self) -> str:
+    return 'Snapshot(version={}, {})'.format(self._version, ', '.join(
+        '{}/{}: {} x {}'.format(db_type, geo_level, len(bears.df),
+                                len(bears.datetime_index))
+        for db_type, levels in self._data.items()
+        for geo_level, bears in levels.items()))
+
+  @property
+  def version(self) -> int:
+    """Version number"""
+    return self._version
+
+  @property
+  def created(self) -> float:
+    """POSIX time of creation"""
+    return self._created
+
+  @property
+  def info(self) -> Dict:
+    """Copy of the published `info`"""
+    return dict(self._info)
+
+  def __iter__(self) -> Iterator[str]:
+    return iter(self._data)
+
+  def keys(self):
+    """`db_type` keys, e.g. `'confirmed'` and `'deaths'`"""
+    return self._data.keys()
+
+  def bears(self, db_type: str, geo_level: str) -> Bears:
+    """Returns a private copy of one `Bears`.
+
+    The copy shares its data until either side writes (see `Bears.copy()`),
+    so it is cheap, and writing to it never affects the snapshot.
+    """
+    return self._data[db_type][geo_level].copy()
+
+  def __getitem__(self, db_type: str) -> Dict[str, Bears]:
+    """`{geo_level: Bears}` of private copies, like the loader output"""
+    return {geo_level: self.bears(db_type, geo_level)
+            for geo_level in self._data[db_type]}
+
+  def to_dict(self) -> Dict[str, Dict[str, Bears]]:
+    """The whole dataset as private copies in the form of the loader
+    output"""
+    return {db_type: self[db_type] for db_type in self._data}
+
+
+class SnapshotStore:
+  """Publishes snapshots of a loader's output, refreshed in the background.
+
+  Args:
+    loader (Callable): Returns a nested `{db_type: {geo_level: Bears}}`
+      dictionary, e.g. `usafacts.get_covid19_us_bears`
+    initial (Dict): Data of version 0. If `None`, :py:attr:`current` is
+      `None` until the first refresh completes.
+  """
+  def __init__(self, loader: Callable[[], Dict], initial: Dict = None):
+    self.loader = loader
+    self._current = None if initial is None else Snapshot(initial)
+    self._executor = concurrent.futures.ThreadPoolExecutor(
+        max_workers=1, thread_name_prefix='snapshot-refresh')
+    self._lock = threading.Lock() # Guards only `_refreshing`
+    self._refreshing = None
+
+  @property
+  def current(self) -> Snapshot:
+    """The latest published snapshot. Reading it takes no lock."""
+    return self._current
+
+  def publish(self, data: Dict, info: Dict = None) -> Snapshot:
+    """Freezes `data` as the next version and swaps it in atomically.
+
+    Readers that took the previous snapshot keep it for as long as they
+    hold it.
+    """
+    previous = self._current
+    snapshot = Snapshot(
+        data, version=0 if previous is None else previous.version + 1,
+        info=info)
+    self._current = snapshot
+    return snapshot
+
+  def _refresh(self) -> Snapshot:
+    try:
+      return self.publish(self.loader())
+    finally:
+      with self._lock:
+        self._refreshing = None
+
+  def refresh(self) -> concurrent.futures.Future:
+    """Loads and publishes the next version in a background thread.
+
+    A refresh requested while another is running joins it instead of
+    loading twice. If loading fails, the current snapshot stays and the
+    error is raised by `result()` of the returned future.
+
+    Returns:
+      concurrent.futures.Future:
+      Resolves to the new :py:class:`Snapshot`
+    """
+    with self._lock:
+      if self._refreshing is None:
+        self._refreshing = self._executor.submit(self._refresh)
+      return self._refreshing
+
+  def close(self):
+    """Waits for a running refresh and stops the background thread"""
+    self._executor.shutdown(wait=True)
@@ -6,6 +6,7 @@ import numpy as np
 import pandas as pd
 from fp_covid19.data.bears import Bears, CsvSpecs
 from fp_covid19.cases.compute import counties2states_df
+from fp_covid19.data.validation import US_COUNTIES_SCHEMA, assert_valid
 from fp_covid19.visualization.geojson_helper import USPS_PUB28_DF
 
 CSV_URL_ROOT = (
@@ -50,10 +51,8 @@ def stitch_time_series_csv_url(
 def _long_state_names(
     dataframe: pd.DataFrame, state_col='Province_State') -> pd.DataFrame:
   """Converts 2-letter U.S. abbreviations to full names"""
-  return dataframe[state_col].transform(
-      lambda x: (
-          USPS_PUB28_DF[['USPS', 'Province_State']]
-          .set_index('USPS').loc[x,]))
+  return dataframe[state_col].map(
+      USPS_PUB28_DF.set_index('USPS')['Province_State'])
 
 def _unassigned_fips(dataframe: pd.DataFrame) -> pd.DataFrame:
   """Prepend 2-digit state FIPS code to 3-digit county code for
@@ -61,7 +60,7 @@ def _unassigned_fips(dataframe: pd.DataFrame) -> pd.DataFrame:
   return dataframe.FIPS.combine(
       dataframe.stateFIPS,
       lambda county_fips, state_fips: (
-          (int(state_fips)*1000 + int(county_fips)) if county_fips == '0'
+          str(int(state_fips)*1000 + int(county_fips)) if county_fips == '0'
           else county_fips))
 
 
@@ -70,7 +69,7 @@ def _canonical_df(
   """Map and order columns"""
   dataframe.rename(columns=column_rename_dict, inplace=True)
   # Turn FIPS into strings without leading zeros to match most GeoJSON files
-  dataframe.loc[:, 'FIPS'] = (
+  dataframe['FIPS'] = (
       dataframe.FIPS.values.astype(np.int64).astype(str))
   # Create Combined_Key between counties and states
   # Do not add new column in the time-series columns area!
@@ -106,7 +105,7 @@ class Usafacts(Bears):
     dataframe = _canonical_df(
         dataframe, column_rename_dict=CSV_COLUMN_RENAME_DICT)
     dataframe.loc[:, 'Province_State'] = _long_state_names(dataframe)
-    dataframe.loc[:, 'FIPS'] = _unassigned_fips(dataframe)
+    dataframe['FIPS'] = _unassigned_fips(dataframe)
     return dataframe
 
 
@@ -178,6 +177,14 @@ def get_covid19_us_bears(
                 file_suffix=file_suffix),
             uid_col_label=CSV_COL_UID,
             encoding=encoding))
+  population = get_us_population(
+      url_root=url_root, file_prefix=file_prefix,
+      file_suffix=file_suffix)['counties'].drop_duplicates(
+          'FIPS').set_index('FIPS')['Population']
+  for db_type in ['confirmed', 'deaths']:
+    assert_valid(
+        covid19[db_type]['counties'], US_COUNTIES_SCHEMA,
+        population=population)
   for db_type in ['confirmed', 'deaths']:
     counties = covid19[db_type]['counties']
     covid19[db_type]['states'] = Usafacts(
@@ -185,14 +192,16 @@ def get_covid19_us_bears(
   return covid19
 
 
-def get_us_population() -> Dict:
+def get_us_population(
+    url_root=CSV_URL_ROOT,
+    file_prefix=CSV_FILE_PREFIX,
+    file_suffix=CSV_FILE_SUFFIX) -> Dict:
   """Creates U.S. state and county population dataframes.
 
   Args:
     url_root (str): URL prefix for the CSV
     file_prefix (str): CSV file prefix
-    uid_col_label (str): Unique ID column label. Used as the
-      Pandas index.
+    file_suffix (str): CSV file suffix
 
   Examples:
     >>> population = get_us_population()
@@ -254,7 +263,9 @@ def get_us_population() -> Dict:
         `Province_State` is identical to the index, allowing Pandas operations
         to use either the index or this column label.
   """
-  geo_df = get_geo_df()
+  geo_df = get_geo_df(url=stitch_time_series_csv_url(
+      db_type='county_population', url_root=url_root,
+      file_prefix=file_prefix, file_suffix=file_suffix))
   population_col = 'Population'
   population = {}
   population['counties'] = geo_df[[
@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+"""Schema and Data-Quality Validation of `Bears`
+
+Checks a `Bears` against a declared :py:class:`Schema` in one pass over its
+metadata columns and its region-by-day block, and returns every violation at
+once instead of raising on the first one. Each violation counts the failing
+cells or regions and keeps at most a few samples, so a report on millions of
+cells stays a few lines long.
+
+Examples:
+  >>> report = validate(covid19['confirmed']['counties'], US_COUNTIES_SCHEMA)
+  >>> print(report)
+  Bears validation (3340 regions x 300 days): 0 errors, 2 warnings
+    [warning] fips_missing: 2 regions without FIPS codes, e.g. ...
+    [warning] decreasing: 187 cells in 96 regions, e.g. ...
+  >>> assert_valid(covid19['confirmed']['counties'], US_COUNTIES_SCHEMA)
+"""
+from __future__ import annotations
+from typing import List
+from collections import namedtuple
+import warnings
+import numpy as np
+import pandas as pd
+from fp_covid19.data.bears import Bears
+
+CHECKS = ['required', 'fips_missing', 'fips', 'fips_duplicate', 'dates',
+          'missing', 'negative', 'decreasing', 'population']
+"""Names of the checks, in report order"""
+FIPS_PATTERN = r'[1-9][0-9]{0,4}'
+"""FIPS codes as strings without leading zeros, see the loaders"""
+
+Schema = namedtuple(
+    'Schema',
+    ['required_cols', 'fips_col', 'cumulative', 'population_key',
+     'min_population_coverage', 'errors'],
+    defaults=((), None, True, 'FIPS', 1., ('required', 'fips', 'dates')))
+""" Declared Shape of a `Bears`
+
+.. py:attribute:: required_cols
+
+    Metadata columns that must exist and must not be N/A
+
+.. py:attribute:: fips_col
+
+    Column label of the FIPS codes to check, or `None`
+
+.. py:attribute:: cumulative
+
+    Whether counts are cumulative, i.e. should never decrease
+
+.. py:attribute:: population_key
+
+    Column label that keys the population of each region, or `None` for the
+    row index
+
+.. py:attribute:: min_population_coverage
+
+    Fraction of regions that must have a positive population
+
+.. py:attribute:: errors
+
+    Names of the checks in :py:data:`CHECKS` that fail
+    :py:func:`assert_valid`. Other violations are warnings.
+"""
+
+Violation = namedtuple(
+    'Violation', ['check', 'severity', 'count', 'message', 'samples'])
+""" One Failed Check
+
+.. py:attribute:: check
+
+    Name of the check, one of :py:data:`CHECKS`
+
+.. py:attribute:: severity
+
+    `'error'` or `'warning'`
+
+.. py:attribute:: count
+
+    Number of failing cells, regions, or dates
+
+.. py:attribute:: message
+
+    Summary, e.g. `'12 cells in 3 regions'`
+
+.. py:attribute:: samples
+
+    At most `max_samples` examples as strings
+"""
+
+US_COUNTIES_SCHEMA = Schema(
+    required_cols=('Province_State', 'Combined_Key'), fips_col='FIPS')
+"""Counties of :py:func:`jhu_csse.get_covid19_us_bears` and
+   :py:func:`usafacts.get_covid19_us_bears`. Rows without FIPS, e.g. Kansas
+   City and Dukes and Nantucket in the JHU CSSE files, are a `fips_missing`
+   warning: they count at the state level only."""
+GLOBAL_PROVINCES_SCHEMA = Schema(
+    required_cols=('Country_Region',), population_key=None)
+"""Provinces of :py:func:`jhu_csse.get_covid19_global_bears`"""
+
+
+class ValidationReport:
+  """Violations found by :py:func:`validate`.
+
+  Args:
+    violations (List[Violation]): Failed checks
+    shape (Tuple[int, int]): Number of regions and days validated
+  """
+  def __init__(self, violations: List[Violation], shape):
+    self.violations = violations
+    self.shape = shape
+
+  @property
+  def errors(self) -> List[Violation]:
+    """Violations of severity `'error'`"""
+    return [v for v in self.violations if v.severity == 'error']
+
+  @property
+  def warnings(self) -> List[Violation]:
+    """Violations of severity `'warning'`"""
+    return [v for v in self.violations if v.severity == 'warning']
+
+  @property
+  def ok(self) -> bool:
+    """Whether there are no errors"""
+    return not self.errors
+
+  def __repr__(self) -> str:
+    num_errors, num_warnings = len(self.errors), len(self.warnings)
+    lines = ['Bears validation ({} regions x {} days): {} error{}, '
+             '{} warning{}'.format(
+                 self.shape[0], self.shape[1], num_errors,
+                 '' if num_errors == 1 else 's', num_warnings,
+                 '' if num_warnings == 1 else 's')]
+    for violation in self.violations:
+      lines.append('  [{}] {}: {}{}'.format(
+          violation.severity, violation.check, violation.message,
+          ', e.g. ' + '; '.join(violation.samples) if violation.samples
+          else ''))
+    return '\n'.join(lines)
+
+
+def _region_labels(dataframe: pd.DataFrame) -> pd.Index:
+  """`Combined_Key` if there is one, else the row index"""
+  if 'Combined_Key' in dataframe.columns:
+    return pd.Index(dataframe['Combined_Key'])
+  return dataframe.index
+
+
+def _cell_violation(
+    mask: np.ndarray, values: np.ndarray, regions: pd.Index,
+    datetime_index: List[str], max_samples: int, offset: int = 0):
+  """Counts the `True` cells of a region-by-day `mask` and samples the first
+  failing cell of the first failing regions.
+
+  Returns:
+    Tuple[int, str, List[str]]:
+    `(count, message, samples)`, or `None` if no cell fails
+  """
+  per_region = np.count_nonzero(mask, axis=1)
+  count = int(per_region.sum())
+  if not count:
+    return None
+  rows = np.flatnonzero(per_region)[:max_samples]
+  cols = mask[rows].argmax(axis=1)
+  samples = []
+  for row, col in zip(rows, cols):
+    sample = '{} on {}: {:g}'.format(
+        regions[row], datetime_index[col + offset], values[row, col + offset])
+    if offset:
+      sample += ' after {:g}'.format(values[row, col + offset - 1])
+    samples.append(sample)
+  return count, '{} cells in {} regions'.format(
+      count, np.count_nonzero(per_region)), samples
+
+
+def validate(
+    bears: Bears, schema: Schema, population: pd.Series = None,
+    max_samples: int = 3) -> ValidationReport:
+  """Checks `bears` against `schema`.
+
+  The checks, named as in :py:data:`CHECKS`:
+
+  * `required`: required columns exist and are not N/A
+  * `fips_missing`: regions without a FIPS code
+  * `fips`: FIPS codes that are given match :py:data:`FIPS_PATTERN`
+  * `fips_duplicate`: no two regions share a FIPS code
+  * `dates`: the date axis is sorted, without gaps or repeats
+  * `missing`: no count is N/A
+  * `negative`: no count is negative
+  * `decreasing`: cumulative counts never decrease from one day to the next
+  * `population`: the share of regions with a positive population is at
+    least `schema.min_population_coverage`. Only checked if `population` is
+    given.
+
+  Args:
+    bears (Bears): Region-by-day time-series
+    schema (Schema): Declared columns, FIPS codes, and severities
+    population (pd.Series): Population indexed by the `schema.population_key`
+      values, e.g. `population['counties'].drop_duplicates('FIPS')
+      .set_index('FIPS')['Population']`
+    max_samples (int): Maximum number of samples per violation
+
+  Returns:
+    ValidationReport
+  """
+  dataframe = bears.df
+  datetime_index = bears.datetime_index
+  regions = _region_labels(dataframe)
+  found = []
+
+  def report(check, count, message, samples):
+    found.append((check, count, message, [str(s) for s in samples]))
+
+  missing_cols = [col for col in schema.required_cols
+                  if col not in dataframe.columns]
+  if missing_cols:
+    report('required', len(missing_cols),
+           'missing columns {}'.format(missing_cols), [])
+  present_cols = [col for col in schema.required_cols
+                  if col in dataframe.columns]
+  if present_cols:
+    na = dataframe[present_cols].isna().to_numpy()
+    per_col = na.sum(axis=0)
+    for col, count in zip(present_cols, per_col):
+      if count:
+        report('required', int(count),
+               '{} regions without {}'.format(count, col),
+               list(regions[np.flatnonzero(na[:, present_cols.index(col)])
+                            [:max_samples]]))
+
+  if schema.fips_col is not None and schema.fips_col in dataframe.columns:
+    fips = dataframe[schema.fips_col]
+    absent = fips.isna().to_numpy()
+    count = int(absent.sum())
+    if count:
+      report('fips_missing', count,
+             '{} regions without FIPS codes'.format(count),
+             list(regions[np.flatnonzero(absent)[:max_samples]]))
+    malformed = ~fips.astype(str).str.fullmatch(FIPS_PATTERN).to_numpy(
+        dtype=bool) & ~absent
+    count = int(malformed.sum())
+    if count:
+      rows = np.flatnonzero(malformed)[:max_samples]
+      report('fips', count,
+             '{} regions with malformed FIPS codes'.format(count),
+             ['{} ({!r})'.format(regions[row], fips.iloc[row])
+              for row in rows])
+    duplicated = (fips.duplicated(keep=False).to_numpy() & ~malformed
+                  & ~absent)
+    count = int(duplicated.sum())
+    if count:
+      report('fips_duplicate', count,
+             '{} regions share FIPS codes'.format(count),
+             ['{} ({})'.format(regions[row], fips.iloc[row])
+              for row in np.flatnonzero(duplicated)[:max_samples]])
+
+  if len(datetime_index) > 1:
+    days = bears.date_axis.datetimes.to_numpy(dtype='datetime64[D]')
+    irregular = np.flatnonzero(np.diff(days.astype(np.int64)) != 1)
+    if len(irregular):
+      report('dates', len(irregular),
+             '{} irregular steps between dates'.format(len(irregular)),
+             ['{} -> {}'.format(datetime_index[i], datetime_index[i + 1])
+              for i in irregular[:max_samples]])
+
+  values = dataframe[datetime_index].to_numpy(dtype=float)
+  for check, mask, offset in [
+      ('missing', np.isnan(values), 0),
+      ('negative', values < 0, 0),
+      ('decreasing', (values[:, 1:] < values[:, :-1]) if schema.cumulative
+       else np.zeros((len(values), 0), dtype=bool), 1)]:
+    cells = _cell_violation(
+        mask, values, regions, datetime_index, max_samples, offset=offset)
+    if cells is not None:
+      report(check, *cells)
+
+  if population is not None:
+    keys = (dataframe.index if schema.population_key is None
+            else dataframe[schema.population_key])
+    aligned = population.reindex(pd.Index(keys)).to_numpy(dtype=float)
+    uncovered = ~(aligned > 0)
+    count = int(uncovered.sum())
+    coverage = 1. - count / max(len(aligned), 1)
+    if coverage < schema.min_population_coverage:
+      report('population', count,
+             '{} regions without population ({:.1%} coverage)'.format(
+                 count, coverage),
+             list(regions[np.flatnonzero(uncovered)[:max_samples]]))
+
+  order = {check: i for i, check in enumerate(CHECKS)}
+  violations = [
+      Violation(check, 'error' if check in schema.errors else 'warning',
+                count, message, samples)
+      for check, count, message, samples in sorted(
+          found, key=lambda item: order[item[0]])]
+  return ValidationReport(violations, values.shape)
+
+
+def assert_valid(
+    bears: Bears, schema: Schema, population: pd.Series = None,
+    max_samples: int = 3, warn: bool = False) -> ValidationReport:
+  """Validates `bears` and raises on errors.
+
+  Args:
+    warn (bool): Also calls `warnings.warn` with the report if there are
+      warnings. The loaders leave it off, so a normal load stays quiet;
+      inspect the returned report instead.
+
+  Raises:
+    AssertionError: If any check in `schema.errors` fails. The message is the
+      whole report.
+
+  Returns:
+    ValidationReport
+  """
+  report = validate(
+      bears, schema, population=population, max_samples=max_samples)
+  assert report.ok, repr(report)
+  if warn and report.warnings:
+    warnings.warn(repr(report), stacklevel=2)
+  return report
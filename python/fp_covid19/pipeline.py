@@ -0,0 +1,770 @@
+# -*- coding: utf-8 -*-
+"""Batch pipeline of cached stages
+
+The nightly build (download, parse, aggregate, per-capita, rank, render,
+export) is a dependency graph of stages. Each stage is a function of its
+dependencies' outputs and a few configuration values. :py:class:`Pipeline`
+runs the stages a target needs, independent stages concurrently, and pickles
+every output under a key that hashes the stage code (with the `fp_covid19`
+modules it uses), its configuration values, and the keys of its inputs. A
+stage whose key is already cached is skipped without loading its output,
+unless a stage downstream needs to run. Stages that write files, e.g. the
+render stages, return their paths; a stage whose files were deleted runs
+again.
+
+Fetch stages are volatile: they always run, but download with conditional
+HTTP requests, and their key hashes the downloaded content. When the data has
+not changed overnight, every other stage is a cache hit.
+
+Examples:
+  >>> pipeline = Pipeline(NIGHTLY_STAGES, config=DEFAULT_CONFIG)
+  >>> results = pipeline.run()
+  >>> print(format_timings(results))
+
+  From the command line: `python -m fp_covid19 --help`
+"""
+from __future__ import annotations
+from typing import Any, Callable, Dict, Iterable, List, Set, Tuple
+from collections import namedtuple
+import ast
+import concurrent.futures
+import functools
+import glob
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import geopandas as gpd
+import pandas as pd
+from fp_covid19.cases.compute import PopulationNormalizer, new_cases
+from fp_covid19.cases.distribution import summarize
+from fp_covid19.cases.projection import project
+from fp_covid19.cases.ranking import RankingEngine
+from fp_covid19.data import jhu_csse, usafacts
+from fp_covid19.data.bears import Bears
+from fp_covid19.data.export import export_cube, region_keys
+from fp_covid19.visualization.classify import Classifier
+from fp_covid19.visualization.compare_chart import compare_chart
+from fp_covid19.visualization.folium_helper import cmap_ranked_df
+from fp_covid19.visualization.geojson_helper import (
+    COUNTIES_JSON, STATES_JSON, US_METROS)
+from fp_covid19.visualization.publish import MapPublisher
+from fp_covid19.visualization.static_map import StaticChoropleth
+
+Stage = namedtuple(
+    'Stage', ['name', 'func', 'deps', 'params', 'volatile'],
+    defaults=((), (), False))
+""" Pipeline Stage
+
+.. py:attribute:: name
+
+    Unique stage name
+
+.. py:attribute:: func
+
+    `func(config, *outputs_of_deps)` returns the stage output, which must be
+    picklable
+
+.. py:attribute:: deps
+
+    Names of the stages whose outputs `func` takes, in order
+
+.. py:attribute:: params
+
+    Configuration keys `func` reads. Their values are part of the cache key.
+
+.. py:attribute:: volatile
+
+    `True` if the stage reads the outside world, e.g. downloads. A volatile
+    stage always runs and its key hashes its output.
+"""
+
+StageResult = namedtuple('StageResult', ['name', 'status', 'seconds', 'key'])
+""" Outcome of one stage: `status` is `'ran'` or `'cached'`"""
+
+
+def _digest(*parts) -> str:
+  sha1 = hashlib.sha1()
+  for part in parts:
+    sha1.update(part if isinstance(part, bytes) else repr(part).encode())
+  return sha1.hexdigest()[:16]
+
+
+def _code_names(code) -> Set[str]:
+  """Global names that `code` and its nested functions refer to"""
+  names = set(code.co_names)
+  for const in code.co_consts:
+    if inspect.iscode(const):
+      names |= _code_names(const)
+  return names
+
+
+def _package_module(value):
+  """The `fp_covid19` module that defines `value`, or `None`"""
+  module = value if inspect.ismodule(value) else inspect.getmodule(value)
+  if module is None or not module.__name__.startswith(
+      __name__.split('.')[0] + '.'):
+    return None
+  return module
+
+
+def _imported_modules(module) -> List[str]:
+  """Names of the loaded `fp_covid19` modules that `module` imports"""
+  try:
+    tree = ast.parse(inspect.getsource(module))
+  except (OSError, TypeError):
+    return []
+  names = []
+  for node in ast.walk(tree):
+    if isinstance(node, ast.Import):
+      names.extend(alias.name for alias in node.names)
+    elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+      names.append(node.module)
+      names.extend(node.module + '.' + alias.name for alias in node.names)
+  package = __name__.split('.')[0] + '.'
+  return [name for name in names
+          if name.startswith(package) and name in sys.modules]
+
+
+def _code_dependencies(func) -> Tuple[List[Callable], List[str]]:
+  """Finds the code that a stage function runs.
+
+  Follows the global names of `func` to the functions of its own module
+  that it calls, and to the `fp_covid19` modules it uses, with every
+  `fp_covid19` module those import.
+
+  Returns:
+    Tuple[List[Callable], List[str]]:
+    The functions of the module of `func`, `func` first, and the sorted
+    names of the other `fp_covid19` modules
+  """
+  functions, modules = [], set()
+
+  def visit_module(module):
+    if module.__name__ in modules:
+      return
+    modules.add(module.__name__)
+    for name in _imported_modules(module):
+      visit_module(sys.modules[name])
+
+  def visit_function(function):
+    if function in functions:
+      return
+    functions.append(function)
+    for name in sorted(_code_names(function.__code__)):
+      value = function.__globals__.get(name)
+      if value is None:
+        continue
+      if (inspect.isfunction(value)
+          and value.__module__ == function.__module__):
+        visit_function(value)
+        continue
+      # Also look into lookup tables such as `SOURCES`
+      items = (list(value.values()) if isinstance(value, dict)
+               else list(value) if isinstance(value, (list, tuple))
+               else [value])
+      for item in items:
+        module = _package_module(item)
+        if module is not None and module.__name__ != function.__module__:
+          visit_module(module)
+
+  visit_function(func)
+  return functions, sorted(modules)
+
+
+@functools.lru_cache(maxsize=None)
+def _module_digest(module_name: str) -> str:
+  try:
+    return _digest(inspect.getsource(sys.modules[module_name]))
+  except (OSError, TypeError):
+    return _digest(module_name)
+
+
+@functools.lru_cache(maxsize=None)
+def _source_digest(func) -> str:
+  """Hashes the source of `func`, of the functions of its module that it
+  calls, and of the `fp_covid19` modules they use (see
+  :py:func:`_code_dependencies`), so code changes invalidate the cache"""
+  if not inspect.isfunction(func):
+    return _digest(func.__module__, func.__qualname__)
+  functions, modules = _code_dependencies(func)
+  sources = []
+  for function in functions:
+    try:
+      sources.append(inspect.getsource(function))
+    except (OSError, TypeError):
+      sources.append(function.__qualname__)
+  return _digest(sources, [_module_digest(module) for module in modules])
+
+
+def _output_files(value) -> List[str]:
+  """Paths of the existing files that a stage output refers to, e.g. the
+  pages a render stage returns"""
+  if isinstance(value, dict):
+    value = list(value.values())
+  if isinstance(value, (list, tuple)):
+    return [path for item in value for path in _output_files(item)]
+  if isinstance(value, str) and os.path.isfile(value):
+    return [value]
+  return []
+
+
+class Pipeline:
+  """Runs a dependency graph of cached stages.
+
+  Args:
+    stages (Iterable[Stage]): Stages in any order
+    config (Dict): Configuration values, passed to every stage function
+    cache_dir (str): Directory of the pickled stage outputs. Defaults to
+      `config['cache_dir']`.
+    max_workers (int): Maximum number of stages run concurrently, by
+      threads. Defaults to `config['jobs']`.
+  """
+  def __init__(
+      self, stages: Iterable[Stage], config: Dict, cache_dir: str = None,
+      max_workers: int = None):
+    self.stages = {stage.name: stage for stage in stages}
+    for stage in self.stages.values():
+      for dep in stage.deps:
+        assert dep in self.stages, (
+            'Stage {} depends on unknown stage {}'.format(stage.name, dep))
+    self.config = config
+    self.cache_dir = os.path.join(
+        cache_dir or config.get('cache_dir', '.fp_covid19_cache'), 'stages')
+    self.max_workers = max_workers or config.get('jobs')
+    self._outputs = {}
+    self._lock = threading.Lock()
+
+  def required(self, targets: Iterable[str] = None) -> List[str]:
+    """Returns the stages `targets` need, in topological order.
+
+    Args:
+      targets (Iterable[str]): Stage names. Defaults to all stages.
+
+    Returns:
+      List[str]:
+      Names of `targets` and their transitive dependencies, every stage
+      after its dependencies
+    """
+    order, state = [], {}
+
+    def visit(name):
+      assert name in self.stages, 'Unknown stage {}'.format(name)
+      assert state.get(name) != 'visiting', 'Cycle through stage {}'.format(
+          name)
+      if name not in state:
+        state[name] = 'visiting'
+        for dep in self.stages[name].deps:
+          visit(dep)
+        state[name] = 'done'
+        order.append(name)
+
+    for name in self.stages if targets is None else targets:
+      visit(name)
+    return order
+
+  def _path(self, name: str, key: str) -> str:
+    return os.path.join(self.cache_dir, '{}-{}.pkl'.format(name, key))
+
+  def _input_key(self, stage: Stage, keys: Dict[str, str]) -> str:
+    return _digest(
+        stage.name, _source_digest(stage.func),
+        [(param, self.config.get(param)) for param in stage.params],
+        [keys[dep] for dep in stage.deps])
+
+  def output(self, name: str, key: str) -> Any:
+    """Returns the output of a stage, from memory or from the cache"""
+    with self._lock:
+      if name in self._outputs:
+        return self._outputs[name]
+    with open(self._path(name, key), 'rb') as pickle_file:
+      value = pickle.load(pickle_file)
+    with self._lock:
+      self._outputs[name] = value
+    return value
+
+  def _files_path(self, name: str, key: str) -> str:
+    return os.path.join(self.cache_dir, '{}-{}.files.json'.format(name, key))
+
+  def _is_cached(self, name: str, key: str) -> bool:
+    """`True` if the output of the stage and the files it wrote exist"""
+    if not os.path.exists(self._path(name, key)):
+      return False
+    files_path = self._files_path(name, key)
+    if not os.path.exists(files_path):
+      return True
+    with open(files_path) as files_file:
+      return all(os.path.isfile(path) for path in json.load(files_file))
+
+  def _store(self, name: str, key: str, value: Any):
+    os.makedirs(self.cache_dir, exist_ok=True)
+    path = self._path(name, key)
+    with open(path + '.tmp', 'wb') as pickle_file:
+      pickle.dump(value, pickle_file, protocol=pickle.HIGHEST_PROTOCOL)
+    files_path = self._files_path(name, key)
+    files = _output_files(value)
+    if files:
+      with open(files_path + '.tmp', 'w') as files_file:
+        json.dump(files, files_file)
+      os.replace(files_path + '.tmp', files_path)
+    elif os.path.exists(files_path):
+      os.remove(files_path)
+    os.replace(path + '.tmp', path)
+    for old in (glob.glob(self._path(name, '*'))
+                + glob.glob(self._files_path(name, '*'))):
+      if old not in (path, files_path):
+        os.remove(old)
+    with self._lock:
+      self._outputs[name] = value
+
+  def _execute(self, stage: Stage, keys: Dict[str, str], force: bool):
+    """Runs or skips one stage. Returns `(status, key)`."""
+    if not stage.volatile:
+      key = self._input_key(stage, keys)
+      if not force and self._is_cached(stage.name, key):
+        return 'cached', key
+    inputs = [self.output(dep, keys[dep]) for dep in stage.deps]
+    value = stage.func(self.config, *inputs)
+    if stage.volatile:
+      key = _digest(self._input_key(stage, keys), pickle.dumps(value))
+    self._store(stage.name, key, value)
+    return 'ran', key
+
+  def run(
+      self, targets: Iterable[str] = None,
+      force: Iterable[str] = ()) -> List[StageResult]:
+    """Runs the stages `targets` need.
+
+    A stage starts as soon as all of its dependencies are done. Forcing a
+    stage reruns it, but stages downstream still hit the cache if its
+    output key is unchanged.
+
+    Args:
+      targets (Iterable[str]): Stage names. Defaults to all stages.
+      force (Iterable[str]): Stages to rerun even if cached
+
+    Returns:
+      List[StageResult]:
+      One result per stage, in the order they finished
+    """
+    force = set(force)
+    pending = self.required(targets)
+    keys, results, running = {}, [], {}
+    with concurrent.futures.ThreadPoolExecutor(self.max_workers) as executor:
+      while pending or running:
+        for name in [name for name in pending
+                     if all(dep in keys for dep in self.stages[name].deps)]:
+          pending.remove(name)
+          future = executor.submit(
+              self._execute, self.stages[name], dict(keys), name in force)
+          running[future] = (name, time.perf_counter())
+        done, _ = concurrent.futures.wait(
+            running, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+          name, start = running.pop(future)
+          try:
+            status, keys[name] = future.result()
+          except Exception:
+            for other in running:
+              other.cancel()
+            pending.clear()
+            raise
+          results.append(StageResult(
+              name, status, time.perf_counter() - start, keys[name]))
+    return results
+
+
+def format_timings(
+    results: List[StageResult], wall_seconds: float = None) -> str:
+  """Formats stage results as a table of statuses and times.
+
+  Args:
+    results (List[StageResult]): Results from :py:meth:`Pipeline.run`
+    wall_seconds (float): Elapsed time of the whole run, shorter than the
+      total of the stages when stages ran concurrently
+
+  Returns:
+    str
+  """
+  width = max([len(result.name) for result in results] + [5])
+  lines = ['{:<{}}  {:<6}  {:>8}'.format('stage', width, 'status', 'seconds')]
+  for result in results:
+    lines.append('{:<{}}  {:<6}  {:>8.2f}'.format(
+        result.name, width, result.status, result.seconds))
+  lines.append('{:<{}}  {:<6}  {:>8.2f}'.format(
+      'total', width, '', sum(result.seconds for result in results)))
+  if wall_seconds is not None:
+    lines.append('{:<{}}  {:<6}  {:>8.2f}'.format(
+        'wall', width, '', wall_seconds))
+  return '\n'.join(lines)
+
+
+def fetch_url(url: str, path: str, offline: bool = False) -> str:
+  """Downloads `url` to `path` unless the server reports it unchanged.
+
+  The `ETag` and `Last-Modified` headers of the last download are kept in
+  `path + '.json'` and sent back as `If-None-Match` and
+  `If-Modified-Since`.
+
+  Args:
+    url (str): URL of the file
+    path (str): Local file
+    offline (bool): Uses `path` as it is if it exists
+
+  Returns:
+    str:
+    Hash of the contents of `path`
+  """
+  headers_path = path + '.json'
+  headers = {}
+  if os.path.exists(path) and os.path.exists(headers_path):
+    with open(headers_path) as headers_file:
+      headers = json.load(headers_file)
+  if not (offline and os.path.exists(path)):
+    request = urllib.request.Request(url)
+    if 'etag' in headers:
+      request.add_header('If-None-Match', headers['etag'])
+    if 'last_modified' in headers:
+      request.add_header('If-Modified-Since', headers['last_modified'])
+    try:
+      with urllib.request.urlopen(request) as response:
+        contents = response.read()
+        headers = {'etag': response.headers.get('ETag'),
+                   'last_modified': response.headers.get('Last-Modified')}
+      os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+      with open(path + '.tmp', 'wb') as local_file:
+        local_file.write(contents)
+      os.replace(path + '.tmp', path)
+      headers['digest'] = _digest(contents)
+      with open(headers_path, 'w') as headers_file:
+        json.dump({k: v for k, v in headers.items() if v}, headers_file)
+    except urllib.error.HTTPError as error:
+      if error.code != 304: # Not Modified
+        raise
+  if 'digest' not in headers:
+    with open(path, 'rb') as local_file:
+      headers['digest'] = _digest(local_file.read())
+  return headers['digest']
+
+
+SOURCES = {'usafacts': usafacts, 'jhu_csse': jhu_csse}
+"""Data source modules by name"""
+
+LEVELS = ['states', 'counties']
+
+DEFAULT_CONFIG = {
+    'source': 'usafacts',
+    'cache_dir': '.fp_covid19_cache',
+    'out_dir': 'fp_covid19_out',
+    'offline': False,
+    'jobs': None,
+    'periods': 7,
+    'per': 100000,
+    'top_k': 25,
+    'image_width': 960,
+    'horizon': 28,
+    'window': 21,
+    'thresholds': [10, 50, 100, 500],
+    'bins': 'ranked',
+}
+"""Configuration of :py:data:`NIGHTLY_STAGES`"""
+
+
+def _raw_dir(config: Dict) -> str:
+  return os.path.join(config['cache_dir'], 'raw', config['source'])
+
+
+def source_urls(source: str) -> Dict[str, str]:
+  """Returns `{file_name: url}` of the CSV files of a data source"""
+  if source == 'usafacts':
+    urls = [usafacts.stitch_time_series_csv_url(db_type)
+            for db_type in ['confirmed', 'deaths', 'county_population']]
+  else:
+    urls = [jhu_csse.stitch_time_series_csv_url(db_type, 'US')
+            for db_type in ['confirmed', 'deaths']]
+  return {url.rsplit('/', 1)[-1]: url for url in urls}
+
+
+def fetch_cases(config: Dict) -> Dict:
+  """Downloads the time-series and population CSV files"""
+  raw_dir = _raw_dir(config)
+  digests = {
+      file_name: fetch_url(
+          url, os.path.join(raw_dir, file_name), offline=config['offline'])
+      for file_name, url in source_urls(config['source']).items()}
+  return {'url_root': raw_dir + os.sep, 'digests': digests}
+
+
+def fetch_geometry(config: Dict) -> Dict:
+  """Downloads the state and county GeoJSON files"""
+  geo_dir = os.path.join(config['cache_dir'], 'raw', 'geojson')
+  paths, digests = {}, {}
+  for level, url in [('states', STATES_JSON), ('counties', COUNTIES_JSON)]:
+    paths[level] = os.path.join(geo_dir, url.rsplit('/', 1)[-1])
+    digests[level] = fetch_url(url, paths[level], offline=config['offline'])
+  return {'paths': paths, 'digests': digests}
+
+
+def parse_cases(config: Dict, fetched: Dict) -> Dict[str, Dict[str, Bears]]:
+  """Reads the downloaded CSV files into state and county `Bears`"""
+  return SOURCES[config['source']].get_covid19_us_bears(
+      url_root=fetched['url_root'])
+
+
+def parse_population(config: Dict, fetched: Dict) -> Dict:
+  """Reads the state and county populations"""
+  return SOURCES[config['source']].get_us_population(
+      url_root=fetched['url_root'])
+
+
+def aggregate(config: Dict, covid19: Dict) -> Dict[str, Dict[str, Bears]]:
+  """New cases over the last `config['periods']` days"""
+  return {db_type: {level: new_cases(bears, periods=config['periods'])
+                    for level, bears in levels.items()}
+          for db_type, levels in covid19.items()}
+
+
+def _aligned_population(level: str, bears: Bears, population: Dict):
+  """Population indexed like `bears`, matched by FIPS for counties"""
+  if level == 'states':
+    return population['states']['Population']
+  counties = population['counties'].drop_duplicates('FIPS')
+  by_fips = pd.Series(
+      counties['Population'].to_numpy(), index=counties['FIPS'].astype(str))
+  return pd.Series(
+      bears.df['FIPS'].astype(str).map(by_fips).to_numpy(),
+      index=bears.df.index)
+
+
+def scale_per_capita(
+    config: Dict, aggregated: Dict, population: Dict) -> Dict:
+  """New cases per `config['per']` people"""
+  scaled = {db_type: {} for db_type in aggregated}
+  for level in LEVELS:
+    normalizer = PopulationNormalizer(
+        _aligned_population(
+            level, aggregated['confirmed'][level], population),
+        aggregated['confirmed'][level])
+    for db_type, levels in aggregated.items():
+      scaled[db_type][level] = normalizer.apply(
+          levels[level], per=config['per'])
+  return scaled
+
+
+def rank(config: Dict, scaled: Dict) -> Dict:
+  """Colors and the top-K regions of every day.
+
+  With `config['bins'] == 'ranked'`, colors rank the regions of every day on
+  its own. Otherwise `config['bins']` is one of
+  :py:data:`fp_covid19.visualization.classify.METHODS`, and colors follow
+  class breaks shared by all days, returned as `breaks` per level (`None`
+  for ranked colors).
+  """
+  colors, top, breaks = {}, {}, {}
+  for level in LEVELS:
+    bears = scaled['confirmed'][level]
+    # The first `periods` days have no new-case counts
+    bears = bears.derive(
+        datetime_index=bears.datetime_index[config['periods']:])
+    if config['bins'] == 'ranked':
+      colors[level] = cmap_ranked_df(bears)
+      breaks[level] = None
+    else:
+      classifier = Classifier(config['bins']).fit(bears)
+      colors[level] = classifier.colors(bears)
+      breaks[level] = classifier.breaks.tolist()
+    top[level] = RankingEngine(bears, k=config['top_k']).top_k()
+  return {'colors': colors, 'top': top, 'breaks': breaks}
+
+
+def _with_feature_ids(level: str, bears: Bears, id_by_name: Dict) -> Bears:
+  """Inserts the GeoJSON feature IDs of the rows as column `FeatureId`.
+
+  States are matched by name, counties by FIPS.
+  """
+  if level == 'states':
+    feature_ids = bears.df.index.map(id_by_name)
+  else:
+    feature_ids = bears.df['FIPS'].astype(str)
+  with_ids = bears.derive()
+  with_ids.df.insert(0, 'FeatureId', feature_ids)
+  return with_ids
+
+
+def render_maps(config: Dict, ranked: Dict, geometry: Dict) -> Dict:
+  """Time-slider choropleth pages with sidecar style files.
+
+  Maps whose colors and geometry did not change are skipped, and only the
+  changed style chunks of the others are rewritten.
+  """
+  publisher = MapPublisher(config['out_dir'])
+  paths = {}
+  for level in LEVELS:
+    with open(geometry['paths'][level]) as geo_json_file:
+      geo_json = json.load(geo_json_file)
+    colors = _with_feature_ids(level, ranked['colors'][level], {
+        feature['properties'].get('name'): str(feature.get('id'))
+        for feature in geo_json['features']})
+    name = 'covid19_{}_{}'.format(config['source'], level)
+    publisher.publish(
+        name, geo_json, colors, feature_id_col='FeatureId',
+        geometry_key=geometry['digests'][level])
+    paths[level] = publisher.paths(name)['html']
+  return paths
+
+
+def render_images(config: Dict, ranked: Dict, geometry: Dict) -> Dict:
+  """Static PNG choropleths, one per day, rendering only new days.
+
+  Days already in `out_dir/images` are kept as long as the source, the
+  bins, and the fitted class breaks are the same. Delete them when past
+  colors change otherwise, e.g. after data revisions.
+  """
+  paths = {}
+  for level in LEVELS:
+    gdf = gpd.read_file(geometry['paths'][level])
+    id_by_name = (dict(zip(gdf['name'], gdf['id'].astype(str)))
+                  if 'name' in gdf.columns else {})
+    colors = _with_feature_ids(level, ranked['colors'][level], id_by_name)
+    renderer = StaticChoropleth(gdf, width=config['image_width'])
+    paths[level] = renderer.render_days(
+        colors, os.path.join(config['out_dir'], 'images', level),
+        version='{}-{}-{}-{}'.format(
+            config['source'], config['periods'], config['bins'],
+            _digest(ranked['breaks'][level])[:8]),
+        feature_id_col='FeatureId')
+  return paths
+
+
+def render_charts(
+    config: Dict, aggregated: Dict, population: Dict) -> Dict[str, str]:
+  """Small multiples of the per-capita new cases of all states and of the
+  `US_METROS` in `out_dir/charts`"""
+  directory = os.path.join(config['out_dir'], 'charts')
+  os.makedirs(directory, exist_ok=True)
+  states = aggregated['confirmed']['states']
+  counties = aggregated['confirmed']['counties']
+  county_population = _aligned_population('counties', counties, population)
+  county_population.index = counties.df['FIPS'].astype(str)
+  charts = {
+      'states': compare_chart(
+          states, sorted(states.df.index),
+          population=population['states']['Population'],
+          per=config['per'],
+          datetime_index=states.datetime_index[config['periods']:],
+          title='New cases per {:,} people'.format(config['per'])),
+      'metros': compare_chart(
+          counties, US_METROS, key_col='FIPS',
+          population=county_population[
+              ~county_population.index.duplicated()],
+          per=config['per'],
+          datetime_index=counties.datetime_index[config['periods']:],
+          title='New cases per {:,} people'.format(config['per'])),
+  }
+  paths = {}
+  for name, figure in charts.items():
+    paths[name] = os.path.join(directory, 'compare_{}.png'.format(name))
+    figure.savefig(paths[name] + '.tmp', format='png', dpi=100)
+    os.replace(paths[name] + '.tmp', paths[name])
+  return paths
+
+
+def export(
+    config: Dict, covid19: Dict, aggregated: Dict, scaled: Dict) -> Dict:
+  """Appends the new dates to the Parquet cube in `out_dir/cube`"""
+  return export_cube(
+      {'cumulative': covid19, 'new': aggregated, 'per_capita': scaled},
+      os.path.join(config['out_dir'], 'cube'))
+
+
+def summarize_days(
+    config: Dict, scaled: Dict, population: Dict) -> Dict[str, str]:
+  """Distribution of the per-capita new cases of all regions, per day.
+
+  Writes one CSV per `db_type` and `geo_level` to `out_dir/summaries` with
+  quantiles, means, population-weighted means, and the number of regions
+  above each of `config['thresholds']`.
+  """
+  directory = os.path.join(config['out_dir'], 'summaries')
+  os.makedirs(directory, exist_ok=True)
+  paths = {}
+  for db_type, levels in scaled.items():
+    for level, bears in levels.items():
+      bears = bears.derive(
+          datetime_index=bears.datetime_index[config['periods']:])
+      summary = summarize(
+          bears, weights=_aligned_population(level, bears, population),
+          thresholds=config['thresholds'])
+      name = '{}_{}'.format(db_type, level)
+      paths[name] = os.path.join(directory, name + '.csv')
+      summary.to_csv(paths[name] + '.tmp', float_format='%.4g')
+      os.replace(paths[name] + '.tmp', paths[name])
+  return paths
+
+
+def project_cases(config: Dict, covid19: Dict) -> Dict[str, str]:
+  """Projects daily new cases `config['horizon']` days ahead.
+
+  Writes one CSV per `db_type` and `geo_level` to `out_dir/projections`
+  with the projected days of every region and their prediction intervals.
+  Trends are fitted over the last `config['window']` days, or over all days
+  of shorter series. Series with fewer than three days are not projected.
+  """
+  directory = os.path.join(config['out_dir'], 'projections')
+  os.makedirs(directory, exist_ok=True)
+  paths = {}
+  for db_type, levels in covid19.items():
+    for level, bears in levels.items():
+      num_days = len(bears.datetime_index)
+      if num_days < 3:
+        continue
+      projected = project(
+          new_cases(bears), horizon=config['horizon'],
+          window=min(config['window'], num_days))
+      future = projected['projection'].datetime_index[-config['horizon']:]
+      regions, _ = region_keys(bears)
+      table = pd.concat(
+          {name: pd.DataFrame(
+              result.df[future].to_numpy(), index=regions,
+              columns=future).stack()
+           for name, result in projected.items()}, axis='columns')
+      table.index.names = ['region', 'date']
+      name = '{}_{}'.format(db_type, level)
+      paths[name] = os.path.join(directory, name + '.csv')
+      table.to_csv(paths[name] + '.tmp', float_format='%.1f')
+      os.replace(paths[name] + '.tmp', paths[name])
+  return paths
+
+
+NIGHTLY_STAGES = [
+    Stage('fetch_cases', fetch_cases, params=('source', 'cache_dir', 'offline'),
+          volatile=True),
+    Stage('fetch_geometry', fetch_geometry, params=('cache_dir', 'offline'),
+          volatile=True),
+    Stage('parse', parse_cases, ('fetch_cases',), ('source',)),
+    Stage('population', parse_population, ('fetch_cases',), ('source',)),
+    Stage('aggregate', aggregate, ('parse',), ('periods',)),
+    Stage('per_capita', scale_per_capita, ('aggregate', 'population'),
+          ('per',)),
+    Stage('rank', rank, ('per_capita',), ('periods', 'top_k', 'bins')),
+    Stage('render_maps', render_maps, ('rank', 'fetch_geometry'),
+          ('source', 'out_dir')),
+    Stage('render_images', render_images, ('rank', 'fetch_geometry'),
+          ('source', 'out_dir', 'periods', 'bins', 'image_width')),
+    Stage('render_charts', render_charts, ('aggregate', 'population'),
+          ('out_dir', 'periods', 'per')),
+    Stage('export', export, ('parse', 'aggregate', 'per_capita'),
+          ('out_dir',)),
+    Stage('summarize', summarize_days, ('per_capita', 'population'),
+          ('out_dir', 'periods', 'thresholds')),
+    Stage('project', project_cases, ('parse',),
+          ('out_dir', 'horizon', 'window')),
+]
+"""Stages of the nightly build: fetch, parse, aggregate, per-capita, rank,
+render, chart, export, summarize, and project"""
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""Global classification bins for consistent map colors across days
+
+:py:func:`fp_covid19.visualization.folium_helper.cmap_ranked_df` colors each
+day on its own, so the same color means different values on different days.
+:py:class:`Classifier` instead computes one set of class breaks over the
+whole region-by-day matrix and assigns every cell a class index.
+
+Breaks come from sort-based algorithms on a uniform reservoir sample of the
+finite values, so fitting county data takes one pass and one sort of the
+sample. The sample, minimum, and maximum are kept, so appending days only
+feeds the new columns into them and refits the breaks.
+
+Examples:
+  >>> classifier = Classifier('natural_breaks', k=7).fit(per_capita_counties)
+  >>> classes = classifier.classify(per_capita_counties)   # np.uint8
+  >>> colors = classifier.colors(per_capita_counties)      # for styledict()
+  >>> classifier.update(tomorrows_per_capita_counties)     # new days only
+"""
+from __future__ import annotations
+from typing import List
+import numpy as np
+from branca.colormap import linear
+from fp_covid19.data.bears import Bears
+
+METHODS = ['quantile', 'equal_interval', 'log', 'natural_breaks']
+"""Classification methods of :py:class:`Classifier`"""
+MISSING_CLASS = 255
+"""Class index of `NaN` cells"""
+
+
+def quantile_breaks(sample: np.ndarray, k: int) -> np.ndarray:
+  """Inner breaks that put about the same number of values in every class.
+
+  Args:
+    sample (np.ndarray): Sorted finite values
+    k (int): Number of classes
+
+  Returns:
+    np.ndarray:
+    `k - 1` non-decreasing breaks
+  """
+  return np.quantile(sample, np.arange(1, k) / k)
+
+
+def equal_interval_breaks(vmin: float, vmax: float, k: int) -> np.ndarray:
+  """Inner breaks that split `[vmin, vmax]` into `k` equal intervals"""
+  return vmin + (vmax - vmin) * np.arange(1, k) / k
+
+
+def log_breaks(vmin: float, vmax: float, k: int) -> np.ndarray:
+  """Inner breaks equally spaced in :math:`\\log x` between the smallest
+  positive value `vmin` and `vmax`. Values up to `vmin`, e.g. zeros, are in
+  the first class."""
+  if not 0 < vmin < vmax:
+    return np.full(k - 1, vmax)
+  return vmin * (vmax / vmin) ** (np.arange(1, k) / k)
+
+
+def natural_breaks(
+    sample: np.ndarray, k: int, max_points: int = 1000) -> np.ndarray:
+  """Jenks natural breaks, minimizing the squared deviations within classes.
+
+  Runs the Fisher-Jenks dynamic program on the distinct values of `sample`,
+  weighted by their counts and thinned to at most `max_points` evenly spaced
+  order statistics. Every class step is one vectorized minimization over all
+  (start, end) pairs.
+
+  Args:
+    sample (np.ndarray): Sorted finite values
+    k (int): Number of classes
+    max_points (int): Maximum number of distinct values in the program
+
+  Returns:
+    np.ndarray:
+    `k - 1` non-decreasing breaks, each the smallest value of its class
+  """
+  values, counts = np.unique(sample, return_counts=True)
+  if len(values) > max_points:
+    # Merge runs of neighboring values into groups of similar counts
+    cumulative = np.cumsum(counts)
+    group_starts = np.unique(np.concatenate([[0], np.searchsorted(
+        cumulative, np.linspace(0, cumulative[-1], max_points + 1)[1:-1],
+        side='right')]))
+    group_starts = group_starts[group_starts < len(values)]
+    weights = np.add.reduceat(counts, group_starts)
+    values = np.add.reduceat(values * counts, group_starts) / weights
+    counts = weights
+  num_points = len(values)
+  if num_points <= k:
+    return np.concatenate(
+        [values[1:], np.full(k - num_points, values[-1])])[:k - 1]
+
+  weight = np.concatenate([[0.], np.cumsum(counts, dtype=float)])
+  first = np.concatenate([[0.], np.cumsum(values * counts)])
+  second = np.concatenate([[0.], np.cumsum(values**2 * counts)])
+  starts = np.arange(num_points + 1)[:, np.newaxis]
+  ends = np.arange(num_points + 1)[np.newaxis, :]
+  with np.errstate(invalid='ignore', divide='ignore'):
+    # deviations[i, j]: squared deviations of points i to j - 1
+    deviations = (second[ends] - second[starts]
+                  - (first[ends] - first[starts])**2
+                  / (weight[ends] - weight[starts]))
+  deviations = np.where(ends > starts, deviations, np.inf)
+
+  cost = deviations[0]
+  previous = []
+  for _ in range(1, k):
+    total = cost[:, np.newaxis] + deviations
+    previous.append(total.argmin(axis=0))
+    cost = total[previous[-1], np.arange(num_points + 1)]
+  starts_of_classes = []
+  end = num_points
+  for back in reversed(previous):
+    end = back[end]
+    starts_of_classes.append(end)
+  return values[np.asarray(starts_of_classes[::-1])]
+
+
+class Classifier:
+  """Class breaks over all regions and days, updatable as days are added.
+
+  Args:
+    method (str): One of :py:data:`METHODS`
+    k (int): Number of classes, at most 255
+    max_samples (int): Size of the reservoir sample of the values
+    seed (int): Seed of the sampling
+  """
+  def __init__(self, method: str = 'quantile', k: int = 7,
+               max_samples: int = 100000, seed: int = 0):
+    assert method in METHODS, 'method must be one of {}'.format(METHODS)
+    assert 1 < k < MISSING_CLASS, 'k must be between 2 and 254'
+    self.method = method
+    self.k = k
+    self.max_samples = max_samples
+    self.sample = np.empty(0)
+    """Uniform sample of the finite values seen so far"""
+    self.num_seen = 0
+    self.vmin, self.vmax, self.min_positive = np.inf, -np.inf, np.inf
+    self.dates = set()
+    """Date labels already sampled"""
+    self.breaks = None
+    """`k - 1` inner breaks; class `i` holds values in
+       `[breaks[i - 1], breaks[i])`"""
+    self._rng = np.random.default_rng(seed)
+
+  def __repr__(self) -> str:
+    return 'Classifier({!r}, k={}, breaks={})'.format(
+        self.method, self.k,
+        None if self.breaks is None else np.round(self.breaks, 6).tolist())
+
+  def _add(self, values: np.ndarray):
+    """Feeds finite values into the reservoir (Vitter's algorithm R)"""
+    values = values[np.isfinite(values)]
+    if not len(values):
+      return
+    self.vmin = min(self.vmin, values.min())
+    self.vmax = max(self.vmax, values.max())
+    positive = values[values > 0]
+    if len(positive):
+      self.min_positive = min(self.min_positive, positive.min())
+    room = self.max_samples - len(self.sample)
+    if room > 0:
+      self.sample = np.concatenate([self.sample, values[:room]])
+      self.num_seen += min(room, len(values))
+      values = values[room:]
+    if len(values):
+      seen = self.num_seen + np.arange(1, len(values) + 1)
+      accepted = np.flatnonzero(
+          self._rng.random(len(values)) * seen < self.max_samples)
+      slots = self._rng.integers(0, self.max_samples, len(accepted))
+      # Later values overwrite earlier ones in the same slot, as in order
+      self.sample[slots] = values[accepted]
+      self.num_seen += len(values)
+
+  def _fit_breaks(self):
+    sample = np.sort(self.sample)
+    if not len(sample):
+      self.breaks = np.zeros(self.k - 1)
+    elif self.method == 'quantile':
+      self.breaks = quantile_breaks(sample, self.k)
+    elif self.method == 'equal_interval':
+      self.breaks = equal_interval_breaks(self.vmin, self.vmax, self.k)
+    elif self.method == 'log':
+      self.breaks = log_breaks(self.min_positive, self.vmax, self.k)
+    else:
+      self.breaks = natural_breaks(sample, self.k)
+
+  def update(self, bears: Bears, datetime_index: List[str] = None):
+    """Adds the dates of `bears` not seen yet and refits the breaks.
+
+    Args:
+      bears (Bears): Region-by-day values, e.g. per-capita new cases
+      datetime_index (List[str]): Date labels to consider. Defaults to all.
+
+    Returns:
+      Classifier:
+      `self`
+    """
+    if datetime_index is None:
+      datetime_index = bears.datetime_index
+    new = [date for date in datetime_index if date not in self.dates]
+    if new or self.breaks is None:
+      self._add(bears.df[new].to_numpy(dtype=float).ravel())
+      self.dates.update(new)
+      self._fit_breaks()
+    return self
+
+  def fit(self, bears: Bears, datetime_index: List[str] = None):
+    """Computes the breaks from scratch, see :py:meth:`update`"""
+    self.sample = np.empty(0)
+    self.num_seen = 0
+    self.vmin, self.vmax, self.min_positive = np.inf, -np.inf, np.inf
+    self.dates = set()
+    self.breaks = None
+    return self.update(bears, datetime_index=datetime_index)
+
+  def classify(
+      self, bears: Bears, datetime_index: List[str] = None) -> np.ndarray:
+    """Class index of every cell.
+
+    Returns:
+      np.ndarray:
+      Region-by-day `np.uint8` matrix of classes `0` to `k - 1`, and
+      :py:data:`MISSING_CLASS` for `NaN`
+    """
+    assert self.breaks is not None, 'Call fit() first'
+    if datetime_index is None:
+      datetime_index = bears.datetime_index
+    values = bears.df[datetime_index].to_numpy(dtype=float)
+    classes = np.searchsorted(self.breaks, values, side='right').astype(
+        np.uint8)
+    classes[np.isnan(values)] = MISSING_CLASS
+    return classes
+
+  def palette(self, cmap=None) -> np.ndarray:
+    """One color per class from a branca colormap, by default
+    `linear.OrRd_09`, lightest first"""
+    if cmap is None:
+      cmap = linear.OrRd_09 # pylint: disable=no-member
+    scaled = cmap.scale(0, self.k - 1)
+    return np.array([scaled(i) for i in range(self.k)], dtype=object)
+
+  def colors(
+      self, bears: Bears, cmap=None, missing_color: str = '#ffffff00') -> Bears:
+    """Colors like :py:func:`cmap_ranked_df`, but from the global classes.
+
+    Args:
+      bears (Bears): Region-by-day values
+      cmap: Branca colormap, by default `linear.OrRd_09`
+      missing_color (str): Color of `NaN` cells
+
+    Returns:
+      Bears:
+      Color strings, one column per date, for
+      :py:func:`fp_covid19.visualization.folium_helper.styledict` or
+      :py:class:`fp_covid19.visualization.static_map.StaticChoropleth`
+    """
+    palette = np.append(
+        self.palette(cmap), [missing_color] * (256 - self.k))
+    return bears.derive(palette[self.classify(bears)])
@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+"""Small-multiples charts comparing many regions
+
+A chart like `images/animated_compare_states.gif` has one panel per region,
+all on the same scales. Building it with `plt.subplots` and one `plot` call
+per panel spends most of its time creating and laying out dozens of axes.
+:py:func:`compare_chart` instead lays the panels out as tiles of a single
+axes: every line of every panel is a row of one `(lines, days, 2)` vertex
+array drawn by one `LineCollection`, the panel frames and grid lines are two
+more collections, and only the titles and tick labels are separate artists.
+
+Panels share their scales, so the tiles need no axes of their own: values
+are mapped once into `[0, 1]` and offset by the position of their tile.
+
+Examples:
+  >>> states = new_cases(covid19['confirmed']['states'], periods=7)
+  >>> figure = compare_chart(
+  ...     states, sorted(states.df.index)[:50],
+  ...     population=population['states']['Population'], onset=1)
+  >>> figure.savefig('compare_states.png')
+  >>> figure = compare_chart(
+  ...     new_cases(covid19['confirmed']['counties'], periods=7), US_METROS,
+  ...     key_col='FIPS', log=False)
+  >>> figure.savefig('compare_metros.svg')
+"""
+from __future__ import annotations
+from typing import Dict, List, Sequence, Tuple, Union
+import numpy as np
+import pandas as pd
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+from matplotlib.ticker import MaxNLocator
+from fp_covid19.data.bears import Bears
+from fp_covid19.data.date_axis import date_axis
+
+PANEL_GAP = (0.12, 0.3)
+"""Horizontal and vertical gaps between tiles, in tile sizes. The vertical
+   gap leaves room for the titles."""
+
+
+def _groups(regions: Union[Sequence, Dict[str, Sequence]]) -> Dict:
+  """`{name: [keys]}` of a list of keys or of groups"""
+  if isinstance(regions, dict):
+    return regions
+  return {region: [region] for region in regions}
+
+
+def region_values(
+    bears: Bears,
+    regions: Union[Sequence, Dict[str, Sequence]],
+    key_col: str = None,
+    datetime_index: List[str] = None) -> Tuple[List[str], np.ndarray]:
+  """Selects, or sums up, the rows of every region.
+
+  Args:
+    bears (Bears): Region-by-day values
+    regions: Row keys, one panel each, or `{name: [keys]}` to sum the rows
+      of every group, e.g. `US_METROS`
+    key_col (str): Column label of the keys, e.g. `'FIPS'`, or `None` for
+      the row index. Keys are compared as strings.
+    datetime_index (List[str]): Date labels. Defaults to all dates.
+
+  Returns:
+    Tuple[List[str], np.ndarray]:
+    Region names and the `(regions, days)` matrix. Groups without any
+    value on a day are `NaN`, missing keys count as no value.
+  """
+  if datetime_index is None:
+    datetime_index = bears.datetime_index
+  keys = (bears.df.index if key_col is None
+          else pd.Index(bears.df[key_col])).astype(str)
+  values = bears.df[datetime_index].to_numpy(dtype=float)
+  regions = _groups(regions)
+  names = [str(name) for name in regions]
+  sizes = [len(members) for members in regions.values()]
+  positions = keys.get_indexer(pd.Index(
+      [member for members in regions.values() for member in members],
+      dtype=object).astype(str))
+  rows = np.where(positions[:, np.newaxis] >= 0,
+                  values[np.maximum(positions, 0)], np.nan)
+  starts = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.intp)
+  assert all(sizes), 'Every region needs at least one key'
+  sums = np.add.reduceat(np.nan_to_num(rows), starts, axis=0)
+  counts = np.add.reduceat(~np.isnan(rows), starts, axis=0)
+  return names, np.where(counts > 0, sums, np.nan)
+
+
+def align_by_onset(values: np.ndarray, onset: float) -> np.ndarray:
+  """Shifts every row so that its first value of at least `onset` is in
+  column 0.
+
+  Args:
+    values (np.ndarray): `(regions, days)` matrix
+    onset (float): Threshold of the onset, e.g. 1 new case per 100,000
+
+  Returns:
+    np.ndarray:
+    Matrix of the same shape, `NaN` after the shifted values and in the
+    rows that never reach `onset`
+  """
+  reached = np.nan_to_num(values, nan=-np.inf) >= onset
+  first = np.where(reached.any(axis=1), reached.argmax(axis=1),
+                   values.shape[1])
+  columns = first[:, np.newaxis] + np.arange(values.shape[1])
+  inside = columns < values.shape[1]
+  return np.where(inside, np.take_along_axis(
+      values, np.minimum(columns, values.shape[1] - 1), axis=1), np.nan)
+
+
+def _y_ticks(low: float, high: float, log: bool) -> Tuple[List, List]:
+  """Tick positions in the scale of the values and their labels"""
+  if log:
+    ticks = np.arange(np.ceil(low), np.floor(high) + 1)
+    if len(ticks) > 5:
+      ticks = ticks[::int(np.ceil(len(ticks) / 5))]
+    return ticks, ['{:,g}'.format(10**tick) for tick in ticks]
+  ticks = MaxNLocator(4).tick_values(low, high)
+  ticks = ticks[(ticks >= low) & (ticks <= high)]
+  return ticks, ['{:,g}'.format(tick) for tick in ticks]
+
+
+def _x_ticks(datetime_index: List[str], num_days: int,
+             aligned: bool) -> Tuple[List, List]:
+  """Tick positions in days and their labels: days since onset, or the
+  first days of months"""
+  if aligned:
+    ticks = MaxNLocator(4, integer=True).tick_values(0, num_days - 1)
+    ticks = ticks[(ticks >= 0) & (ticks <= num_days - 1)]
+    return ticks, ['{:g}'.format(tick) for tick in ticks]
+  datetimes = date_axis(datetime_index).datetimes
+  ticks = np.flatnonzero(datetimes.day == 1)
+  if len(ticks) < 2: # Less than two months
+    ticks = MaxNLocator(3, integer=True).tick_values(0, num_days - 1)
+    ticks = ticks[(ticks >= 0) & (ticks <= num_days - 1)].astype(np.intp)
+    return ticks, datetimes[ticks].strftime('%b %-d').tolist()
+  if len(ticks) > 4:
+    ticks = ticks[::int(np.ceil(len(ticks) / 4))]
+  return ticks, datetimes[ticks].strftime('%b').tolist()
+
+
+def compare_chart(
+    bears: Bears,
+    regions: Union[Sequence, Dict[str, Sequence]],
+    key_col: str = None,
+    population: pd.Series = None,
+    per: float = 100000,
+    onset: float = None,
+    log: bool = True,
+    ncols: int = None,
+    panel_size: Tuple[float, float] = (1.6, 1.2),
+    context: bool = True,
+    color: str = '#d7301f',
+    title: str = None,
+    datetime_index: List[str] = None) -> Figure:
+  """Draws one panel per region, all on the same scales.
+
+  Args:
+    bears (Bears): Region-by-day values, e.g. 7-day new cases
+    regions: Row keys or `{name: [keys]}` groups, see
+      :py:func:`region_values`
+    key_col (str): Column label of the keys, or `None` for the row index
+    population (pd.Series): If given, plots values per `per` people.
+      Indexed by the same keys as the rows, compared as strings; groups sum
+      their members.
+    per (float): Population unit of the per-capita values
+    onset (float): If given, aligns the regions by the first day their
+      (per-capita) value reaches `onset`, and the x-axis counts the days
+      since
+    log (bool): Logarithmic y-axis. Values up to 0 are left out.
+    ncols (int): Panels per row. Defaults to a grid about as wide as high
+      in inches.
+    panel_size (Tuple[float, float]): Width and height of a panel in inches
+    context (bool): Draws the other regions behind every panel in gray
+    color (str): Color of the region of every panel
+    title (str): Figure title
+    datetime_index (List[str]): Date labels. Defaults to all dates.
+
+  Returns:
+    matplotlib.figure.Figure:
+    The chart, not registered with `pyplot`; save it with
+    `figure.savefig(path)` as PNG, SVG, or PDF
+  """
+  if datetime_index is None:
+    datetime_index = bears.datetime_index
+  names, values = region_values(
+      bears, regions, key_col=key_col, datetime_index=datetime_index)
+  if population is not None:
+    population = population.set_axis(population.index.astype(str))
+    sizes = np.array([
+        population.reindex([str(member) for member in members]).sum()
+        for members in _groups(regions).values()], dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+      values = values * per / np.where(sizes > 0, sizes, np.nan)[:, None]
+  if onset is not None:
+    values = align_by_onset(values, onset)
+  if log:
+    with np.errstate(invalid='ignore', divide='ignore'):
+      values = np.where(values > 0, np.log10(values), np.nan)
+  num_regions, num_days = values.shape
+  assert num_regions and num_days, 'Nothing to draw'
+  if onset is not None:
+    # Trim the days after the longest aligned run
+    num_days = max(1, int(np.flatnonzero(
+        ~np.isnan(values).all(axis=0)).max(initial=0)) + 1)
+    values = values[:, :num_days]
+
+  low, high = np.nanmin(values), np.nanmax(values)
+  if not np.isfinite(low):
+    low, high = 0., 1.
+  if log:
+    low = min(np.floor(low), high - 1)
+  else:
+    low = min(low, 0.)
+  high = max(high, low + 1e-9)
+  if ncols is None:
+    ncols = max(1, int(np.ceil(np.sqrt(
+        num_regions * panel_size[1] / panel_size[0]))))
+  nrows = int(np.ceil(num_regions / ncols))
+  step_x, step_y = 1 + PANEL_GAP[0], 1 + PANEL_GAP[1]
+  panels = np.arange(num_regions)
+  offset_x = (panels % ncols) * step_x
+  offset_y = (nrows - 1 - panels // ncols) * step_y
+
+  # Every line is a row of vertices; NaN breaks it
+  x = np.arange(num_days) / max(num_days - 1, 1)
+  y = (values - low) / (high - low)
+  vertices = np.stack(np.broadcast_arrays(x, y), axis=-1)
+
+  # Inches of margin: y tick labels on the left, x tick labels below, and
+  # the figure title above the titles of the top row
+  margins = (0.5, 0.1, 0.25, 0.35 if title else 0.)
+  width = ncols * panel_size[0] * step_x + margins[0] + margins[1]
+  height = nrows * panel_size[1] * step_y + margins[2] + margins[3]
+  figure = Figure(figsize=(width, height))
+  axes = figure.add_axes([
+      margins[0] / width, margins[2] / height,
+      1 - (margins[0] + margins[1]) / width,
+      1 - (margins[2] + margins[3]) / height])
+  axes.set_axis_off()
+  axes.set_xlim(-0.02, ncols * step_x - PANEL_GAP[0] + 0.02)
+  axes.set_ylim(-0.02, nrows * step_y)
+
+  y_ticks, y_labels = _y_ticks(low, high, log)
+  x_ticks, x_labels = _x_ticks(datetime_index, num_days, onset is not None)
+  x_ticks = np.asarray(x_ticks, dtype=float) / max(num_days - 1, 1)
+  y_ticks = (np.asarray(y_ticks, dtype=float) - low) / (high - low)
+  frame = np.array([[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]], dtype=float)
+  grid = [np.array([[0, tick], [1, tick]]) for tick in y_ticks]
+  offsets = np.column_stack([offset_x, offset_y])
+  axes.add_collection(LineCollection(
+      [line + offset for offset in offsets for line in grid],
+      colors='#e8e8e8', linewidths=0.5, zorder=0))
+  axes.add_collection(LineCollection(
+      frame[np.newaxis] + offsets[:, np.newaxis], colors='#bdbdbd',
+      linewidths=0.6, zorder=3))
+  if context and num_regions > 1:
+    axes.add_collection(LineCollection(
+        (vertices[np.newaxis] + offsets[:, np.newaxis, np.newaxis]).reshape(
+            -1, num_days, 2),
+        colors='#d0d0d0', linewidths=0.4, zorder=1))
+  axes.add_collection(LineCollection(
+      vertices + offsets[:, np.newaxis], colors=color, linewidths=1.,
+      zorder=2))
+
+  max_title = int(panel_size[0] * step_x * 16) # Characters at 7 points
+  for name, (left, bottom) in zip(names, offsets):
+    if len(name) > max_title:
+      name = name[:max_title - 1] + '\u2026'
+    axes.text(left, bottom + 1.03, name, fontsize=7, va='bottom')
+  for row in range(nrows):
+    bottom = (nrows - 1 - row) * step_y
+    for tick, label in zip(y_ticks, y_labels):
+      axes.text(-0.03, bottom + tick, label, fontsize=6, ha='right',
+                va='center', color='#636363')
+  for panel in panels[-min(ncols, num_regions):]:
+    for tick, label in zip(x_ticks, x_labels):
+      axes.text(offset_x[panel] + tick, offset_y[panel] - 0.03, label,
+                fontsize=6, ha='center', va='top', color='#636363')
+  if title:
+    figure.suptitle(title, y=1 - 0.08 / height, va='top', fontsize=10)
+  return figure
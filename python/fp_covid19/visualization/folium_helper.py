@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 """Helper Library for Folium"""
+from typing import Dict
 import numpy as np
 import folium
 from branca.colormap import linear
@@ -41,15 +42,37 @@ def folium_add_map_title(title: str, folium_map: folium.Map):
 def cmap_ranked_df(
     bears: Bears, cmap=linear.OrRd_09.scale(0, 1)): # pylint: disable=no-member
   """Computes color map for ranked data"""
-  cmap_bears = bears.copy()
+  datetime_index = bears.datetime_index
+  values = bears.df[datetime_index]
   # Normalize data daily
-  col_min, col_max = (
-      cmap_bears.df[cmap_bears.datetime_index].min(),
-      cmap_bears.df[cmap_bears.datetime_index].max())
-  cmap_bears.df.loc[:, cmap_bears.datetime_index] = (
-      (cmap_bears.df[cmap_bears.datetime_index] - col_min)/(col_max - col_min))
-  cmap_bears.df.loc[:, cmap_bears.datetime_index] = cmap_bears.df[
-      cmap_bears.datetime_index].rank(method='min', pct=True, na_option='top')
-  cmap_bears.df.loc[:, cmap_bears.datetime_index] = cmap_bears.df[
-      cmap_bears.datetime_index].apply(np.vectorize(cmap))
-  return cmap_bears
+  col_min, col_max = values.min(), values.max()
+  values = ((values - col_min)/(col_max - col_min)).rank(
+      method='min', pct=True, na_option='top')
+  return bears.derive(values.apply(np.vectorize(cmap)))
+
+
+def styledict(
+    cmap_bears: Bears, feature_id_col='FIPS', opacity=0.7) -> Dict:
+  """Converts colors from :py:func:`cmap_ranked_df` to a
+  `TimeSliderChoropleth` `styledict`.
+
+  Args:
+    cmap_bears (Bears): Colors, one column per date
+    feature_id_col (str): Column label of the GeoJSON feature IDs, or `None`
+      to use the row index
+    opacity (float): Fill opacity of every feature
+
+  Returns:
+    Dict:
+    `{feature_id: {epoch_string: {'color': color, 'opacity': opacity}}}`,
+    where `epoch_string` comes from `cmap_bears.date_axis.epoch_strings`
+  """
+  epoch_strings = cmap_bears.date_axis.epoch_strings
+  feature_ids = (cmap_bears.df.index if feature_id_col is None
+                 else cmap_bears.df[feature_id_col])
+  colors = cmap_bears.df[cmap_bears.datetime_index].to_numpy()
+  return {
+      str(feature_id): {
+          epoch: {'color': color, 'opacity': opacity}
+          for epoch, color in zip(epoch_strings, row)}
+      for feature_id, row in zip(feature_ids, colors)}
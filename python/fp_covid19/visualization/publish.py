@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""Change-aware publishing of time-slider choropleth pages
+
+Rebuilding every map page each night rewrites megabytes of styles even when
+the data only gained a day or did not change at all. :py:class:`MapPublisher`
+fingerprints the inputs of each map (the colors of every chunk of days, the
+colormap, and the geometry) and records them in a manifest next to the pages:
+
+* If no fingerprint changed, the map is skipped without building its
+  `styledict` or its folium page.
+* Otherwise the page is built with sidecar files, and
+  :py:meth:`TimeSliderChoropleth.write_sidecar_files` rewrites only the
+  chunks whose contents changed, e.g. the last chunk after a new day.
+* The HTML page itself is rewritten only if its own inputs changed: the
+  dates, the colormap, or the page options.
+
+Examples:
+  >>> publisher = MapPublisher('site')
+  >>> publisher.publish('covid19_counties', geo_json, colors,
+  ...                   feature_id_col='FIPS')
+  'updated'
+"""
+from __future__ import annotations
+from typing import Dict
+import hashlib
+import json
+import os
+import folium
+import pandas as pd
+from fp_covid19.data.bears import Bears
+from fp_covid19.visualization.folium_helper import styledict
+from fp_covid19.visualization.time_slider_choropleth import (
+    TimeSliderChoropleth)
+
+MANIFEST_FILE = '_maps.json'
+"""Fingerprints of the published maps, in the output directory"""
+
+
+def fingerprint(*parts) -> str:
+  """SHA-1 of `bytes`, `str`, or JSON-serializable parts"""
+  digest = hashlib.sha1()
+  for part in parts:
+    if isinstance(part, str):
+      part = part.encode()
+    elif not isinstance(part, bytes):
+      part = json.dumps(part, sort_keys=True, default=str).encode()
+    digest.update(part)
+    digest.update(b'\0')
+  return digest.hexdigest()
+
+
+def chunk_fingerprints(
+    cmap_bears: Bears, feature_id_col='FIPS',
+    chunk_size: int = 30) -> Dict[str, str]:
+  """Fingerprints the colors of every chunk of `chunk_size` days.
+
+  Chunks follow the sidecar style files of `TimeSliderChoropleth`, so a
+  changed fingerprint means a changed `styles_<chunk>.json`. The colors are
+  hashed with `pd.util.hash_pandas_object`, without building the
+  `styledict`.
+
+  Returns:
+    Dict[str, str]:
+    `{'<first epoch>': sha1}`, one entry per chunk
+  """
+  datetime_index = cmap_bears.datetime_index
+  epoch_strings = cmap_bears.date_axis.epoch_strings
+  feature_ids = (cmap_bears.df.index.to_series() if feature_id_col is None
+                 else cmap_bears.df[feature_id_col]).astype(str)
+  feature_hash = pd.util.hash_pandas_object(
+      feature_ids, index=False).to_numpy().tobytes()
+  # Chunks of the page cover sorted epochs, like the slider
+  order = sorted(range(len(epoch_strings)),
+                 key=lambda i: epoch_strings[i])
+  fingerprints = {}
+  for start in range(0, len(order), chunk_size):
+    positions = order[start:start + chunk_size]
+    colors = cmap_bears.df[[datetime_index[i] for i in positions]]
+    fingerprints[epoch_strings[positions[0]]] = fingerprint(
+        feature_hash,
+        [epoch_strings[i] for i in positions],
+        pd.util.hash_pandas_object(
+            colors.astype(str), index=False).to_numpy().tobytes())
+  return fingerprints
+
+
+class MapPublisher:
+  """Publishes time-slider choropleth pages, rebuilding only what changed.
+
+  Every map is `<out_dir>/<name>.html` plus the sidecar directory
+  `<out_dir>/<name>_files`.
+
+  Args:
+    out_dir (str): Output directory of the pages
+    chunk_size (int): Days per sidecar style file
+  """
+  def __init__(self, out_dir: str, chunk_size: int = 30):
+    self.out_dir = out_dir
+    self.chunk_size = chunk_size
+    self.manifest_path = os.path.join(out_dir, MANIFEST_FILE)
+    self.manifest = {}
+    if os.path.exists(self.manifest_path):
+      with open(self.manifest_path) as manifest_file:
+        self.manifest = json.load(manifest_file)
+
+  def _write_manifest(self):
+    os.makedirs(self.out_dir, exist_ok=True)
+    with open(self.manifest_path + '.tmp', 'w') as manifest_file:
+      json.dump(self.manifest, manifest_file, indent=1, sort_keys=True)
+    os.replace(self.manifest_path + '.tmp', self.manifest_path)
+
+  def paths(self, name: str) -> Dict[str, str]:
+    """`{'html': page_path, 'sidecar_dir': directory}` of map `name`"""
+    return {'html': os.path.join(self.out_dir, name + '.html'),
+            'sidecar_dir': os.path.join(self.out_dir, name + '_files')}
+
+  def publish(
+      self,
+      name: str,
+      geo_json: Dict,
+      cmap_bears: Bears,
+      feature_id_col='FIPS',
+      geometry_key: str = None,
+      colormap=None,
+      init_timestamp_index: int = -1,
+      map_kwargs: Dict = None) -> str:
+    """Publishes one map if its inputs changed since the last publication.
+
+    Args:
+      name (str): Map name, also the layer name and the file name
+      geo_json (Dict): GeoJSON of the regions, at the resolution to publish
+      cmap_bears (Bears): Colors, one column per date, e.g. from
+        :py:func:`fp_covid19.visualization.folium_helper.cmap_ranked_df`
+      feature_id_col (str): Column label of the GeoJSON feature IDs, or
+        `None` to use the row index
+      geometry_key (str): Fingerprint of `geo_json`, e.g. the download
+        digest of the file, to skip hashing it. Must change whenever the
+        geometry or its resolution does.
+      colormap: Branca colormap to add as the legend, or `None`
+      init_timestamp_index (int): Initial slider position
+      map_kwargs (Dict): Keyword arguments of `folium.Map`
+
+    Returns:
+      str:
+      `'unchanged'`, `'styles'` (only sidecar files were rewritten), or
+      `'updated'` (the page too)
+    """
+    map_kwargs = dict({'location': [38, -97], 'zoom_start': 4},
+                      **(map_kwargs or {}))
+    paths = self.paths(name)
+    chunks = chunk_fingerprints(
+        cmap_bears, feature_id_col=feature_id_col, chunk_size=self.chunk_size)
+    inputs = {
+        'geometry': geometry_key or fingerprint(geo_json),
+        'chunks': chunks,
+        'page': fingerprint(
+            sorted(cmap_bears.date_axis.epoch_strings), self.chunk_size,
+            init_timestamp_index, map_kwargs,
+            None if colormap is None else [
+                colormap.colors, colormap.index,
+                getattr(colormap, 'caption', None)]),
+    }
+    previous = self.manifest.get(name)
+    if previous == inputs and all(
+        os.path.exists(path) for path in paths.values()):
+      return 'unchanged'
+
+    folium_map = folium.Map(**map_kwargs)
+    slider = TimeSliderChoropleth(
+        geo_json, styledict(cmap_bears, feature_id_col=feature_id_col),
+        name=name, init_timestamp_index=init_timestamp_index,
+        sidecar_dir=paths['sidecar_dir'], chunk_size=self.chunk_size)
+    slider.add_to(folium_map)
+    if colormap is not None:
+      colormap.add_to(folium_map)
+    if (previous is not None and previous.get('page') == inputs['page']
+        and os.path.exists(paths['html'])):
+      slider.write_sidecar_files()
+      status = 'styles'
+    else:
+      os.makedirs(self.out_dir, exist_ok=True)
+      folium_map.save(paths['html']) # Also writes the sidecar files
+      status = 'updated'
+    self.manifest[name] = inputs
+    self._write_manifest()
+    return status
@@ -1,5 +1,10 @@
 # -*- coding: utf-8 -*-
 
+import json
+import os
+
+import numpy as np
+
 from branca.element import CssLink, Figure, JavascriptLink, MacroElement
 
 from jinja2 import Template
@@ -9,6 +14,140 @@ from folium.features import FeatureGroup, GeoJson, TopoJson
 from folium.plugins import MarkerCluster
 from folium.utilities import parse_options
 
+from fp_covid19.visualization.time_slider_choropleth import TimeSliderChoropleth
+
+
+def _coordinates(coordinates):
+    """Yields the `[x, y]` positions of nested GeoJSON coordinates."""
+    if len(coordinates) and isinstance(coordinates[0], (int, float)):
+        yield coordinates[:2]
+    else:
+        for child in coordinates:
+            yield from _coordinates(child)
+
+
+def _geojson_bounds(geometry):
+    """Returns `[south, west, north, east]` of a GeoJSON geometry."""
+    if geometry is None:
+        return None
+    if geometry['type'] == 'GeometryCollection':
+        positions = [position for child in geometry['geometries']
+                     for position in _coordinates(child['coordinates'])]
+    else:
+        positions = list(_coordinates(geometry['coordinates']))
+    if not positions:
+        return None
+    positions = np.asarray(positions, dtype=float)
+    (west, south), (east, north) = positions.min(axis=0), positions.max(axis=0)
+    return [south, west, north, east]
+
+
+def _arc_indices(arcs):
+    """Yields the arc indices of nested TopoJSON arcs, reversed or not."""
+    for child in arcs:
+        if isinstance(child, int):
+            yield child if child >= 0 else ~child
+        else:
+            yield from _arc_indices(child)
+
+
+def _topojson_bounds(topology, object_path):
+    """Yields `(properties, [south, west, north, east])` of every geometry in
+    a TopoJSON object.
+
+    Every arc is decoded once, however many geometries share it.
+    """
+    transform = topology.get('transform')
+    scale, translate = np.ones(2), np.zeros(2)
+    if transform is not None:
+        scale = np.asarray(transform['scale'], dtype=float)
+        translate = np.asarray(transform['translate'], dtype=float)
+    arc_bounds = []
+    for arc in topology['arcs']:
+        positions = np.asarray(arc, dtype=float)[:, :2]
+        if transform is not None:
+            positions = positions.cumsum(axis=0)
+        positions = positions * scale + translate
+        arc_bounds.append(np.r_[positions.min(axis=0), positions.max(axis=0)])
+    arc_bounds = np.asarray(arc_bounds).reshape(-1, 4)
+
+    obj = topology
+    for key in object_path.split('.'):
+        obj = obj[key]
+    geometries = obj['geometries'] if 'geometries' in obj else [obj]
+    for geometry in geometries:
+        if 'arcs' in geometry:
+            indices = list(_arc_indices(geometry['arcs']))
+            if not indices:
+                continue
+            bounds = arc_bounds[indices]
+            (west, south), (east, north) = (bounds[:, :2].min(axis=0),
+                                            bounds[:, 2:].max(axis=0))
+        elif 'coordinates' in geometry:
+            positions = np.asarray(list(_coordinates(geometry['coordinates'])),
+                                   dtype=float) * scale + translate
+            (west, south), (east, north) = (positions.min(axis=0),
+                                            positions.max(axis=0))
+        else:
+            continue
+        yield geometry.get('properties', {}), [south, west, north, east]
+
+
+def search_index(labeled_bounds, gram=3, precision=5):
+    """Builds a compact prefix and n-gram index of labels and their bounds.
+
+    Parameters
+    ----------
+    labeled_bounds: iterable of (str, list)
+        `(label, [south, west, north, east])` pairs. The bounds of repeated
+        labels are merged.
+    gram: int, default 3
+        Length of the indexed n-grams. Shorter queries are looked up among
+        the label prefixes.
+    precision: int, default 5
+        Decimal places of the bounds, about a meter at 5.
+
+    Returns
+    -------
+    dict
+        `labels` sorted, their `bounds` flattened to `[s0, w0, n0, e0, s1,
+        ...]`, `prefixes` of up to `gram - 1` characters and `grams`, each
+        mapping a lowercase key to the positions of the labels that contain
+        it. Positions are ascending and gap-encoded: the first is absolute,
+        the others are differences from the previous one.
+    """
+    merged = {}
+    for label, bounds in labeled_bounds:
+        if label is None or bounds is None:
+            continue
+        label = str(label)
+        if label in merged:
+            old = merged[label]
+            bounds = [min(old[0], bounds[0]), min(old[1], bounds[1]),
+                      max(old[2], bounds[2]), max(old[3], bounds[3])]
+        merged[label] = bounds
+    labels = sorted(merged)
+    prefixes, grams = {}, {}
+    for position, label in enumerate(labels):
+        lower = label.lower()
+        for length in range(1, min(gram, len(lower) + 1)):
+            prefixes.setdefault(lower[:length], []).append(position)
+        for key in sorted({lower[i:i + gram]
+                           for i in range(len(lower) - gram + 1)}):
+            grams.setdefault(key, []).append(position)
+    for postings in (prefixes, grams):
+        for key, positions in postings.items():
+            postings[key] = np.diff(positions, prepend=0).tolist()
+    bounds = np.round(np.asarray([merged[label] for label in labels],
+                                 dtype=float).reshape(-1, 4), precision)
+    return {
+        'gram': gram,
+        'labels': labels,
+        'bounds': bounds.ravel().tolist(),
+        'prefixes': prefixes,
+        'grams': grams,
+    }
+
 
 class Search(MacroElement):
     """
@@ -16,7 +155,8 @@ class Search(MacroElement):
 
     Parameters
     ----------
-    layer: GeoJson, TopoJson, FeatureGroup, MarkerCluster class object.
+    layer: GeoJson, TopoJson, TimeSliderChoropleth, FeatureGroup,
+        MarkerCluster class object.
         The map layer to index in the Search view.
     search_label: str, optional
         'properties' key in layer to index Search, if layer is GeoJson/TopoJson.
@@ -33,6 +173,20 @@ class Search(MacroElement):
         Placeholder text inside the Search box if nothing is entered.
     collapsed: boolean, default False
         Whether the Search box should be collapsed or not.
+    search_index: bool, default False
+        If True, the label and bounds of every GeoJson/TopoJson feature are
+        indexed in Python by :py:func:`search_index` and embedded in the
+        page. Each keystroke then looks up the index instead of scanning the
+        properties of every feature, and a match zooms to its bounds even if
+        the layer geometry has not been loaded, e.g. a `TimeSliderChoropleth`
+        with `sidecar_dir`. Requires `search_label`.
+    search_index_file: str, default None
+        If not None, the index is written to this JSON file when the map is
+        rendered and fetched by the page instead of being embedded. Implies
+        `search_index`. Serve the page over HTTP.
+    search_index_url: str, default None
+        URL of `search_index_file` as seen from the HTML page. Defaults to
+        the base name of `search_index_file`.
     **kwargs.
         Assorted style options to change feature styling on match.
         Use the same way as vector layer arguments.
@@ -42,15 +196,104 @@ class Search(MacroElement):
     """
     _template = Template("""
         {% macro script(this, kwargs) %}
+            {% if this.search_index %}
+            {% if this.search_index_url is none %}
+            var {{this.get_name()}}_index = Promise.resolve({{ this.index|tojson }});
+            {% else %}
+            var {{this.get_name()}}_index = fetch({{ this.search_index_url|tojson }})
+                .then(function(response) { return response.json(); });
+            {% endif %}
+            var {{this.get_name()}}_positions = {};
+            // Candidates from the prefix or n-gram posting lists, then an
+            // exact substring test of the candidates only
+            var {{this.get_name()}}_lookup = function(text, callResponse) {
+                var initial = this.options.initial;
+                {{this.get_name()}}_index.then(function(index) {
+                    var query = text.toLowerCase();
+                    var decode = function(gaps) {
+                        var positions = [], position = 0;
+                        for (var i = 0; i < (gaps || []).length; i++) {
+                            positions.push(position += gaps[i]);
+                        }
+                        return positions;
+                    };
+                    var candidates;
+                    if (query.length < index.gram) {
+                        candidates = decode(index.prefixes[query]);
+                    } else {
+                        var postings = [];
+                        for (var i = 0; i + index.gram <= query.length; i++) {
+                            postings.push(decode(index.grams[query.substr(i, index.gram)]));
+                        }
+                        postings.sort(function(a, b) { return a.length - b.length; });
+                        candidates = postings[0];
+                        for (var p = 1; p < postings.length && candidates.length; p++) {
+                            // Merge of two ascending posting lists
+                            var merged = [], posting = postings[p], j = 0;
+                            for (var k = 0; k < candidates.length; k++) {
+                                while (j < posting.length && posting[j] < candidates[k]) j++;
+                                if (posting[j] === candidates[k]) merged.push(candidates[k]);
+                            }
+                            candidates = merged;
+                        }
+                    }
+                    var records = [];
+                    candidates.forEach(function(position) {
+                        var label = index.labels[position];
+                        var at = label.toLowerCase().indexOf(query);
+                        if (at === 0 || (at > 0 && !initial)) {
+                            var b = index.bounds.slice(4 * position, 4 * position + 4);
+                            {{this.get_name()}}_positions[label] = b;
+                            records.push({
+                                title: label,
+                                loc: [(b[0] + b[2]) / 2, (b[1] + b[3]) / 2]
+                            });
+                        }
+                    });
+                    callResponse(records);
+                });
+                return {abort: function() {}};
+            };
+            var {{this.get_name()}}_layers = {};
+            var {{this.get_name()}}_find_layer = function(title) {
+                if (!(title in {{this.get_name()}}_layers) && {{this.layer.get_name()}}.eachLayer) {
+                    {{this.layer.get_name()}}.eachLayer(function(layer) {
+                        if (layer.feature && layer.feature.properties) {
+                            {{this.get_name()}}_layers[layer.feature.properties[{{ this.search_label|tojson }}]] = layer;
+                        }
+                    });
+                }
+                return {{this.get_name()}}_layers[title];
+            };
+            {% endif %}
             var {{this.layer.get_name()}}searchControl = new L.Control.Search({
+                {% if this.search_index %}
+                sourceData: {{this.get_name()}}_lookup,
+                propertyName: 'title',
+                propertyLoc: 'loc',
+                {% else %}
                 layer: {{this.layer.get_name()}},
-                {% if this.search_label %}
+                {% endif %}
+                {% if this.search_label and not this.search_index %}
                 propertyName: '{{this.search_label}}',
                 {% endif %}
                 collapsed: {{this.collapsed|tojson|safe}},
                 textPlaceholder: '{{this.placeholder}}',
                 position:'{{this.position}}',                
-            {% if this.geom_type == 'Point' %}
+            {% if this.search_index %}
+                {% if this.geom_type == 'Point' %}
+                initial: false,
+                {% endif %}
+                marker: false,
+                moveToLocation: function(latlng, title, map) {
+                    var b = {{this.get_name()}}_positions[title];
+                    {% if this.search_zoom %}
+                    map.flyTo(latlng, {{ this.search_zoom }});
+                    {% else %}
+                    map.flyToBounds([[b[0], b[1]], [b[2], b[3]]]);
+                    {% endif %}
+                }
+            {% elif this.geom_type == 'Point' %}
                 initial: false,
                 {% if this.search_zoom %}
                 zoom: {{this.search_zoom}},
@@ -68,6 +311,11 @@ class Search(MacroElement):
                     {{this.layer.get_name()}}.setStyle(function(feature){
                         return feature.properties.style
                     })
+                    {% if this.search_index %}
+                    e.layer = {{this.get_name()}}_find_layer(e.text);
+                    if (!e.layer)
+                        return;
+                    {% endif %}
                     {% if this.options %}
                     e.layer.setStyle({{ this.options|tojson }});
                     {% endif %}
@@ -86,13 +334,15 @@ class Search(MacroElement):
 
     def __init__(self, layer, search_label=None, search_zoom=None,
                  geom_type='Point', position='topleft', placeholder='Search',
-                 collapsed=False, **kwargs):
+                 collapsed=False, search_index=False, search_index_file=None,
+                 search_index_url=None, **kwargs):
         super(Search, self).__init__()
         assert isinstance(layer,
-                          (GeoJson, MarkerCluster, FeatureGroup, TopoJson)
+                          (GeoJson, MarkerCluster, FeatureGroup, TopoJson,
+                           TimeSliderChoropleth)
                           ), 'Search can only index FeatureGroup, ' \
-                             'MarkerCluster, GeoJson, and TopoJson layers at ' \
-                             'this time.'
+                             'MarkerCluster, GeoJson, TopoJson, and ' \
+                             'TimeSliderChoropleth layers at this time.'
         self.layer = layer
         self.search_label = search_label
         self.search_zoom = search_zoom
@@ -101,6 +351,45 @@ class Search(MacroElement):
         self.placeholder = placeholder
         self.collapsed = collapsed
         self.options = parse_options(**kwargs)
+        self.search_index = search_index or search_index_file is not None
+        if self.search_index:
+            assert search_label is not None, 'search_index requires ' \
+                                             'search_label.'
+            assert isinstance(layer, (GeoJson, TopoJson,
+                                      TimeSliderChoropleth)), \
+                'search_index requires a GeoJson, TopoJson, or ' \
+                'TimeSliderChoropleth layer.'
+        self.search_index_file = search_index_file
+        if search_index_file is not None and search_index_url is None:
+            search_index_url = os.path.basename(search_index_file)
+        self.search_index_url = search_index_url
+        self.index = None
+
+    def labeled_bounds(self):
+        """Yields `(search_label value, [south, west, north, east])` of every
+        feature of the layer."""
+        if isinstance(self.layer, TopoJson):
+            for properties, bounds in _topojson_bounds(
+                    self.layer.data, self.layer.object_path):
+                yield properties.get(self.search_label), bounds
+        else:
+            for feature in self.layer.data['features']:
+                yield ((feature.get('properties') or {}).get(self.search_label),
+                       _geojson_bounds(feature['geometry']))
+
+    def build_index(self):
+        """Indexes the layer by `search_label` with :py:func:`search_index`."""
+        self.index = search_index(self.labeled_bounds())
+        return self.index
+
+    def write_index_file(self, path=None):
+        """Writes the index to `path`, by default `search_index_file`."""
+        path = self.search_index_file if path is None else path
+        if self.index is None:
+            self.build_index()
+        with open(path, 'w') as index_file:
+            json.dump(self.index, index_file, separators=(',', ':'))
+        return path
 
     def test_params(self, keys):
         if keys is not None and self.search_label is not None:
@@ -111,7 +400,12 @@ class Search(MacroElement):
                                               "folium Map objects."
 
     def render(self, **kwargs):
-        if isinstance(self.layer, GeoJson):
+        if self.search_index:
+            self.build_index()
+            keys = (self.search_label,) if self.index['labels'] else ()
+            if self.search_index_file is not None:
+                self.write_index_file()
+        elif isinstance(self.layer, GeoJson):
             keys = tuple(self.layer.data['features'][0]['properties'].keys())
         elif isinstance(self.layer, TopoJson):
             obj_name = self.layer.object_path.split('.')[-1]
@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""Static PNG choropleths, one image per day
+
+Email reports and thumbnails need a picture of the map for every day, not an
+interactive page. Instead of drawing every region of every day, the renderer
+projects the geometry and rasterizes all regions once into a label image whose
+pixels hold region numbers. A day is then a palette lookup: the label image
+indexes a table of that day's region colors. Images are cached on disk by
+dataset version and day, so a refresh renders only the new days.
+
+Examples:
+  >>> gdf = read_geo_pandas()
+  >>> renderer = StaticChoropleth(gdf['counties'], width=960)
+  >>> colors = cmap_ranked_df(per_capita(new_cases(counties), population))
+  >>> renderer.render_days(colors, 'png_cache', version='2020-12-01')
+"""
+from typing import Dict, List, Tuple
+import hashlib
+import os
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+from PIL import Image, ImageColor, ImageDraw
+from fp_covid19.data.bears import Bears
+
+US_ALBERS_CRS = 'EPSG:5070'
+"""NAD83 / Conus Albers, an equal-area projection of the contiguous U.S."""
+
+
+def _polygons(geometry) -> List:
+  """Returns the polygons of a (multi)polygon or geometry collection"""
+  if geometry is None or geometry.is_empty:
+    return []
+  if geometry.geom_type == 'Polygon':
+    return [geometry]
+  if hasattr(geometry, 'geoms'):
+    return [polygon for part in geometry.geoms for polygon in _polygons(part)]
+  return []
+
+
+def parse_colors(colors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+  """Converts color strings to a palette and palette indices.
+
+  Each distinct color is parsed once.
+
+  Args:
+    colors (np.ndarray): Color strings that `PIL.ImageColor` understands,
+      e.g. `'#rrggbbaa'` from a branca colormap. `NaN`, `None`, and `''`
+      are transparent.
+
+  Returns:
+    Tuple[np.ndarray, np.ndarray]:
+    `(palette, codes)`: `(num_colors, 4)` `np.uint8` RGBA palette and the
+    palette index of every element of `colors`, in the same shape
+  """
+  colors = np.asarray(colors, dtype=object)
+  missing = np.array([not isinstance(color, str) or not color
+                      for color in colors.ravel()]).reshape(colors.shape)
+  unique, codes = np.unique(
+      np.where(missing, '', colors).astype(str), return_inverse=True)
+  palette = np.array(
+      [ImageColor.getcolor(color, 'RGBA') if color else (0, 0, 0, 0)
+       for color in unique], dtype=np.uint8).reshape(-1, 4)
+  return palette, codes.reshape(colors.shape)
+
+
+class StaticChoropleth:
+  """Renders daily choropleth PNGs from a `Bears` of colors.
+
+  Args:
+    gdf (gpd.GeoDataFrame): Region geometry, e.g. from
+      :py:func:`fp_covid19.visualization.geojson_helper.read_geo_pandas`
+    width (int): Image width in pixels
+    height (int): Image height in pixels. Defaults to the aspect ratio of
+      `bounds`.
+    crs: Projection, anything `gpd.GeoDataFrame.to_crs` accepts, or `None`
+      to draw the coordinates as they are
+    bounds (Tuple[float]): `(minx, miny, maxx, maxy)` to draw, in `crs`
+      coordinates. Defaults to the bounds of `gdf`.
+    id_col (str): Column label of the region IDs in `gdf`, compared as
+      strings with the feature IDs of the colors
+    background (str): Color of pixels outside every region and of regions
+      without a color
+    edge_color (str): Color of the borders between regions, or `None` for
+      no borders
+  """
+  def __init__(
+      self, gdf: gpd.GeoDataFrame, width: int = 960, height: int = None,
+      crs=US_ALBERS_CRS, bounds: Tuple[float] = None, id_col: str = 'id',
+      background: str = '#ffffff00', edge_color: str = '#ffffff'):
+    if crs is not None:
+      gdf = gdf.to_crs(crs)
+    minx, miny, maxx, maxy = gdf.total_bounds if bounds is None else bounds
+    scale = (width - 1) / (maxx - minx)
+    if height is None:
+      height = int(round((maxy - miny) * scale)) + 1
+    scale = min(scale, (height - 1) / (maxy - miny))
+    self.width, self.height = width, height
+    self.ids = gdf[id_col].astype(str).to_numpy()
+    self.background = ImageColor.getcolor(background, 'RGBA')
+    self.edge_color = (None if edge_color is None
+                       else ImageColor.getcolor(edge_color, 'RGBA'))
+
+    # Larger regions first, so enclaves drawn later stay on top of the holes
+    # of the regions around them
+    geometries = gdf.geometry.to_numpy()
+    areas = [(g.bounds[2] - g.bounds[0]) * (g.bounds[3] - g.bounds[1])
+             if g is not None and not g.is_empty else 0. for g in geometries]
+    image = Image.new('I', (width, height), 0)
+    draw = ImageDraw.Draw(image)
+
+    def pixels(ring):
+      xy = np.asarray(ring.coords)[:, :2]
+      xy = np.column_stack(
+          [(xy[:, 0] - minx) * scale, (maxy - xy[:, 1]) * scale])
+      return [tuple(point) for point in xy]
+
+    for i in np.argsort(areas)[::-1]:
+      for polygon in _polygons(geometries[i]):
+        draw.polygon(pixels(polygon.exterior), fill=int(i) + 1)
+        for interior in polygon.interiors:
+          draw.polygon(pixels(interior), fill=0)
+    self.labels = np.asarray(image, dtype=np.int32)
+    """Pixel labels: 0 outside every region, `i + 1` inside region `i`,
+    `len(self.ids) + 1` on borders"""
+    if self.edge_color is not None:
+      labels = self.labels
+      edges = np.zeros(labels.shape, dtype=bool)
+      edges[:, 1:] |= labels[:, 1:] != labels[:, :-1]
+      edges[1:, :] |= labels[1:, :] != labels[:-1, :]
+      self.labels = np.where(edges, len(self.ids) + 1, labels)
+    self.fingerprint = hashlib.sha1(
+        self.labels.tobytes() + '\n'.join(self.ids).encode()
+        + bytes(self.background) + bytes(self.edge_color or ())
+    ).hexdigest()[:12]
+    """Hash of the label image and colors, part of the cache key"""
+
+  def palette_codes(
+      self, cmap_bears: Bears, feature_id_col='FIPS',
+      datetime_index: List[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Aligns the colors with the regions and converts them to a palette.
+
+    Args:
+      cmap_bears (Bears): Colors, one column per date, e.g. from
+        :py:func:`fp_covid19.visualization.folium_helper.cmap_ranked_df`
+      feature_id_col (str): Column label of the region IDs, or `None` to use
+        the row index
+      datetime_index (List[str]): Date labels. Defaults to all dates.
+
+    Returns:
+      Tuple[np.ndarray, np.ndarray]:
+      `(palette, codes)`: `(num_colors, 4)` `np.uint8` RGBA palette and a
+      `(len(self.ids) + 2, num_days)` lookup table from pixel labels to
+      palette indices
+    """
+    if datetime_index is None:
+      datetime_index = cmap_bears.datetime_index
+    feature_ids = (cmap_bears.df.index if feature_id_col is None
+                   else cmap_bears.df[feature_id_col]).astype(str)
+    rows = pd.Index(feature_ids).get_indexer(self.ids)
+    palette, codes = parse_colors(cmap_bears.df[datetime_index].to_numpy())
+    palette = np.concatenate([palette, [self.background],
+                              [self.edge_color or self.background]])
+    background, edge = len(palette) - 2, len(palette) - 1
+    transparent = palette[:-2, 3] == 0
+    codes = np.where(transparent[codes], background, codes)
+    lookup = np.full((len(self.ids) + 2, len(datetime_index)), background)
+    found = rows >= 0
+    lookup[1:-1][found] = codes[rows[found]]
+    lookup[-1] = edge
+    return palette.astype(np.uint8), lookup
+
+  def image(self, palette: np.ndarray, codes: np.ndarray) -> Image.Image:
+    """Composes one day.
+
+    Args:
+      palette (np.ndarray): `(num_colors, 4)` RGBA palette
+      codes (np.ndarray): Palette index of every pixel label, one column of
+        the lookup table from :py:meth:`palette_codes`
+
+    Returns:
+      Image.Image:
+      A paletted image if the palette has at most 256 colors, else RGBA
+    """
+    pixels = codes[self.labels]
+    if len(palette) <= 256:
+      image = Image.fromarray(pixels.astype(np.uint8), mode='P')
+      image.putpalette(palette.ravel().tobytes(), rawmode='RGBA')
+      return image
+    return Image.fromarray(palette[pixels], mode='RGBA')
+
+  def render(self, cmap_bears: Bears, date: str = None,
+             feature_id_col='FIPS') -> Image.Image:
+    """Renders one day without caching.
+
+    Args:
+      cmap_bears (Bears): Colors, one column per date
+      date (str): Date label. Defaults to the latest date.
+      feature_id_col (str): Column label of the region IDs, or `None` to use
+        the row index
+
+    Returns:
+      Image.Image
+    """
+    date = cmap_bears.datetime_index[-1] if date is None else date
+    palette, lookup = self.palette_codes(
+        cmap_bears, feature_id_col=feature_id_col, datetime_index=[date])
+    return self.image(palette, lookup[:, 0])
+
+  def cache_path(self, cache_dir: str, version: str, iso_date: str) -> str:
+    """Returns the cached PNG path of one day of one dataset version"""
+    return os.path.join(
+        cache_dir, '{}-{}'.format(version, self.fingerprint),
+        '{}.png'.format(iso_date))
+
+  def render_days(
+      self, cmap_bears: Bears, cache_dir: str, version: str = 'latest',
+      feature_id_col='FIPS', dates: List[str] = None,
+      overwrite=False) -> Dict[str, str]:
+    """Renders the days missing from the cache.
+
+    Files are named `<cache_dir>/<version>-<fingerprint>/<YYYY-MM-DD>.png`.
+    A day already in the cache is not rendered again unless `overwrite` is
+    `True`, so use a new `version` when past colors change, e.g. after data
+    revisions or a new color normalization. Each file is written under a
+    temporary name and renamed, so an interrupted run leaves no partial
+    images behind.
+
+    Args:
+      cmap_bears (Bears): Colors, one column per date
+      cache_dir (str): Cache directory
+      version (str): Dataset version, e.g. the date of the data release
+      feature_id_col (str): Column label of the region IDs, or `None` to use
+        the row index
+      dates (List[str]): Date labels. Defaults to all dates.
+      overwrite (bool): Renders every day even if cached
+
+    Returns:
+      Dict[str, str]:
+      `{date_label: png_path}` of every requested day, cached or new
+    """
+    all_dates = cmap_bears.datetime_index
+    datetime_index = all_dates if dates is None else dates
+    positions = [all_dates.index(date) for date in datetime_index]
+    iso = cmap_bears.date_axis.iso
+    paths = {date: self.cache_path(cache_dir, version, iso[position])
+             for date, position in zip(datetime_index, positions)}
+    missing = [date for date in datetime_index
+               if overwrite or not os.path.exists(paths[date])]
+    if missing:
+      os.makedirs(os.path.dirname(paths[missing[0]]), exist_ok=True)
+      palette, lookup = self.palette_codes(
+          cmap_bears, feature_id_col=feature_id_col, datetime_index=missing)
+      for j, date in enumerate(missing):
+        temporary = paths[date] + '.tmp'
+        self.image(palette, lookup[:, j]).save(temporary, format='PNG')
+        os.replace(temporary, paths[date])
+    return paths
@@ -1,5 +1,9 @@
 # -*- coding: utf-8 -*-
 
+import hashlib
+import json
+import os
+
 from branca.element import Figure, JavascriptLink
 
 from folium.features import GeoJson
@@ -32,13 +36,61 @@ class TimeSliderChoropleth(Layer):
         `[-L, L-1]`, where `L` is the maximum number of time stamps in
         `styledict`. For example, use `-1` to initialize the slider to the
         latest timestamp.
+    sidecar_dir: str, default None
+        If not None, the GeoJSON goes to `geometry.json` and the styles to
+        `styles_<chunk>.json` files, `chunk_size` timestamps each, in this
+        directory instead of the HTML page. The page fetches the geometry and
+        the chunk containing `init_timestamp_index` first and prefetches the
+        neighboring chunks as the slider moves. The files are written when
+        the map is rendered, e.g. by `Map.save()`, skipping files that have
+        not changed since the last write. Use one directory per
+        layer. Browsers only fetch sidecar files over HTTP, so serve the page
+        and the directory from a web server, e.g. `python -m http.server`.
+    sidecar_url: str, default None
+        URL of `sidecar_dir` as seen from the HTML page. Defaults to the base
+        name of `sidecar_dir`, i.e. a directory next to the HTML file.
+    chunk_size: int, default 30
+        Number of timestamps per style file in sidecar mode.
 
     """
     _template = Template(u"""
         {% macro script(this, kwargs) %}
 
             var timestamps = {{ this.timestamps|tojson }};
+            {% if this.sidecar_url is none %}
             var styledict = {{ this.styledict|tojson }};
+            {% else %}
+            // Styles are fetched one chunk of timestamps at a time
+            var styledict = {};
+            var style_chunk_size = {{ this.chunk_size }};
+            var style_chunks = {};
+            var style_chunk_url = function(chunk) {
+                return {{ this.sidecar_url|tojson }} + '/styles_' + chunk + '.json';
+            };
+            var load_style_chunk = function(chunk) {
+                if (chunk < 0 || chunk * style_chunk_size >= timestamps.length) {
+                    return Promise.resolve();
+                }
+                if (!(chunk in style_chunks)) {
+                    style_chunks[chunk] = fetch(style_chunk_url(chunk))
+                        .then(function(response) { return response.json(); })
+                        .then(function(chunk_styles) {
+                            for (var feature_id in chunk_styles) {
+                                if (!(feature_id in styledict)) {
+                                    styledict[feature_id] = {};
+                                }
+                                Object.assign(styledict[feature_id], chunk_styles[feature_id]);
+                            }
+                        });
+                }
+                return style_chunks[chunk];
+            };
+            var prefetch_style_chunks = function(index) {
+                var chunk = Math.floor(index / style_chunk_size);
+                load_style_chunk(chunk - 1);
+                load_style_chunk(chunk + 1);
+            };
+            {% endif %}
             {% if this.init_timestamp_index >= 0 %}
             var current_timestamp = timestamps[{{ this.init_timestamp_index }}];
             {% else %}
@@ -64,7 +116,9 @@ class TimeSliderChoropleth(Layer):
                 .style('text-align', 'center')
                 .style('font-weight', '500%');
 
-            var datestring = new Date(parseInt(current_timestamp)*1000).toDateString();
+            // Timestamps are midnight UTC
+            var date_options = {timeZone: 'UTC', weekday: 'short', year: 'numeric', month: 'short', day: 'numeric'};
+            var datestring = new Date(parseInt(current_timestamp)*1000).toLocaleDateString('en-US', date_options);
             d3.select("output#slider-value").text(datestring);
 
             fill_map = function(){
@@ -84,22 +138,32 @@ class TimeSliderChoropleth(Layer):
 
             d3.select("#slider").on("input", function() {
                 current_timestamp = timestamps[this.value];
-            var datestring = new Date(parseInt(current_timestamp)*1000).toDateString();
+            var datestring = new Date(parseInt(current_timestamp)*1000).toLocaleDateString('en-US', date_options);
             d3.select("output#slider-value").text(datestring);
+            {% if this.sidecar_url is none %}
             fill_map();
+            {% else %}
+            var requested_timestamp = current_timestamp;
+            load_style_chunk(Math.floor(this.value / style_chunk_size)).then(function() {
+                if (requested_timestamp === current_timestamp) {
+                    fill_map();
+                }
+            });
+            prefetch_style_chunks(this.value);
+            {% endif %}
             });
 
             {% if this.highlight %}
                 {{this.get_name()}}_onEachFeature = function onEachFeature(feature, layer) {
                     layer.on({
                         mouseout: function(e) {
-                        if (current_timestamp in styledict[e.target.feature.id]){
+                        if (e.target.feature.id in styledict && current_timestamp in styledict[e.target.feature.id]){
                             var opacity = styledict[e.target.feature.id][current_timestamp]['opacity'];
                             d3.selectAll('#feature-'+e.target.feature.id).style('fill-opacity', opacity);
                         }
                     },
                         mouseover: function(e) {
-                        if (current_timestamp in styledict[e.target.feature.id]){
+                        if (e.target.feature.id in styledict && current_timestamp in styledict[e.target.feature.id]){
                             d3.selectAll('#feature-'+e.target.feature.id).style('fill-opacity', 1);
                         }
                     },
@@ -111,35 +175,57 @@ class TimeSliderChoropleth(Layer):
 
             {% endif %}
 
+            {% if this.sidecar_url is none %}
             var {{ this.get_name() }} = L.geoJson(
                     {{ this.data|tojson }}
             ).addTo({{ this._parent.get_name() }});
+            {% else %}
+            var {{ this.get_name() }} = L.geoJson(null).addTo({{ this._parent.get_name() }});
+            {% endif %}
 
-            {{ this.get_name() }}.setStyle(function(feature) {
-                if (feature.properties.style !== undefined){
-                    return feature.properties.style;
-                }
-                else{
-                    return "";
-                }
-            });
+            var {{ this.get_name() }}_draw = function() {
+                {{ this.get_name() }}.setStyle(function(feature) {
+                    if (feature.properties.style !== undefined){
+                        return feature.properties.style;
+                    }
+                    else{
+                        return "";
+                    }
+                });
 
-            {{ this.get_name() }}.eachLayer(function (layer) {
-                layer._path.id = 'feature-' + layer.feature.id;
-            });
+                {{ this.get_name() }}.eachLayer(function (layer) {
+                    layer._path.id = 'feature-' + layer.feature.id;
+                });
 
-            d3.selectAll('path')
-            .attr('stroke', 'white')
-            .attr('stroke-width', 0.8)
-            .attr('stroke-dasharray', '5,5')
-            .attr('fill-opacity', 0);
-            fill_map();
+                d3.selectAll('path')
+                .attr('stroke', 'white')
+                .attr('stroke-width', 0.8)
+                .attr('stroke-dasharray', '5,5')
+                .attr('fill-opacity', 0);
+                fill_map();
+            };
+
+            {% if this.sidecar_url is none %}
+            {{ this.get_name() }}_draw();
+            {% else %}
+            // Geometry and the initial chunk first, then the neighboring chunks
+            Promise.all([
+                fetch({{ this.sidecar_url|tojson }} + '/geometry.json')
+                    .then(function(response) { return response.json(); }),
+                load_style_chunk(Math.floor({{ this.init_index }} / style_chunk_size))
+            ]).then(function(results) {
+                {{ this.get_name() }}.addData(results[0]);
+                {{ this.get_name() }}_draw();
+                prefetch_style_chunks({{ this.init_index }});
+            });
+            {% endif %}
 
         {% endmacro %}
         """)
 
     def __init__(self, data, styledict, name=None, overlay=True, control=True,
-                 show=True, init_timestamp_index=0, highlight=True):
+                 show=True, init_timestamp_index=0, highlight=True,
+                 sidecar_dir=None, sidecar_url=None, chunk_size=30):
         super(TimeSliderChoropleth, self).__init__(name=name, overlay=overlay,
                                                    control=control, show=show)
         self.data = GeoJson.process_data(GeoJson({}), data)
@@ -170,8 +256,91 @@ class TimeSliderChoropleth(Layer):
                 ' `[-len(timestamps), -1]` but got {} instead.'
             ).format(init_timestamp_index)
         self.init_timestamp_index = init_timestamp_index
+        self.init_index = init_timestamp_index % max(len(timestamps), 1)
+
+        assert chunk_size > 0, 'chunk_size must be positive.'
+        self.sidecar_dir = sidecar_dir
+        if sidecar_dir is not None and sidecar_url is None:
+            sidecar_url = os.path.basename(os.path.normpath(sidecar_dir))
+        self.sidecar_url = sidecar_url
+        self.chunk_size = chunk_size
+
+    def style_chunks(self):
+        """Splits `styledict` into one dict per `chunk_size` timestamps.
+
+        Returns
+        -------
+        list of dict
+            `chunks[i]` holds the styles of `timestamps[i*chunk_size:
+            (i+1)*chunk_size]` in the same form as `styledict`.
+        """
+        chunk_of = {timestamp: i // self.chunk_size
+                    for i, timestamp in enumerate(self.timestamps)}
+        chunks = [{} for _ in range(0, len(self.timestamps), self.chunk_size)]
+        for feature_id, styles in self.styledict.items():
+            for timestamp, style in styles.items():
+                chunks[chunk_of[timestamp]].setdefault(
+                    feature_id, {})[timestamp] = style
+        return chunks
+
+    def sidecar_files(self):
+        """Returns the sidecar files as `{file_name: json_string}`."""
+        files = {'geometry.json': json.dumps(self.data, separators=(',', ':'))}
+        for i, chunk in enumerate(self.style_chunks()):
+            files['styles_{}.json'.format(i)] = json.dumps(
+                chunk, separators=(',', ':'), sort_keys=True)
+        return files
+
+    def write_sidecar_files(self, directory=None):
+        """Writes the geometry and style chunks that changed to `directory`.
+
+        The SHA-1 digests of the files are kept in `_digests.json` in the
+        same directory. A file whose contents match its recorded digest is
+        not rewritten, so appending a day rewrites only the last chunk and
+        leaves the geometry and the earlier chunks alone. Chunks past the
+        current number of chunks are deleted.
+
+        Parameters
+        ----------
+        directory: str, default None
+            Defaults to `sidecar_dir`.
+
+        Returns
+        -------
+        list of str
+            Paths of the files written
+        """
+        directory = self.sidecar_dir if directory is None else directory
+        os.makedirs(directory, exist_ok=True)
+        digests_path = os.path.join(directory, '_digests.json')
+        previous = {}
+        if os.path.exists(digests_path):
+            with open(digests_path) as digests_file:
+                previous = json.load(digests_file)
+        digests = {}
+        paths = []
+        for file_name, contents in self.sidecar_files().items():
+            path = os.path.join(directory, file_name)
+            digests[file_name] = hashlib.sha1(contents.encode()).hexdigest()
+            if (previous.get(file_name) == digests[file_name]
+                    and os.path.exists(path)):
+                continue
+            with open(path + '.tmp', 'w') as sidecar_file:
+                sidecar_file.write(contents)
+            os.replace(path + '.tmp', path)
+            paths.append(path)
+        for file_name in set(previous) - set(digests):
+            if os.path.exists(os.path.join(directory, file_name)):
+                os.remove(os.path.join(directory, file_name))
+        if digests != previous:
+            with open(digests_path + '.tmp', 'w') as digests_file:
+                json.dump(digests, digests_file, indent=1, sort_keys=True)
+            os.replace(digests_path + '.tmp', digests_path)
+        return paths
 
     def render(self, **kwargs):
+        if self.sidecar_dir is not None:
+            self.write_sidecar_files()
         super(TimeSliderChoropleth, self).render(**kwargs)
         figure = self.get_root()
         assert isinstance(figure, Figure), ('You cannot render this Element '
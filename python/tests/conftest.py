@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""Shared fixtures: small `Bears` built in memory
+
+Run the tests from the `python` folder with `python -m pytest tests`.
+"""
+from typing import List
+import numpy as np
+import pandas as pd
+import pytest
+from fp_covid19.data.jhu_csse import JhuCsse
+
+
+def date_labels(num_days: int, start: str = '2020-03-01') -> List[str]:
+  """`%m/%d/%Y` labels of `num_days` consecutive days"""
+  return pd.date_range(start, periods=num_days).strftime('%m/%d/%Y').tolist()
+
+
+@pytest.fixture
+def make_bears():
+  """Factory of county-like `JhuCsse` objects.
+
+  `make_bears(values, fips=None, states=None, start='2020-03-01')` makes one
+  row per row of `values` with the columns `FIPS` and `Province_State`, then
+  one column per day.
+  """
+  def make(values, fips=None, states=None, start='2020-03-01') -> JhuCsse:
+    values = np.asarray(values, dtype=float)
+    num_rows, num_days = values.shape
+    if fips is None:
+      fips = [str(1001 + 2 * row) for row in range(num_rows)]
+    if states is None:
+      states = ['Alabama'] * num_rows
+    dataframe = pd.DataFrame(
+        values, index=pd.Index(range(84001001, 84001001 + num_rows),
+                               name='UID'),
+        columns=date_labels(num_days, start=start))
+    dataframe.insert(0, 'FIPS', fips)
+    dataframe.insert(1, 'Province_State', states)
+    return JhuCsse(dataframe=dataframe)
+  return make
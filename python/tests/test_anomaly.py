@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""Tests of :py:mod:`fp_covid19.cases.anomaly`"""
+import numpy as np
+from fp_covid19.cases.anomaly import detect_anomalies
+
+DAILY = [10., 12, 11, 9, 10, 11, 10, 12, 200, 11, 10, 9]
+
+
+def test_spike_is_flagged_and_redistributed(make_bears):
+  bears = make_bears([np.cumsum(DAILY)])
+  result = detect_anomalies(
+      bears, window=7, min_periods=5, redistribute=True)
+  assert result['flags'][['date', 'kind']].values.tolist() == [
+      ['3/9/2020', 'spike']]
+  adjusted = result['adjusted'].df[bears.datetime_index].to_numpy()
+  assert adjusted[0, -1] == sum(DAILY)
+  assert np.diff(adjusted[0]).max() < 50
+
+
+def test_missing_cumulative_days_do_not_blank_later_days(make_bears):
+  totals = np.cumsum(DAILY)
+  totals[3] = np.nan
+  bears = make_bears([totals])
+  result = detect_anomalies(
+      bears, window=7, min_periods=5, redistribute=True)
+  assert result['flags']['date'].tolist() == ['3/9/2020']
+  adjusted = result['adjusted'].df[bears.datetime_index].to_numpy()[0]
+  assert np.isnan(adjusted).tolist() == [day == 3 for day in range(12)]
+  assert adjusted[-1] == sum(DAILY)
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+"""Tests of :py:mod:`fp_covid19.data.bears`"""
+import numpy as np
+
+
+def test_latest_keeps_metadata_and_last_day(make_bears):
+  bears = make_bears([[1, 2, 3], [4, 5, 6]])
+  latest = bears.latest()
+  assert latest.datetime_index == ['3/3/2020']
+  assert latest.df['FIPS'].tolist() == bears.df['FIPS'].tolist()
+  assert latest.df['3/3/2020'].tolist() == [3, 6]
+
+
+def test_latest_deep_copy_is_independent(make_bears):
+  bears = make_bears([[1, 2, 3], [4, 5, 6]])
+  latest = bears.latest(deep=True)
+  assert not np.shares_memory(
+      latest.df['3/3/2020'].to_numpy(), bears.df['3/3/2020'].to_numpy())
+  latest.df.loc[:, '3/3/2020'] = 0
+  latest.df.loc[:, 'FIPS'] = '0'
+  assert bears.df['3/3/2020'].tolist() == [3, 6]
+  assert bears.df['FIPS'].tolist() == ['1001', '1003']
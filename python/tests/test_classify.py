@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""Tests of :py:mod:`fp_covid19.visualization.classify`"""
+import numpy as np
+import pytest
+from fp_covid19.visualization.classify import (
+    METHODS, MISSING_CLASS, Classifier, natural_breaks, quantile_breaks)
+
+
+def test_natural_breaks_find_clusters():
+  sample = np.sort([1., 1, 2, 10, 11, 12, 100, 101])
+  np.testing.assert_array_equal(natural_breaks(sample, 3), [10, 100])
+
+
+def test_quantile_breaks():
+  np.testing.assert_allclose(
+      quantile_breaks(np.arange(1., 101.), 4), [25.75, 50.5, 75.25])
+
+
+def test_classify_and_colors(make_bears):
+  bears = make_bears([[0., 5, np.nan], [10, 2, 7]])
+  classifier = Classifier('equal_interval', k=2).fit(bears)
+  np.testing.assert_array_equal(classifier.breaks, [5])
+  np.testing.assert_array_equal(
+      classifier.classify(bears), [[0, 1, MISSING_CLASS], [1, 0, 1]])
+  colors = classifier.colors(bears, missing_color='none')
+  palette = classifier.palette()
+  assert colors.df[colors.datetime_index].values.tolist() == [
+      [palette[0], palette[1], 'none'], [palette[1], palette[0], palette[1]]]
+
+
+@pytest.mark.parametrize('method', METHODS)
+def test_update_adds_only_new_days(make_bears, method):
+  rng = np.random.default_rng(0)
+  bears = make_bears(rng.lognormal(2, 1, (30, 8)))
+  first_days = bears.derive(datetime_index=bears.datetime_index[:5])
+  classifier = Classifier(method, k=5).fit(first_days)
+  classifier.update(bears)
+  assert classifier.num_seen == 30 * 8
+  np.testing.assert_allclose(
+      classifier.breaks, Classifier(method, k=5).fit(bears).breaks)
+  classifier.update(bears)
+  assert classifier.num_seen == 30 * 8
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""Tests of :py:mod:`fp_covid19.visualization.compare_chart`"""
+import numpy as np
+import pandas as pd
+from matplotlib.collections import LineCollection
+from fp_covid19.visualization.compare_chart import (
+    align_by_onset, compare_chart, region_values)
+
+NAN = np.nan
+
+
+def test_region_values(make_bears):
+  bears = make_bears([[1, 2, 3], [10, NAN, 30], [NAN, NAN, 5]],
+                     fips=['1001', '1003', '1005'])
+  names, values = region_values(bears, ['1005', '1001'], key_col='FIPS')
+  assert names == ['1005', '1001']
+  np.testing.assert_array_equal(values, [[NAN, NAN, 5], [1, 2, 3]])
+  # Row index keys are compared as strings
+  names, values = region_values(bears, [84001002])
+  np.testing.assert_array_equal(values, [[10, NAN, 30]])
+
+
+def test_region_values_groups(make_bears):
+  bears = make_bears([[1, 2, 3], [10, NAN, 30], [NAN, NAN, 5]],
+                     fips=['1001', '1003', '1005'])
+  names, values = region_values(
+      bears, {'Metro': ['1001', '1003'], 'Rural': [1005, '9999'],
+              'Nowhere': ['9999'], 'All': ['1001', '1003', '1005']},
+      key_col='FIPS', datetime_index=bears.datetime_index[1:])
+  assert names == ['Metro', 'Rural', 'Nowhere', 'All']
+  # NaN counts as zero unless no member has a value; missing keys are NaN
+  np.testing.assert_array_equal(
+      values, [[2, 33], [NAN, 5], [NAN, NAN], [2, 38]])
+
+
+def test_align_by_onset():
+  values = np.array([
+      [0, 1, 5, 9, 2],
+      [7, 8, 9, 1, 0],
+      [NAN, 0, 4, NAN, 6],
+      [0, 1, 2, 3, NAN],
+      [NAN] * 5])
+  aligned = align_by_onset(values, onset=4)
+  np.testing.assert_array_equal(aligned, [
+      [5, 9, 2, NAN, NAN],
+      # Reached on the first day, not shifted
+      [7, 8, 9, 1, 0],
+      # NaN after the onset is kept
+      [4, NAN, 6, NAN, NAN],
+      # Never reach the onset
+      [NAN] * 5,
+      [NAN] * 5])
+  assert aligned.shape == values.shape
+
+
+def test_compare_chart(make_bears):
+  bears = make_bears([[1, 10, 100, 1000], [0, 0, 50, 500]],
+                     fips=['1001', '1003'])
+  figure = compare_chart(
+      bears, {'A': ['1001'], 'B': ['1003'], 'A+B': ['1001', '1003']},
+      key_col='FIPS', population=pd.Series({1001: 1e5, 1003: 1e5}),
+      onset=10, title='Cases')
+  axes, = figure.axes
+  titles = [text.get_text() for text in axes.texts]
+  assert {'A', 'B', 'A+B'} <= set(titles)
+  lines = [collection for collection in axes.collections
+           if isinstance(collection, LineCollection)]
+  assert lines
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""Tests of :py:mod:`fp_covid19.cases.compute`"""
+import numpy as np
+import pandas as pd
+import pytest
+from fp_covid19.cases.compute import PopulationNormalizer, per_capita
+
+
+def test_per_capita_drops_unknown_population(make_bears):
+  bears = make_bears([[10, 20], [30, 40], [50, 60]])
+  population = pd.Series([10., 0., 100.], index=bears.df.index)
+  scaled = per_capita(bears, population)
+  assert scaled.df['FIPS'].tolist() == ['1001', '1005']
+  np.testing.assert_allclose(
+      scaled.df[scaled.datetime_index].to_numpy(), [[1, 2], [.5, .6]])
+
+
+def test_normalizer_matches_rows_by_fips(make_bears):
+  bears = make_bears([[10, 20], [30, 40]])
+  bears.df = bears.df.reset_index(drop=True) # Like USAFacts counties
+  normalizer = PopulationNormalizer(pd.Series([10., 100.]), bears)
+  scaled = normalizer.apply(bears, per=100)
+  np.testing.assert_allclose(
+      scaled.df[scaled.datetime_index].to_numpy(), [[100, 200], [30, 40]])
+
+  reordered = bears.derive()
+  reordered.df = reordered.df.iloc[::-1].reset_index(drop=True)
+  with pytest.raises(AssertionError, match='do not match'):
+    normalizer.apply(reordered)
+
+
+def test_normalizer_inplace_replaces_the_dataframe(make_bears):
+  bears = make_bears([[10, 20]])
+  original = bears.df
+  normalizer = PopulationNormalizer(pd.Series([10.], index=bears.df.index),
+                                    bears)
+  assert normalizer.apply(bears, inplace=True) is bears
+  assert bears.df[bears.datetime_index].to_numpy().tolist() == [[1, 2]]
+  assert original[bears.datetime_index].to_numpy().tolist() == [[10, 20]]
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""Tests of :py:mod:`fp_covid19.data.cube`"""
+import os
+import numpy as np
+import pytest
+from fp_covid19.data import jhu_csse, usafacts
+from fp_covid19.data.cube import CaseCube
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+NAN = np.nan
+
+
+@pytest.fixture(name='sources', scope='module')
+def fixture_sources():
+  return {
+      'jhu_csse': jhu_csse.get_covid19_us_bears(
+          url_root=os.path.join(DATA_DIR, 'jhu_csse', '')),
+      'usafacts': usafacts.get_covid19_us_bears(
+          url_root=os.path.join(DATA_DIR, 'usafacts', ''))}
+
+
+@pytest.fixture(name='cube')
+def fixture_cube(sources):
+  return CaseCube.from_sources(sources)
+
+
+def test_outer_join(cube):
+  assert cube.dims == ['source', 'metric', 'region', 'day']
+  assert cube.shape == {'source': 2, 'metric': 2, 'region': 5, 'day': 5}
+  # Kansas City has no FIPS code and is dropped
+  assert cube.axes['region'].tolist() == [1000, 1001, 1003, 29000, 29095]
+  assert cube.axes['day'][[0, -1]].strftime('%Y-%m-%d').tolist() == [
+      '2020-03-01', '2020-03-05']
+  np.testing.assert_array_equal(
+      cube.values[0, 0],
+      [[NAN] * 5, [0, 1, 2, 4, 6], [NAN] * 5, [NAN] * 5, [1, 3, 5, 8, 9]])
+  # USAFacts ends on March 3
+  np.testing.assert_array_equal(
+      cube.values[1, 0, 1], [0, 1, 2, NAN, NAN])
+  assert cube.regions['Province_State'].tolist() == [
+      'Alabama', 'Alabama', 'Alabama', 'Missouri', 'Missouri']
+  # The first source names the regions it has
+  assert cube.regions.loc[1001, 'Combined_Key'] == 'Autauga, Alabama, US'
+  assert cube.regions.loc[1003, 'Combined_Key'] == 'Baldwin County, AL'
+
+
+def test_inner_join(sources):
+  cube = CaseCube.from_sources(sources, join='inner', metrics=['deaths'])
+  assert cube.shape == {'source': 2, 'metric': 1, 'region': 2, 'day': 3}
+  assert cube.axes['region'].tolist() == [1001, 29095]
+  np.testing.assert_array_equal(
+      cube.values[:, 0], [[[0, 0, 0], [0, 0, 1]], [[0, 0, 1], [0, 0, 1]]])
+  assert not np.isnan(cube.values).any()
+
+
+def test_states(sources):
+  cube = CaseCube.from_sources(sources, geo_level='states', join='inner')
+  assert cube.axes['region'].tolist() == ['Alabama', 'Missouri']
+  np.testing.assert_array_equal(
+      cube.sel(metric='confirmed', day='2020-03-03').values,
+      # JHU CSSE Missouri includes Kansas City
+      [[2, 5 + 7], [7, 6]])
+
+
+def test_sel(cube):
+  selected = cube.sel(source='usafacts', metric='confirmed')
+  assert selected.dims == ['region', 'day']
+  np.testing.assert_array_equal(
+      selected.sel(region=[29095, 1001], day='3/2/2020').values, [3, 1])
+  window = cube.sel(day=slice('2020-03-02', '2020-03-03'))
+  assert window.shape['day'] == 2
+  assert window.dims == cube.dims
+  assert selected.sel(region=[1003]).regions.index.tolist() == [1003]
+  with pytest.raises(AssertionError, match='Labels not on axis region'):
+    cube.sel(region=[1001, 6037])
+
+
+def test_reduce_and_rollup(cube):
+  confirmed = cube.sel(source='usafacts', metric='confirmed')
+  np.testing.assert_array_equal(
+      confirmed.sum('region').values, [2, 7, 13, 0, 0])
+  np.testing.assert_array_equal(
+      confirmed.reduce('day', 'count').values, [3] * 5)
+  states = confirmed.rollup('region', cube.regions['Province_State'])
+  assert states.axes['region'].tolist() == ['Alabama', 'Missouri']
+  np.testing.assert_array_equal(
+      states.sel(day='2020-03-03').values, [1 + 2 + 4, 1 + 5])
+  assert states.regions is None
+
+
+def test_diff(cube):
+  new_cases = cube.sel(source='jhu_csse', metric='confirmed').diff()
+  np.testing.assert_array_equal(
+      new_cases.sel(region=29095).values, [NAN, 2, 2, 3, 1])
+  np.testing.assert_array_equal(
+      new_cases.sel(region=1000).values, [NAN] * 5)
+
+
+def test_binary_broadcasting(cube):
+  totals = cube.sum('region')
+  assert totals.dims == ['source', 'metric', 'day']
+  share = cube / totals
+  assert share.dims == cube.dims
+  np.testing.assert_allclose(
+      share.sel(source='usafacts', metric='confirmed', day='2020-03-03')
+      .values, np.array([1, 2, 4, 1, 5]) / 13)
+  # Zero denominators give NaN, not errors
+  cfr = cube.sel(metric='deaths') / cube.sel(metric='confirmed')
+  assert np.isnan(cfr.sel(source='usafacts', region=1000).values[0])
+  gap = cube.sel(source='jhu_csse') - cube.sel(source='usafacts')
+  np.testing.assert_array_equal(
+      gap.sel(metric='confirmed', region=29095).values,
+      [0, 0, 0, NAN, NAN])
+  assert gap.regions is not None
+  np.testing.assert_array_equal((cube * 2 + 1).values, cube.values * 2 + 1)
+  with pytest.raises(AssertionError, match='Axis day differs'):
+    cube.sel(day=['2020-03-01']) + cube.sel(day=['2020-03-02'])
+
+
+def test_to_bears(cube):
+  bears = cube.sel(source='jhu_csse', metric='confirmed').to_bears()
+  assert bears.datetime_index == [
+      '3/1/2020', '3/2/2020', '3/3/2020', '3/4/2020', '3/5/2020']
+  assert bears.df.loc[29095, 'Combined_Key'] == 'Jackson, Missouri, US'
+  assert bears.df.loc[29095, '3/5/2020'] == 9
+  with pytest.raises(AssertionError, match='region and day'):
+    cube.to_bears()
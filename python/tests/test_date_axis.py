@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""Tests of :py:mod:`fp_covid19.data.date_axis`"""
+import os
+import time
+import numpy as np
+import pytest
+from fp_covid19.cases.compute import to_epoch
+from fp_covid19.data.date_axis import DateAxis, date_axis, to_epochs
+
+LABELS = ['2/28/2020', '2/29/2020', '3/1/2020', '3/2/2020']
+MARCH_1 = 1583020800
+"""2020-03-01T00:00:00Z"""
+
+
+def test_epochs():
+  axis = DateAxis(LABELS)
+  assert axis.epochs.dtype == np.int64
+  assert axis.epochs.tolist() == [
+      MARCH_1 - 2 * 86400, MARCH_1 - 86400, MARCH_1, MARCH_1 + 86400]
+  assert axis.epochs.tolist() == [
+      to_epoch(label, '%m/%d/%Y') for label in LABELS]
+  assert axis.epoch_strings[2] == str(MARCH_1)
+  # Shared by every Bears with these dates, so read-only
+  with pytest.raises(ValueError):
+    axis.epochs[0] = 0
+  assert to_epochs(LABELS).tolist() == axis.epochs.tolist()
+
+
+def test_epochs_ignore_local_time_zone(monkeypatch):
+  monkeypatch.setenv('TZ', 'America/Los_Angeles')
+  time.tzset()
+  try:
+    assert DateAxis(LABELS).epochs[2] == MARCH_1
+  finally:
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_iso_and_formats():
+  assert DateAxis(LABELS).iso == [
+      '2020-02-28', '2020-02-29', '2020-03-01', '2020-03-02']
+  # Zero-padded and inferred formats
+  assert DateAxis(['03/01/2020']).iso == ['2020-03-01']
+  assert DateAxis(['2020-03-01'], date_format=None).iso == ['2020-03-01']
+  assert str(DateAxis(['3/1/20'], date_format='%m/%d/%y').datetimes[0]
+             .date()) == '2020-03-01'
+
+
+def test_day_offsets():
+  axis = DateAxis(LABELS)
+  assert axis.day_offsets().tolist() == [0, 1, 2, 3]
+  assert axis.day_offsets('2020-03-01').tolist() == [-2, -1, 0, 1]
+  assert axis.day_offsets('2020-03-01T00:00:00+00:00').tolist() == [
+      -2, -1, 0, 1]
+
+
+def test_is_contiguous():
+  assert DateAxis(LABELS).is_contiguous()
+  assert DateAxis(LABELS[:1]).is_contiguous()
+  assert not DateAxis(['2/28/2020', '3/1/2020']).is_contiguous()
+  assert not DateAxis(['3/1/2020', '2/29/2020']).is_contiguous()
+  assert not DateAxis(['3/1/2020', '3/1/2020']).is_contiguous()
+
+
+def test_memoized_lookup(make_bears):
+  axis = date_axis(LABELS)
+  assert date_axis(tuple(LABELS)) is axis
+  assert date_axis(LABELS[:2]) is not axis
+  assert date_axis(LABELS, date_format=None) is not axis
+  assert len(axis) == 4
+  assert repr(axis) == 'DateAxis(4 days, 2/28/2020 to 3/2/2020)'
+  # Bears with the same dates share the conversions
+  confirmed = make_bears([[1, 2, 3]])
+  deaths = make_bears([[0, 0, 1], [0, 1, 1]])
+  assert confirmed.date_axis is deaths.date_axis
+  assert confirmed.date_axis.epochs is deaths.date_axis.epochs
+  assert confirmed.date_axis.epochs[0] == MARCH_1
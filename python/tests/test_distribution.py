@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""Tests of :py:mod:`fp_covid19.cases.distribution`"""
+import numpy as np
+import pandas as pd
+import pytest
+from fp_covid19.cases.distribution import (
+    nan_quantiles, summarize, update_summary)
+
+
+@pytest.mark.parametrize('quantiles', [
+    (0.1, 0.25, 0.5, 0.75, 0.9), np.linspace(0, 1, 101)])
+def test_nan_quantiles_match_numpy(quantiles):
+  rng = np.random.default_rng(0)
+  values = rng.normal(size=(50, 4))
+  values[rng.random(values.shape) < 0.2] = np.nan
+  values[:, 3] = np.nan
+  expected = np.full((len(quantiles), 4), np.nan)
+  expected[:, :3] = np.nanquantile(values[:, :3], quantiles, axis=0)
+  np.testing.assert_allclose(nan_quantiles(values, quantiles), expected)
+
+
+def test_summarize(make_bears):
+  bears = make_bears([[1, np.nan], [2, 20], [3, 40], [10, 60]])
+  weights = pd.Series([1., 1., 0., 2.], index=bears.df.index)
+  summary = summarize(bears, weights=weights, quantiles=[0.5],
+                      thresholds=[2.5])
+  assert summary.index.tolist() == bears.datetime_index
+  assert summary.columns.tolist() == [
+      'count', 'mean', 'weighted_mean', 'min', 'p50', 'max', 'above_2.5']
+  assert summary['count'].tolist() == [4, 3]
+  np.testing.assert_allclose(summary['mean'], [4, 40])
+  np.testing.assert_allclose(summary['weighted_mean'], [23 / 4, 140 / 3])
+  np.testing.assert_allclose(summary['p50'], [2.5, 40])
+  assert summary['above_2.5'].tolist() == [2, 3]
+
+
+def test_update_summary_matches_summarize(make_bears):
+  rng = np.random.default_rng(1)
+  bears = make_bears(rng.poisson(5, (20, 6)))
+  earlier = summarize(bears.derive(datetime_index=bears.datetime_index[:4]))
+  updated = update_summary(earlier, bears, revise=1)
+  pd.testing.assert_frame_equal(updated, summarize(bears))
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""Tests of :py:mod:`fp_covid19.data.export`"""
+import os
+import pyarrow.dataset as ds
+from fp_covid19.data import jhu_csse
+from fp_covid19.data.export import export_cube, long_table, read_manifest
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+def _counties():
+  return jhu_csse.get_covid19_us_bears(
+      url_root=os.path.join(DATA_DIR, 'jhu_csse', ''))['confirmed']['counties']
+
+
+def _read(directory):
+  return ds.dataset(directory, partitioning='hive').to_table().to_pandas()
+
+
+def test_long_table_keeps_rows_without_fips():
+  counties = _counties()
+  table = long_table(counties).to_pandas()
+  assert len(table) == 3 * 5
+  by_region = table.groupby('region', observed=True)['FIPS'].first()
+  assert by_region['Autauga, Alabama, US'] == '1001'
+  assert by_region.isna().tolist() == [False, False, True]
+  assert table['region'].tolist()[:5] == ['Autauga, Alabama, US'] * 5
+
+
+def test_export_cube_appends_and_overwrites(tmp_path):
+  counties = _counties()
+  directory = str(tmp_path)
+  first = counties.derive(datetime_index=counties.datetime_index[:3])
+  cube = {'cumulative': {'confirmed': {'counties': first}}}
+  name = 'cumulative/confirmed/counties'
+  assert export_cube(cube, directory) == {name: 9}
+  assert export_cube(cube, directory) == {name: 0}
+
+  cube['cumulative']['confirmed']['counties'] = counties
+  assert export_cube(cube, directory) == {name: 6}
+  assert read_manifest(directory)[name] == {
+      'last_date': '2020-03-05', 'rows': 15}
+  table = _read(directory)
+  assert len(table) == 15
+  assert not table.duplicated(['region', 'date']).any()
+
+  assert export_cube(cube, directory, mode='overwrite') == {name: 15}
+  assert read_manifest(directory)[name]['rows'] == 15
+  assert len(_read(directory)) == 15
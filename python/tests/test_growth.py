@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+"""Tests of :py:mod:`fp_covid19.cases.growth`"""
+import numpy as np
+import pytest
+from fp_covid19.cases.growth import growth_rates, reproduction_numbers
+
+
+def test_growth_rate_of_exponential_counts(make_bears):
+  bears = make_bears([np.expm1(0.1 * np.arange(10))])
+  rates = growth_rates(bears, window=5)
+  values = rates['growth_rate'].df[bears.datetime_index].to_numpy()
+  assert np.isnan(values[0, :4]).all()
+  np.testing.assert_allclose(values[0, 4:], 0.1)
+  np.testing.assert_allclose(
+      rates['doubling_time'].df[bears.datetime_index].to_numpy()[0, 4:],
+      np.log(2) / 0.1)
+
+
+def test_window_longer_than_the_series(make_bears):
+  bears = make_bears([[1, 2, 3, 4]])
+  assert growth_rates(bears, window=4)['growth_rate'].datetime_index == (
+      bears.datetime_index)
+  with pytest.raises(AssertionError, match='between 3 and 4 days'):
+    growth_rates(bears, window=5)
+  with pytest.raises(AssertionError, match='between 1 and 4 days'):
+    reproduction_numbers(bears, window=5)
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""Tests of :py:mod:`fp_covid19.data.jhu_csse`"""
+import os
+from fp_covid19.data import jhu_csse
+
+URL_ROOT = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'data', 'jhu_csse', '')
+
+
+def get_global_bears():
+  geo_df = jhu_csse.get_geo_df(
+      url=URL_ROOT + 'UID_ISO_FIPS_LookUp_Table.csv')
+  return jhu_csse.get_covid19_global_bears(url_root=URL_ROOT, geo_df=geo_df)
+
+
+def test_global_provinces():
+  covid19 = get_global_bears()
+  assert set(covid19) == {'confirmed', 'deaths', 'recovered'}
+  provinces = covid19['confirmed']['provinces']
+  assert provinces.df.index.tolist() == [
+      'Australian Capital Territory, Australia',
+      'New South Wales, Australia', 'Beijing, China', 'Hubei, China', 'Italy']
+  assert provinces.non_datetime_index[-1] == 'Population'
+  assert provinces.df.loc['Hubei, China', 'Population'] == 57752557
+  assert provinces.df.loc['Italy', 'Population'] == 60461828
+  assert provinces.datetime_index[-1] == '3/3/2020'
+
+
+def test_global_countries():
+  covid19 = get_global_bears()
+  countries = covid19['confirmed']['countries']
+  assert countries.df.index.tolist() == ['Australia', 'China', 'Italy']
+  assert countries.df.loc['China', '3/3/2020'] == 414 + 67217
+  # The country row of the look-up table wins over the provinces...
+  assert countries.df.loc['China', 'Population'] == 1404676330
+  assert countries.df.loc['Italy', 'Population'] == 60461828
+  # ...which only fill in for countries without one
+  assert countries.df.loc['Australia', 'Population'] == 428100 + 8118000
+  assert countries.non_datetime_index == ['Population']
+  assert (covid19['deaths']['countries'].df['Population'] ==
+          countries.df['Population']).all()
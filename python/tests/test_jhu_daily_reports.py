@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""Tests of :py:mod:`fp_covid19.data.jhu_daily_reports`"""
+import datetime
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from fp_covid19.data.jhu_daily_reports import (
+    list_daily_reports, read_daily_reports)
+
+DIRECTORY = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'data', 'jhu_daily_reports')
+
+
+def test_list_daily_reports_ignores_other_files():
+  reports = list_daily_reports(DIRECTORY)
+  assert [date for date, _ in reports] == [
+      datetime.date(2020, 1, 22), datetime.date(2020, 3, 22),
+      datetime.date(2020, 6, 1)]
+
+
+@pytest.mark.parametrize('max_workers', [1, 2])
+def test_read_daily_reports_of_every_vintage(max_workers):
+  reports = read_daily_reports(
+      DIRECTORY, fields=['Confirmed', 'Deaths', 'Incident_Rate'],
+      max_workers=max_workers)
+  assert sorted(reports) == ['confirmed', 'deaths', 'incident_rate']
+  confirmed = reports['confirmed']
+  assert confirmed.datetime_index == ['1/22/2020', '3/22/2020', '6/1/2020']
+  assert confirmed.df.index.tolist() == [
+      'Hubei, China', 'King, Washington, US', 'Washington, US']
+  # Metadata of the latest report, with FIPS as strings
+  assert confirmed.df.loc['King, Washington, US', 'FIPS'] == '53033'
+  assert pd.isna(confirmed.df.loc['Hubei, China', 'FIPS'])
+  assert confirmed.df.loc['Hubei, China', 'Country_Region'] == 'China'
+  np.testing.assert_array_equal(
+      confirmed.df[confirmed.datetime_index].to_numpy(),
+      [[444, 67800, 68135], [np.nan, 1170, 8125], [1, np.nan, np.nan]])
+  incident_rate = reports['incident_rate']
+  np.testing.assert_array_equal(
+      incident_rate.df[incident_rate.datetime_index].to_numpy()[:, -1],
+      [114.6, 365.0, np.nan])
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""Tests of :py:mod:`fp_covid19.pipeline`"""
+import os
+import pandas as pd
+import pytest
+from fp_covid19.data import jhu_csse
+from fp_covid19.pipeline import (
+    DEFAULT_CONFIG, Pipeline, Stage, _code_dependencies, parse_cases,
+    project_cases)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+def test_project_cases_of_a_short_series(tmp_path):
+  covid19 = jhu_csse.get_covid19_us_bears(
+      url_root=os.path.join(DATA_DIR, 'jhu_csse', ''))
+  assert len(covid19['confirmed']['counties'].datetime_index) < (
+      DEFAULT_CONFIG['window'])
+  config = dict(DEFAULT_CONFIG, out_dir=str(tmp_path), horizon=3)
+  paths = project_cases(config, covid19)
+  assert sorted(paths) == [
+      'confirmed_counties', 'confirmed_states', 'deaths_counties',
+      'deaths_states']
+  table = pd.read_csv(paths['confirmed_states'])
+  assert table['date'].nunique() == 3
+
+
+CALLS = []
+
+
+def _source(config):
+  CALLS.append('source')
+  return list(config['data'])
+
+
+def _scale(values, factor):
+  return [value * factor for value in values]
+
+
+def _double(config, values):
+  CALLS.append('double')
+  return _scale(values, config['factor'])
+
+
+def _write(config, values):
+  CALLS.append('write')
+  path = os.path.join(config['out_dir'], 'values.txt')
+  with open(path, 'w') as out_file:
+    out_file.write(repr(values))
+  return {'values': path}
+
+
+def _fail(config, values):
+  raise ValueError('bad values {}'.format(values))
+
+
+TOY_STAGES = [
+    Stage('write', _write, ('double',), ('out_dir',)),
+    Stage('double', _double, ('source',), ('factor',)),
+    Stage('source', _source, params=('data',), volatile=True),
+    Stage('fail', _fail, ('source',)),
+]
+
+
+@pytest.fixture
+def toy(tmp_path):
+  CALLS.clear()
+  config = {'data': [1, 2], 'factor': 2, 'out_dir': str(tmp_path),
+            'cache_dir': str(tmp_path / 'cache')}
+  return Pipeline(TOY_STAGES, config=config)
+
+
+def _statuses(results):
+  return {result.name: result.status for result in results}
+
+
+def test_required_orders_and_detects_cycles(toy):
+  assert toy.required(['write']) == ['source', 'double', 'write']
+  assert toy.required() == ['source', 'double', 'write', 'fail']
+  with pytest.raises(AssertionError, match='Unknown stage'):
+    toy.required(['missing'])
+  cyclic = Pipeline(
+      [Stage('a', _double, ('b',)), Stage('b', _double, ('a',))], config={})
+  with pytest.raises(AssertionError, match='Cycle'):
+    cyclic.required()
+  with pytest.raises(AssertionError, match='unknown stage'):
+    Pipeline([Stage('a', _double, ('b',))], config={})
+
+
+def test_cache_hits_and_volatile_keys(toy):
+  assert _statuses(toy.run(['write'])) == {
+      'source': 'ran', 'double': 'ran', 'write': 'ran'}
+  toy = Pipeline(TOY_STAGES, config=toy.config)
+  assert _statuses(toy.run(['write'])) == {
+      'source': 'ran', 'double': 'cached', 'write': 'cached'}
+  assert CALLS == ['source', 'double', 'write', 'source']
+  # New data changes the key of the volatile stage
+  toy = Pipeline(TOY_STAGES, config=dict(toy.config, data=[3]))
+  assert _statuses(toy.run(['write'])) == {
+      'source': 'ran', 'double': 'ran', 'write': 'ran'}
+  with open(os.path.join(toy.config['out_dir'], 'values.txt')) as out_file:
+    assert out_file.read() == '[6]'
+  # So does a parameter
+  toy = Pipeline(TOY_STAGES, config=dict(toy.config, factor=3))
+  assert _statuses(toy.run(['double']))['double'] == 'ran'
+
+
+def test_force_and_deleted_outputs(toy):
+  toy.run(['write'])
+  results = Pipeline(TOY_STAGES, config=toy.config).run(
+      ['write'], force=['double'])
+  # The key of a forced stage is unchanged, so downstream stays cached
+  assert _statuses(results) == {
+      'source': 'ran', 'double': 'ran', 'write': 'cached'}
+  os.remove(os.path.join(toy.config['out_dir'], 'values.txt'))
+  results = Pipeline(TOY_STAGES, config=toy.config).run(['write'])
+  assert _statuses(results)['write'] == 'ran'
+  assert os.path.exists(os.path.join(toy.config['out_dir'], 'values.txt'))
+
+
+def test_errors_propagate(toy):
+  with pytest.raises(ValueError, match=r'bad values \[1, 2\]'):
+    toy.run(['fail'])
+  assert not os.path.exists(os.path.join(toy.config['out_dir'], 'values.txt'))
+
+
+def test_code_dependencies():
+  functions, modules = _code_dependencies(_double)
+  assert functions == [_double, _scale]
+  assert modules == []
+  functions, modules = _code_dependencies(project_cases)
+  assert {'fp_covid19.cases.compute', 'fp_covid19.cases.projection',
+          'fp_covid19.data.bears'} <= set(modules)
+  _, modules = _code_dependencies(parse_cases)
+  assert {'fp_covid19.data.usafacts', 'fp_covid19.data.jhu_csse',
+          'fp_covid19.visualization.geojson_helper'} <= set(modules)
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""Tests of :py:mod:`fp_covid19.cases.projection`"""
+import numpy as np
+import pytest
+from fp_covid19.cases.projection import project, trend_offsets
+
+
+def test_log_linear_projection_continues_the_trend(make_bears):
+  bears = make_bears([np.expm1(0.1 * np.arange(10)), np.full(10, 5.)],
+                     start='2020-12-25')
+  projected = project(bears, horizon=3, window=5)
+  assert projected['projection'].datetime_index[-4:] == [
+      '1/3/2021', '1/4/2021', '1/5/2021', '1/6/2021']
+  values = projected['projection'].df[
+      projected['projection'].datetime_index].to_numpy()
+  np.testing.assert_allclose(values[:, :10], bears.df[
+      bears.datetime_index].to_numpy())
+  np.testing.assert_allclose(
+      values[0, 10:], np.expm1(0.1 * np.arange(10, 13)))
+  np.testing.assert_allclose(values[1, 10:], 5.)
+  lower = projected['lower'].df[projected['lower'].datetime_index].to_numpy()
+  assert np.isnan(lower[:, :10]).all()
+  # Perfect fits have no spread
+  np.testing.assert_allclose(lower[:, 10:], values[:, 10:])
+
+
+def test_damped_trend_levels_off():
+  offsets = trend_offsets(5, 50, model='damped', damping=0.5)
+  assert offsets[-1] == pytest.approx(2 + 1)
+  np.testing.assert_allclose(
+      trend_offsets(5, 3), [3, 4, 5])
+
+
+def test_window_is_checked(make_bears):
+  with pytest.raises(AssertionError, match='between 3 and 4 days'):
+    project(make_bears([[1, 2, 3, 4]]), window=5)
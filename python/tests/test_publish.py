@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""Tests of :py:mod:`fp_covid19.visualization.publish`"""
+import os
+import branca.colormap
+import pandas as pd
+import pytest
+from fp_covid19.data.jhu_csse import JhuCsse
+from fp_covid19.visualization.publish import (
+    MANIFEST_FILE, MapPublisher, chunk_fingerprints)
+
+GEO_JSON = {'type': 'FeatureCollection', 'features': [
+    {'type': 'Feature', 'id': fips, 'properties': {'FIPS': fips},
+     'geometry': {'type': 'Point', 'coordinates': [-86. - i, 32.]}}
+    for i, fips in enumerate(['1001', '1003'])]}
+
+
+def make_colors(num_days, last_color='#0000ff'):
+  """Two counties, one column of colors per day from March 1, 2020"""
+  dates = pd.date_range('2020-03-01', periods=num_days)
+  dataframe = pd.DataFrame(
+      [['#ff0000'] * num_days, ['#00ff00'] * (num_days - 1) + [last_color]],
+      columns=['{}/{}/{}'.format(day.month, day.day, day.year)
+               for day in dates])
+  dataframe.insert(0, 'FIPS', ['1001', '1003'])
+  return JhuCsse(dataframe=dataframe)
+
+
+def mark_page(path):
+  """Appends a comment that survives until the page is rewritten"""
+  with open(path, 'a') as page_file:
+    page_file.write('<!-- published -->')
+
+
+def is_marked(path):
+  with open(path) as page_file:
+    return page_file.read().endswith('<!-- published -->')
+
+
+def inodes(directory):
+  return {name: os.stat(os.path.join(directory, name)).st_ino
+          for name in os.listdir(directory)}
+
+
+@pytest.fixture(name='publisher')
+def fixture_publisher(tmp_path):
+  return MapPublisher(str(tmp_path), chunk_size=3)
+
+
+def test_chunk_fingerprints():
+  fingerprints = chunk_fingerprints(make_colors(7), chunk_size=3)
+  assert len(fingerprints) == 3
+  assert list(fingerprints)[0] == make_colors(1).date_axis.epoch_strings[0]
+  appended = chunk_fingerprints(make_colors(8), chunk_size=3)
+  assert [appended[key] == fingerprints[key] for key in fingerprints] == [
+      True, True, False]
+  recolored = chunk_fingerprints(make_colors(7, '#000000'), chunk_size=3)
+  assert [recolored[key] == fingerprints[key] for key in fingerprints] == [
+      True, True, False]
+  assert chunk_fingerprints(make_colors(7), chunk_size=3) == fingerprints
+
+
+def test_unchanged(publisher, tmp_path):
+  assert publisher.publish('counties', GEO_JSON, make_colors(7)) == 'updated'
+  assert sorted(os.listdir(tmp_path)) == [
+      MANIFEST_FILE, 'counties.html', 'counties_files']
+  files = inodes(tmp_path / 'counties_files')
+  assert sorted(files) == ['_digests.json', 'geometry.json', 'styles_0.json',
+                           'styles_1.json', 'styles_2.json']
+  mark_page(tmp_path / 'counties.html')
+  # A new publisher reads the manifest of the last run
+  publisher = MapPublisher(str(tmp_path), chunk_size=3)
+  assert publisher.publish('counties', GEO_JSON, make_colors(7)) == (
+      'unchanged')
+  assert inodes(tmp_path / 'counties_files') == files
+  assert is_marked(tmp_path / 'counties.html')
+  # Missing outputs are published again
+  os.remove(tmp_path / 'counties.html')
+  assert publisher.publish('counties', GEO_JSON, make_colors(7)) == 'updated'
+
+
+def test_appended_day_rewrites_last_chunk(publisher, tmp_path):
+  publisher.publish('counties', GEO_JSON, make_colors(7))
+  mark_page(tmp_path / 'counties.html')
+  files = inodes(tmp_path / 'counties_files')
+  # The new date changes the slider, so the page is rewritten too
+  assert publisher.publish('counties', GEO_JSON, make_colors(8)) == 'updated'
+  assert not is_marked(tmp_path / 'counties.html')
+  changed = {name for name, inode in inodes(tmp_path / 'counties_files')
+             .items() if files.get(name) != inode}
+  assert changed == {'_digests.json', 'styles_2.json'}
+
+
+def test_recolored_day_rewrites_styles_only(publisher, tmp_path):
+  publisher.publish('counties', GEO_JSON, make_colors(7))
+  mark_page(tmp_path / 'counties.html')
+  files = inodes(tmp_path / 'counties_files')
+  assert publisher.publish(
+      'counties', GEO_JSON, make_colors(7, '#000000')) == 'styles'
+  assert is_marked(tmp_path / 'counties.html')
+  changed = {name for name, inode in inodes(tmp_path / 'counties_files')
+             .items() if files.get(name) != inode}
+  assert changed == {'_digests.json', 'styles_2.json'}
+  with open(tmp_path / 'counties_files' / 'styles_2.json') as styles_file:
+    assert '#000000' in styles_file.read()
+
+
+def test_colormap_change_rewrites_page(publisher, tmp_path):
+  colormap = branca.colormap.LinearColormap(
+      ['#ff0000', '#0000ff'], vmin=0, vmax=1, caption='Cases')
+  publisher.publish('counties', GEO_JSON, make_colors(7), colormap=colormap)
+  mark_page(tmp_path / 'counties.html')
+  files = inodes(tmp_path / 'counties_files')
+  assert publisher.publish(
+      'counties', GEO_JSON, make_colors(7), colormap=colormap) == 'unchanged'
+  colormap = branca.colormap.LinearColormap(
+      ['#ff0000', '#0000ff'], vmin=0, vmax=1, caption='Deaths')
+  assert publisher.publish(
+      'counties', GEO_JSON, make_colors(7), colormap=colormap) == 'updated'
+  assert not is_marked(tmp_path / 'counties.html')
+  with open(tmp_path / 'counties.html') as page_file:
+    assert 'Deaths' in page_file.read()
+  # The colors did not change
+  assert inodes(tmp_path / 'counties_files') == files
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""Tests of :py:mod:`fp_covid19.cases.pyramid`"""
+import numpy as np
+import pytest
+from fp_covid19.cases.pyramid import TemporalPyramid, period_starts
+
+
+@pytest.fixture(name='cumulative')
+def fixture_cumulative(make_bears):
+  daily = np.random.default_rng(0).integers(0, 20, size=(3, 45))
+  # Tue Feb 25 to Thu Apr 9, 2020
+  return make_bears(daily.cumsum(axis=1), start='2020-02-25')
+
+
+def head(bears, num_days):
+  return bears.derive(datetime_index=bears.datetime_index[:num_days])
+
+
+def assert_same_levels(pyramid, expected):
+  for level in ('D', 'W', 'M'):
+    for stat in ('sum', 'mean', 'cumulative'):
+      got, want = pyramid.get(level, stat), expected.get(level, stat)
+      assert got.datetime_index == want.datetime_index, (level, stat)
+      np.testing.assert_allclose(
+          got.df[got.datetime_index].to_numpy(),
+          want.df[want.datetime_index].to_numpy(), err_msg=level + stat)
+
+
+def test_period_starts(cumulative):
+  # Weeks start on Monday, March 2, 9, ...; months on March 1 and April 1
+  assert period_starts(cumulative, 'W').tolist() == [0, 6, 13, 20, 27, 34, 41]
+  assert period_starts(cumulative, 'M').tolist() == [0, 5, 36]
+
+
+def test_levels(cumulative):
+  pyramid = TemporalPyramid(cumulative)
+  values = cumulative.df[cumulative.datetime_index].to_numpy()
+  monthly = pyramid.get('M', 'cumulative')
+  # Labeled by the last observed date of every month
+  assert monthly.datetime_index == ['2/29/2020', '3/31/2020', '4/9/2020']
+  np.testing.assert_array_equal(
+      monthly.df[monthly.datetime_index].to_numpy(), values[:, [4, 35, 44]])
+  sums = pyramid.get('M', 'sum')
+  np.testing.assert_array_equal(
+      sums.df[sums.datetime_index].to_numpy(),
+      np.diff(values[:, [4, 35, 44]], axis=1, prepend=0))
+  means = pyramid.get('W', 'mean')
+  np.testing.assert_allclose(
+      means.df[means.datetime_index].to_numpy()[:, -1],
+      (values[:, 44] - values[:, 40]) / 4)
+  assert pyramid.get('D', 'cumulative').df.equals(cumulative.df)
+  assert list(pyramid.get('W').df.columns[:2]) == ['FIPS', 'Province_State']
+
+
+@pytest.mark.parametrize('num_days', [44, 40, 36, 10])
+def test_update_matches_fresh_build(cumulative, num_days):
+  """Appending within a period and into a new week and month"""
+  pyramid = TemporalPyramid(head(cumulative, num_days))
+  assert pyramid.update(cumulative) == cumulative.datetime_index[num_days:]
+  assert_same_levels(pyramid, TemporalPyramid(cumulative))
+  assert pyramid.update(cumulative) == []
+  assert_same_levels(pyramid, TemporalPyramid(cumulative))
+
+
+def test_update_recomputes_changed_rows(cumulative, make_bears):
+  pyramid = TemporalPyramid(head(cumulative, 40))
+  values = cumulative.df[cumulative.datetime_index].to_numpy()
+  revised = make_bears(values[:2] * 2, start='2020-02-25')
+  assert len(pyramid.update(revised)) == 45
+  assert_same_levels(pyramid, TemporalPyramid(revised))
+
+
+def test_mean_skips_missing_days(make_bears):
+  nan = np.nan
+  # Mon Mar 2 to Sun Mar 15, daily counts
+  bears = make_bears(
+      [[1, 2, 3, nan, nan, nan, nan, 4, 4, 4, 4, 4, 4, 4],
+       [nan] * 7 + [7] * 7], start='2020-03-02')
+  pyramid = TemporalPyramid(bears, levels=['W'], cumulative=False)
+  sums = pyramid.get('W', 'sum')
+  np.testing.assert_array_equal(
+      sums.df[sums.datetime_index].to_numpy(), [[6, 28], [0, 49]])
+  means = pyramid.get('W', 'mean')
+  np.testing.assert_array_equal(
+      means.df[means.datetime_index].to_numpy(), [[2, 4], [nan, 7]])
+  # The same after appending the second week to the first
+  pyramid = TemporalPyramid(head(bears, 9), levels=['W'], cumulative=False)
+  pyramid.update(bears)
+  np.testing.assert_array_equal(
+      pyramid.get('W', 'mean').df[means.datetime_index].to_numpy(),
+      [[2, 4], [nan, 7]])
+
+
+def test_level_for_span(cumulative):
+  pyramid = TemporalPyramid(cumulative)
+  assert pyramid.level_for_span(45) == 'D'
+  assert pyramid.level_for_span(365) == 'W'
+  assert pyramid.level_for_span(365, max_columns=20) == 'M'
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""Tests of :py:mod:`fp_covid19.cases.ranking`"""
+import numpy as np
+import pytest
+from fp_covid19.cases.ranking import (
+    RankingEngine, min_ranks, top_k_positions)
+
+NAN, INF = np.nan, np.inf
+VALUES = np.array([
+    [3., -INF, NAN, 1.],
+    [INF, 2., NAN, 1.],
+    [NAN, -INF, 5., NAN],
+    [3., INF, -INF, 2.],
+    [-1., NAN, INF, INF],
+    [INF, 2., 0., -INF]])
+
+
+@pytest.mark.parametrize('na_option', ['top', 'bottom', 'keep'])
+def test_ranks_match_pandas_with_inf(make_bears, na_option):
+  bears = make_bears(VALUES)
+  engine = RankingEngine(bears, k=2, na_option=na_option)
+  expected = bears.df[bears.datetime_index]
+  np.testing.assert_array_equal(
+      min_ranks(VALUES, na_option),
+      expected.rank(method='min', na_option=na_option).to_numpy())
+  percentiles = engine.percentile_bears()
+  np.testing.assert_allclose(
+      percentiles.df[percentiles.datetime_index].to_numpy(),
+      expected.rank(method='min', na_option=na_option, pct=True).to_numpy())
+
+
+def test_top_and_bottom_k_skip_nan(make_bears):
+  engine = RankingEngine(make_bears(VALUES), k=2)
+  uid = engine.bears.df.index
+  assert engine.top_k()['3/1/2020'].tolist() == [uid[1], uid[5]]
+  assert engine.top_k()['3/3/2020'].tolist() == [uid[4], uid[2]]
+  assert engine.bottom_k()['3/3/2020'].tolist() == [uid[3], uid[5]]
+  assert engine.top_k()['3/4/2020'].tolist() == [uid[4], uid[3]]
+  assert set(engine.bottom_k()['3/2/2020']) == {uid[0], uid[2]}
+  # -inf still ranks above NaN
+  assert top_k_positions(VALUES, 5)[:4, 2].tolist() == [4, 2, 5, 3]
+  assert top_k_positions(VALUES, 5, largest=False)[:4, 2].tolist() == [
+      3, 5, 2, 4]
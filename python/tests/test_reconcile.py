@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""Tests of :py:mod:`fp_covid19.cases.reconcile`"""
+import os
+import numpy as np
+import pytest
+from fp_covid19.cases import reconcile
+from fp_covid19.data import jhu_csse, usafacts
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+@pytest.fixture(name='sources')
+def fixture_sources():
+  jhu = jhu_csse.get_covid19_us_bears(
+      url_root=os.path.join(DATA_DIR, 'jhu_csse', ''))
+  facts = usafacts.get_covid19_us_bears(
+      url_root=os.path.join(DATA_DIR, 'usafacts', ''))
+  return jhu['confirmed']['counties'], facts['confirmed']['counties']
+
+
+def test_canonical_fips():
+  assert reconcile.canonical_fips(
+      ['06037', '6037', 6037., None, 'x']).tolist() == [
+          6037, 6037, 6037, -1, -1]
+
+
+def test_align(sources):
+  alignment = reconcile.align(*sources)
+  # Kansas City has no FIPS; the unallocated and Baldwin rows are only in
+  # USAFacts
+  assert alignment.fips.tolist() == [1001, 29095]
+  # USAFacts ends two days earlier
+  assert alignment.datetime_index == ['3/1/2020', '3/2/2020', '3/3/2020']
+  values_a, values_b = reconcile.aligned_values(*sources, alignment)
+  np.testing.assert_array_equal(values_a, [[0, 1, 2], [1, 3, 5]])
+  np.testing.assert_array_equal(values_a, values_b)
+
+
+def test_reconcile_ranks_and_blends(sources):
+  jhu, facts = sources[0].copy(deep=True), sources[1].copy(deep=True)
+  jhu.df.loc[jhu.df['FIPS'] == '1001', '3/1/2020'] = np.nan
+  facts.df.loc[facts.df['FIPS'] == '1001', '3/2/2020'] = 2
+  facts.df.loc[facts.df['FIPS'] == '29095', '3/3/2020'] = np.nan
+  facts.df.loc[facts.df['FIPS'] == '29095', '3/2/2020'] = 7
+  report = reconcile.reconcile(jhu, facts, blend_weight=.25)
+
+  regions = report['regions']
+  assert regions['FIPS'].tolist() == ['29095', '1001']
+  assert regions['Combined_Key'].tolist() == [
+      'Jackson, Missouri, US', 'Autauga, Alabama, US']
+  assert regions['max_abs_diff'].tolist() == [4., 1.]
+  assert regions['max_abs_diff_date'].tolist() == ['3/2/2020', '3/2/2020']
+  # Days where either source is NaN do not count
+  assert regions['mean_abs_diff'].tolist() == [2., .5]
+  assert regions['max_rel_diff'].tolist() == [4 / 7, .5]
+
+  days = report['days']
+  assert days['total_jhu_csse'].tolist() == [1., 4., 7.]
+  assert days['total_usafacts'].tolist() == [1., 9., 2.]
+  assert days['regions_disagreeing'].tolist() == [0, 2, 0]
+
+  blended = report['blended']
+  assert blended.df['FIPS'].tolist() == ['1001', '29095']
+  np.testing.assert_allclose(
+      blended.df[blended.datetime_index].to_numpy(),
+      # NaN on one side falls back to the other source
+      [[0., .25 * 1 + .75 * 2, 2.],
+       [1., .25 * 3 + .75 * 7, 5.]])
+
+
+def test_reconcile_without_blend(sources):
+  alignment = reconcile.align(*sources)
+  report = reconcile.reconcile(*sources, alignment=alignment)
+  assert report['blended'] is None
+  assert (report['regions']['max_abs_diff'] == 0).all()
+  assert report['days']['total_rel_diff'].tolist() == [0., 0., 0.]
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""Tests of :py:mod:`fp_covid19.visualization.search`"""
+import json
+import folium
+import numpy as np
+from fp_covid19.visualization.search import Search, search_index
+
+LABELED_BOUNDS = [
+    ('Kings', [40.5, -74.1, 40.7, -73.8]),
+    ('King', [47.1, -122.5, 47.8, -121.0]),
+    ('Queens', [40.5, -73.9, 40.8, -73.7]),
+    ('Kingsbury', [39.1, -86.3, 39.4, -86.0]),
+    ('King', [47.0, -122.6, 47.5, -121.2]),
+    ('Ki', [1., 2., 3., 4.]),
+    (None, [0., 0., 1., 1.]),
+    ('Nowhere', None),
+]
+
+
+def decode(gaps):
+  """Positions from gap-encoded postings, as in the page script"""
+  return np.cumsum(gaps or [], dtype=int).tolist()
+
+
+def lookup(index, text, initial=True):
+  """Python port of the page script lookup"""
+  query = text.lower()
+  if len(query) < index['gram']:
+    candidates = decode(index['prefixes'].get(query))
+  else:
+    postings = sorted(
+        (decode(index['grams'].get(query[i:i + index['gram']]))
+         for i in range(len(query) - index['gram'] + 1)), key=len)
+    candidates = postings[0]
+    for posting in postings[1:]:
+      candidates = sorted(set(candidates) & set(posting))
+  labels = [index['labels'][position] for position in candidates]
+  return [label for label in labels
+          if label.lower().find(query) == 0
+          or (label.lower().find(query) > 0 and not initial)]
+
+
+def test_labels_and_bounds():
+  index = search_index(LABELED_BOUNDS)
+  assert index['gram'] == 3
+  assert index['labels'] == ['Ki', 'King', 'Kings', 'Kingsbury', 'Queens']
+  bounds = np.reshape(index['bounds'], (-1, 4))
+  # Repeated labels merge their bounds
+  assert bounds[1].tolist() == [47.0, -122.6, 47.8, -121.0]
+  assert bounds[3].tolist() == [39.1, -86.3, 39.4, -86.0]
+
+
+def test_gap_encoding():
+  index = search_index(LABELED_BOUNDS)
+  assert index['prefixes']['k'] == [0, 1, 1, 1]
+  assert decode(index['prefixes']['ki']) == [0, 1, 2, 3]
+  assert decode(index['prefixes']['q']) == [4]
+  assert index['grams']['kin'] == [1, 1, 1]
+  assert decode(index['grams']['kin']) == [1, 2, 3]
+  assert decode(index['grams']['ngs']) == [2, 3]
+  assert decode(index['grams']['ens']) == [4]
+  # Prefixes are shorter than the n-grams, so 'Ki' is only in the prefixes
+  assert all(len(key) < 3 for key in index['prefixes'])
+  assert all(len(key) == 3 for key in index['grams'])
+  assert 0 not in sum((decode(gaps) for gaps in index['grams'].values()), [])
+
+
+def test_lookup():
+  index = json.loads(json.dumps(search_index(LABELED_BOUNDS)))
+  assert lookup(index, 'K') == ['Ki', 'King', 'Kings', 'Kingsbury']
+  assert lookup(index, 'ki') == ['Ki', 'King', 'Kings', 'Kingsbury']
+  assert lookup(index, 'KINGS') == ['Kings', 'Kingsbury']
+  assert lookup(index, 'ngs') == []
+  assert lookup(index, 'ngs', initial=False) == ['Kings', 'Kingsbury']
+  # Every n-gram matches but the substring does not
+  assert lookup(index, 'kingsqueens') == []
+  assert lookup(index, 'x') == []
+  assert lookup(index, 'xyz') == []
+
+
+def test_gram_size():
+  index = search_index(LABELED_BOUNDS, gram=2, precision=0)
+  assert set(index['prefixes']) == {'k', 'q'}
+  assert decode(index['grams']['ki']) == [0, 1, 2, 3]
+  assert index['bounds'][:4] == [1., 2., 3., 4.]
+
+
+def test_geojson_index_file(tmp_path):
+  geo_json = {'type': 'FeatureCollection', 'features': [
+      {'type': 'Feature', 'properties': {'name': 'Kings'},
+       'geometry': {'type': 'Polygon', 'coordinates': [
+           [[-74.1, 40.5], [-73.8, 40.5], [-73.8, 40.7], [-74.1, 40.5]]]}},
+      {'type': 'Feature', 'properties': {'name': 'Queens'},
+       'geometry': {'type': 'Point', 'coordinates': [-73.8, 40.7]}}]}
+  layer = folium.GeoJson(geo_json)
+  search = Search(layer, search_label='name', geom_type='Polygon',
+                  search_index_file=str(tmp_path / 'index.json'))
+  folium.Map().add_child(layer).add_child(search)
+  html = search.get_root().render()
+  assert 'fetch("index.json")' in html
+  with open(tmp_path / 'index.json') as index_file:
+    index = json.load(index_file)
+  assert index['labels'] == ['Kings', 'Queens']
+  assert index['bounds'] == [40.5, -74.1, 40.7, -73.8,
+                             40.7, -73.8, 40.7, -73.8]
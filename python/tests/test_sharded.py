@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""Tests of :py:mod:`fp_covid19.cases.sharded`"""
+import os
+import numpy as np
+import pytest
+from fp_covid19.cases.compute import new_cases
+from fp_covid19.cases.sharded import map_shards, shard_positions
+
+STATES = ['Alabama', 'Alaska', 'Alabama', 'Arizona', 'Alaska', 'Arizona']
+
+
+def _fail_in_alabama(bears):
+  assert 'Alabama' not in bears.df['Province_State'].tolist(), 'Alabama'
+  return {'doubled': bears.derive(2 * bears.df[bears.datetime_index])}
+
+
+def _shared_blocks():
+  return set(os.listdir('/dev/shm')) if os.path.isdir('/dev/shm') else set()
+
+
+def test_shards_keep_states_together(make_bears):
+  bears = make_bears(np.zeros((6, 2)), states=STATES)
+  shards = shard_positions(bears, num_shards=2)
+  assert sorted(np.concatenate(shards).tolist()) == list(range(6))
+  for positions in shards:
+    states = set(bears.df['Province_State'].iloc[positions])
+    assert all(
+        set(np.flatnonzero(bears.df['Province_State'].isin([state])))
+        <= set(positions) for state in states)
+
+
+@pytest.mark.parametrize('max_workers', [1, 2])
+def test_matches_unsharded(make_bears, max_workers):
+  values = np.cumsum(np.arange(24).reshape(6, 4) % 5, axis=1)
+  bears = make_bears(values, states=STATES)
+  sharded = map_shards(
+      new_cases, bears, num_shards=3, max_workers=max_workers)
+  expected = new_cases(bears)
+  assert sharded.df.index.equals(expected.df.index)
+  np.testing.assert_array_equal(
+      sharded.df[sharded.datetime_index].to_numpy(),
+      expected.df[expected.datetime_index].to_numpy())
+
+
+@pytest.mark.parametrize('max_workers', [1, 2])
+def test_failing_shard_frees_result_blocks(make_bears, max_workers):
+  bears = make_bears(np.ones((6, 3)), states=STATES)
+  before = _shared_blocks()
+  with pytest.raises(AssertionError, match='Alabama'):
+    map_shards(_fail_in_alabama, bears, num_shards=3,
+               max_workers=max_workers)
+  assert _shared_blocks() <= before
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""Tests of :py:mod:`fp_covid19.data.shared`"""
+import gc
+import os
+import subprocess
+import sys
+import textwrap
+import uuid
+import numpy as np
+import pytest
+from fp_covid19.data.shared import SharedPublisher, SharedReader
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def publisher():
+  publisher = SharedPublisher('fp_test_' + uuid.uuid4().hex[:8])
+  yield publisher
+  publisher.close()
+
+
+def test_reader_sees_published_bears(make_bears, publisher):
+  counties = make_bears([[1, 2, 3], [4, 5, 6]])
+  reader = SharedReader(publisher.name)
+  assert reader.snapshot() is None
+  publisher.publish({'confirmed': {'counties': counties}},
+                    info={'note': 'first'})
+  snapshot = reader.snapshot()
+  shared = snapshot.bears('confirmed', 'counties')
+  assert snapshot.version == 1
+  assert snapshot.info == {'note': 'first'}
+  assert shared.datetime_index == counties.datetime_index
+  assert shared.df['FIPS'].tolist() == counties.df['FIPS'].tolist()
+  values = shared.df[shared.datetime_index].to_numpy()
+  np.testing.assert_array_equal(values, [[1, 2, 3], [4, 5, 6]])
+  assert not values.flags.writeable
+  assert reader.snapshot() is snapshot
+  reader.close()
+
+
+def test_old_bears_stay_readable_after_republishing(make_bears, publisher):
+  reader = SharedReader(publisher.name)
+  publisher.publish({'confirmed': {'counties': make_bears([[1, 2, 3]])}})
+  old = reader.snapshot().bears('confirmed', 'counties')
+  publisher.publish({'confirmed': {'counties': make_bears([[7, 8]])}})
+  new = reader.snapshot().bears('confirmed', 'counties')
+  gc.collect()
+  assert reader.versions_in_use == [1, 2]
+  np.testing.assert_array_equal(
+      old.df[old.datetime_index].to_numpy(), [[1, 2, 3]])
+  np.testing.assert_array_equal(
+      new.df[new.datetime_index].to_numpy(), [[7, 8]])
+
+  del old
+  gc.collect()
+  assert reader.versions_in_use == [2]
+  reader.close()
+  np.testing.assert_array_equal(
+      new.df[new.datetime_index].to_numpy(), [[7, 8]])
+
+
+def test_reader_exits_cleanly_with_a_live_snapshot(make_bears, publisher):
+  publisher.publish({'confirmed': {'counties': make_bears([[1, 2]])}})
+  script = textwrap.dedent('''
+      from fp_covid19.data.shared import SharedReader
+      reader = SharedReader({!r})
+      counties = reader.snapshot().bears('confirmed', 'counties')
+      print(counties.df[counties.datetime_index].to_numpy().sum())
+      ''').format(publisher.name)
+  result = subprocess.run(
+      [sys.executable, '-c', script], cwd=PYTHON_DIR, capture_output=True,
+      text=True, check=True)
+  assert result.stdout.strip() == '3.0'
+  assert 'Error' not in result.stderr
+  # The block of the publisher survived the exit of the reader
+  assert SharedReader(publisher.name).snapshot().version == 1
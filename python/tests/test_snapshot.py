@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""Tests of :py:mod:`fp_covid19.data.snapshot`"""
+import threading
+import pytest
+from fp_covid19.data.snapshot import Snapshot, SnapshotStore
+
+
+def test_snapshot_hands_out_private_copies(make_bears):
+  counties = make_bears([[1, 2], [3, 4]])
+  snapshot = Snapshot({'confirmed': {'counties': counties}}, version=3,
+                      info={'source': 'test'})
+  counties.df.loc[:, '3/2/2020'] = 0
+  copy = snapshot.bears('confirmed', 'counties')
+  assert copy.df['3/2/2020'].tolist() == [2, 4]
+  copy.df.loc[:, '3/1/2020'] = -1
+  assert snapshot['confirmed']['counties'].df['3/1/2020'].tolist() == [1, 3]
+  assert snapshot.version == 3 and snapshot.info == {'source': 'test'}
+  assert list(snapshot) == ['confirmed']
+  with pytest.raises(AttributeError, match='immutable'):
+    snapshot.version = 4
+
+
+def test_store_refreshes_in_the_background(make_bears):
+  release = threading.Event()
+  loads = []
+
+  def loader():
+    release.wait(10)
+    loads.append(len(loads))
+    return {'confirmed': {'counties': make_bears([[len(loads)]])}}
+  store = SnapshotStore(loader, initial={})
+  assert store.current.version == 0
+  first, second = store.refresh(), store.refresh()
+  assert first is second # Joins the running refresh
+  assert store.current.version == 0
+  release.set()
+  snapshot = first.result()
+  assert snapshot is store.current and snapshot.version == 1
+  assert loads == [0]
+  store.close()
+
+
+def test_failed_refresh_keeps_the_current_snapshot(make_bears):
+  def loader():
+    raise IOError('offline')
+  store = SnapshotStore(
+      loader, initial={'confirmed': {'counties': make_bears([[1]])}})
+  with pytest.raises(IOError, match='offline'):
+    store.refresh().result()
+  assert store.current.version == 0
+  store.close()
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""Tests of :py:mod:`fp_covid19.visualization.static_map`"""
+import os
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+from PIL import Image
+from shapely.geometry import box
+from fp_covid19.data.jhu_csse import JhuCsse
+from fp_covid19.visualization.static_map import (
+    StaticChoropleth, parse_colors)
+
+RED, GREEN, BLUE = (255, 0, 0, 255), (0, 255, 0, 255), (0, 0, 255, 255)
+WHITE, CLEAR = (255, 255, 255, 255), (0, 0, 0, 0)
+
+
+@pytest.fixture(name='renderer')
+def fixture_renderer():
+  # Two 10 x 10 squares side by side, one pixel per unit, two pixels
+  # from the image edges
+  gdf = gpd.GeoDataFrame(
+      {'id': ['1001', '1003']},
+      geometry=[box(0, 0, 10, 10), box(10, 0, 20, 10)])
+  return StaticChoropleth(
+      gdf, width=25, crs=None, bounds=(-2, -2, 22, 12),
+      background='#00000000')
+
+
+@pytest.fixture(name='colors')
+def fixture_colors():
+  dataframe = pd.DataFrame(
+      [['#ff0000', '#ff0000', '#0000ff'],
+       ['#00ff00', None, '#00ff00'],
+       ['#0000ff', '#0000ff', '#0000ff']],
+      columns=['3/1/2020', '3/2/2020', '3/3/2020'])
+  # 1005 has no geometry
+  dataframe.insert(0, 'FIPS', ['1001', '1003', '1005'])
+  return JhuCsse(dataframe=dataframe)
+
+
+def rgba(image, x, y):
+  return image.convert('RGBA').getpixel((x, y))
+
+
+def left(image):
+  return rgba(image, 6, 7)
+
+
+def right(image):
+  return rgba(image, 18, 7)
+
+
+def right_colors(paths):
+  """Color of the right square in every cached PNG"""
+  colors = {}
+  for date, path in paths.items():
+    with Image.open(path) as image:
+      colors[date] = right(image)
+  return colors
+
+
+def test_parse_colors():
+  palette, codes = parse_colors(
+      np.array([['#ff0000', None], ['#0000ff', '#ff0000']], dtype=object))
+  assert palette.tolist() == [list(CLEAR), list(BLUE), list(RED)]
+  assert codes.tolist() == [[2, 0], [1, 2]]
+
+
+def test_labels(renderer):
+  assert (renderer.width, renderer.height) == (25, 15)
+  assert renderer.labels[0, 0] == 0
+  assert renderer.labels[7, 6] == 1
+  assert renderer.labels[7, 18] == 2
+  # Borders between the squares and around them
+  assert renderer.labels[7, 13] == 3
+  assert renderer.labels[2, 6] == 3
+
+
+def test_render(renderer, colors):
+  image = renderer.render(colors, '3/1/2020')
+  assert image.mode == 'P'
+  assert image.size == (25, 15)
+  assert left(image) == RED
+  assert right(image) == GREEN
+  assert rgba(image, 13, 7) == WHITE
+  assert rgba(image, 0, 0) == CLEAR
+  # Missing colors are the background
+  image = renderer.render(colors, '3/2/2020')
+  assert left(image) == RED
+  assert right(image) == CLEAR
+  # The latest date by default
+  assert left(renderer.render(colors)) == BLUE
+
+
+def test_palette_codes(renderer, colors):
+  palette, lookup = renderer.palette_codes(colors)
+  assert lookup.shape == (4, 3)
+  # Outside every region, and on the borders, on every day
+  assert {tuple(palette[code]) for code in lookup[0]} == {CLEAR}
+  assert {tuple(palette[code]) for code in lookup[-1]} == {WHITE}
+  assert [tuple(palette[code]) for code in lookup[1]] == [RED, RED, BLUE]
+
+
+def test_render_days_cache(renderer, colors, tmp_path):
+  cache_dir = str(tmp_path)
+  paths = renderer.render_days(colors, cache_dir, version='v1')
+  assert sorted(paths) == ['3/1/2020', '3/2/2020', '3/3/2020']
+  assert paths['3/1/2020'] == os.path.join(
+      cache_dir, 'v1-' + renderer.fingerprint, '2020-03-01.png')
+  assert right_colors(paths) == {
+      '3/1/2020': GREEN, '3/2/2020': CLEAR, '3/3/2020': GREEN}
+
+  # Cached days of the same version are not rendered again, even if the
+  # colors changed
+  recolored = colors.copy(deep=True)
+  recolored.df.loc[1, recolored.datetime_index] = '#ff0000'
+  assert renderer.render_days(recolored, cache_dir, version='v1') == paths
+  assert right_colors(paths) == {
+      '3/1/2020': GREEN, '3/2/2020': CLEAR, '3/3/2020': GREEN}
+
+  # Only a deleted day is rendered
+  os.remove(paths['3/2/2020'])
+  renderer.render_days(recolored, cache_dir, version='v1')
+  assert right_colors(paths) == {
+      '3/1/2020': GREEN, '3/2/2020': RED, '3/3/2020': GREEN}
+
+  # A new version or overwrite renders the new colors
+  new_paths = renderer.render_days(
+      recolored, cache_dir, version='v2', dates=['3/3/2020'])
+  assert list(new_paths) == ['3/3/2020']
+  with Image.open(new_paths['3/3/2020']) as image:
+    assert right(image) == RED
+  renderer.render_days(
+      recolored, cache_dir, version='v1', dates=['3/3/2020'], overwrite=True)
+  with Image.open(paths['3/3/2020']) as image:
+    assert right(image) == RED
+  assert not [name for name in os.listdir(os.path.dirname(paths['3/1/2020']))
+              if name.endswith('.tmp')]
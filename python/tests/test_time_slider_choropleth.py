@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""Tests of :py:mod:`fp_covid19.visualization.time_slider_choropleth`"""
+import json
+import os
+import folium
+import pytest
+from fp_covid19.visualization.time_slider_choropleth import (
+    TimeSliderChoropleth)
+
+GEO_JSON = {'type': 'FeatureCollection', 'features': [
+    {'type': 'Feature', 'id': feature_id, 'properties': {},
+     'geometry': {'type': 'Point', 'coordinates': [-86. - i, 32.]}}
+    for i, feature_id in enumerate(['1001', '1003'])]}
+
+
+def make_styledict(num_days, last_color='#0000ff'):
+  """Feature `'1003'` has no style on the first day"""
+  epochs = [str(1583020800 + 86400 * day) for day in range(num_days)]
+  return {
+      '1001': {epoch: {'color': '#ff0000', 'opacity': .7}
+               for epoch in epochs},
+      '1003': {epoch: {'color': last_color if i == num_days - 1
+                       else '#00ff00', 'opacity': .7}
+               for i, epoch in enumerate(epochs) if i}}
+
+
+def inodes(directory):
+  return {name: os.stat(os.path.join(directory, name)).st_ino
+          for name in os.listdir(directory)}
+
+
+def test_style_chunks():
+  slider = TimeSliderChoropleth(GEO_JSON, make_styledict(7), chunk_size=3)
+  chunks = slider.style_chunks()
+  assert [sorted(chunk) for chunk in chunks] == [
+      ['1001', '1003'], ['1001', '1003'], ['1001', '1003']]
+  assert [len(chunk['1001']) for chunk in chunks] == [3, 3, 1]
+  assert list(chunks[0]['1003']) == slider.timestamps[1:3]
+  assert list(chunks[2]['1001']) == slider.timestamps[6:]
+  # Every style is in exactly one chunk
+  merged = {}
+  for chunk in chunks:
+    for feature_id, styles in chunk.items():
+      merged.setdefault(feature_id, {}).update(styles)
+  assert merged == slider.styledict
+  assert len(TimeSliderChoropleth(
+      GEO_JSON, make_styledict(6), chunk_size=3).style_chunks()) == 2
+  with pytest.raises(AssertionError, match='chunk_size'):
+    TimeSliderChoropleth(GEO_JSON, make_styledict(6), chunk_size=0)
+
+
+def test_write_sidecar_files(tmp_path):
+  directory = str(tmp_path / 'counties_files')
+  slider = TimeSliderChoropleth(
+      GEO_JSON, make_styledict(7), sidecar_dir=directory, chunk_size=3)
+  written = slider.write_sidecar_files()
+  assert sorted(os.path.basename(path) for path in written) == [
+      'geometry.json', 'styles_0.json', 'styles_1.json', 'styles_2.json']
+  with open(os.path.join(directory, 'styles_1.json')) as styles_file:
+    assert json.load(styles_file) == slider.style_chunks()[1]
+  with open(os.path.join(directory, '_digests.json')) as digests_file:
+    assert sorted(json.load(digests_file)) == [
+        'geometry.json', 'styles_0.json', 'styles_1.json', 'styles_2.json']
+  files = inodes(directory)
+  # Nothing changed
+  assert slider.write_sidecar_files() == []
+  assert inodes(directory) == files
+
+  # An appended day only changes the last chunk
+  slider = TimeSliderChoropleth(
+      GEO_JSON, make_styledict(8), sidecar_dir=directory, chunk_size=3)
+  assert slider.write_sidecar_files() == [
+      os.path.join(directory, 'styles_2.json')]
+  changed = {name for name, inode in inodes(directory).items()
+             if files[name] != inode}
+  assert changed == {'_digests.json', 'styles_2.json'}
+
+  # A deleted file is rewritten even though its digest is recorded
+  os.remove(os.path.join(directory, 'styles_0.json'))
+  assert slider.write_sidecar_files() == [
+      os.path.join(directory, 'styles_0.json')]
+
+  # Chunks past the last one are deleted
+  slider = TimeSliderChoropleth(
+      GEO_JSON, make_styledict(5), sidecar_dir=directory, chunk_size=3)
+  assert slider.write_sidecar_files() == [
+      os.path.join(directory, 'styles_1.json')]
+  assert sorted(os.listdir(directory)) == [
+      '_digests.json', 'geometry.json', 'styles_0.json', 'styles_1.json']
+
+
+def test_render_writes_sidecar_files(tmp_path):
+  directory = str(tmp_path / 'counties_files')
+  slider = TimeSliderChoropleth(
+      GEO_JSON, make_styledict(7), sidecar_dir=directory, chunk_size=3,
+      init_timestamp_index=-1)
+  folium_map = folium.Map()
+  slider.add_to(folium_map)
+  folium_map.save(str(tmp_path / 'counties.html'))
+  with open(tmp_path / 'counties.html') as page_file:
+    page = page_file.read()
+  assert '"counties_files"' in page
+  assert '#00ff00' not in page
+  assert len(os.listdir(directory)) == 5
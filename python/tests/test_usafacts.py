@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+"""Tests of :py:mod:`fp_covid19.data.usafacts`"""
+import os
+from fp_covid19.data import usafacts
+
+URL_ROOT = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'data', 'usafacts', '')
+
+
+def test_counties_and_states():
+  covid19 = usafacts.get_covid19_us_bears(url_root=URL_ROOT)
+  counties = covid19['confirmed']['counties']
+  assert counties.df['FIPS'].tolist() == [
+      '1000', '1001', '1003', '29000', '29095']
+  assert counties.df['Province_State'].tolist() == [
+      'Alabama', 'Alabama', 'Alabama', 'Missouri', 'Missouri']
+  states = covid19['confirmed']['states']
+  assert states.df.loc['Alabama', '3/3/2020'] == 7
+  assert states.df.loc['Missouri', '3/3/2020'] == 6
+
+
+def test_population():
+  population = usafacts.get_us_population(url_root=URL_ROOT)
+  assert population['counties']['Province_State'].unique().tolist() == [
+      'Alabama', 'Missouri']
+  assert population['states'].loc['Alabama', 'Population'] == 279103
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""Tests of :py:mod:`fp_covid19.data.validation`"""
+import os
+import warnings
+import pytest
+from fp_covid19.data import jhu_csse, usafacts, validation
+from fp_covid19.data.validation import (
+    US_COUNTIES_SCHEMA, Schema, assert_valid, validate)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+def test_jhu_loader_keeps_rows_without_fips():
+  with warnings.catch_warnings():
+    warnings.simplefilter('error')
+    covid19 = jhu_csse.get_covid19_us_bears(
+        url_root=os.path.join(DATA_DIR, 'jhu_csse', ''))
+  counties = covid19['confirmed']['counties']
+  assert counties.df['FIPS'].tolist()[:2] == ['1001', '29095']
+  assert counties.df['FIPS'].isna().tolist() == [False, False, True]
+  # Kansas City counts at the state level
+  assert covid19['confirmed']['states'].df.loc[
+      'Missouri', '3/5/2020'] == 24
+
+  report = validate(counties, US_COUNTIES_SCHEMA)
+  assert report.ok
+  assert [v.check for v in report.warnings] == ['fips_missing']
+  assert report.warnings[0].samples == ['Kansas City, Missouri, US']
+
+
+def test_malformed_and_duplicate_fips(make_bears):
+  bears = make_bears([[1, 2], [3, 4], [5, 6]], fips=['1001', '01003', '1001'])
+  report = validate(bears, Schema(fips_col='FIPS'))
+  assert [(v.check, v.count) for v in report.violations] == [
+      ('fips', 1), ('fips_duplicate', 2)]
+  with pytest.raises(AssertionError, match='malformed FIPS'):
+    assert_valid(bears, Schema(fips_col='FIPS'))
+
+
+def test_cell_checks(make_bears):
+  bears = make_bears([[1, 3, 2], [0, float('nan'), -1]])
+  report = validate(bears, Schema())
+  assert report.ok
+  assert {v.check: v.count for v in report.warnings} == {
+      'missing': 1, 'negative': 1, 'decreasing': 1}
+  with warnings.catch_warnings():
+    warnings.simplefilter('error')
+    assert_valid(bears, Schema())
+  with pytest.warns(UserWarning, match='decreasing'):
+    assert_valid(bears, Schema(), warn=True)
+
+
+def test_irregular_dates_are_errors(make_bears):
+  bears = make_bears([[1, 2, 3]])
+  bears = bears.derive(datetime_index=[
+      bears.datetime_index[0], bears.datetime_index[2]])
+  report = validate(bears, Schema())
+  assert [v.check for v in report.errors] == ['dates']
+
+
+def _recorded_reports(monkeypatch, module):
+  reports = []
+  def recording_assert_valid(*args, **kwargs):
+    reports.append(validation.assert_valid(*args, **kwargs))
+    return reports[-1]
+  monkeypatch.setattr(module, 'assert_valid', recording_assert_valid)
+  return reports
+
+
+def test_loaders_check_population(monkeypatch):
+  reports = _recorded_reports(monkeypatch, jhu_csse)
+  jhu_csse.get_covid19_us_bears(
+      url_root=os.path.join(DATA_DIR, 'jhu_csse', ''))
+  # Kansas City has neither FIPS nor population
+  assert [(v.check, v.count) for v in reports[0].warnings] == [
+      ('fips_missing', 1), ('population', 1)]
+  assert len(reports) == 2
+
+  reports = _recorded_reports(monkeypatch, usafacts)
+  usafacts.get_covid19_us_bears(
+      url_root=os.path.join(DATA_DIR, 'usafacts', ''))
+  # The two statewide unallocated rows
+  assert [(v.check, v.count) for v in reports[0].warnings] == [
+      ('population', 2)]
+
+  reports = _recorded_reports(monkeypatch, jhu_csse)
+  jhu_csse.get_covid19_global_bears(
+      url_root=os.path.join(DATA_DIR, 'jhu_csse', ''),
+      geo_df=jhu_csse.get_geo_df(url=os.path.join(
+          DATA_DIR, 'jhu_csse', 'UID_ISO_FIPS_LookUp_Table.csv')))
+  assert len(reports) == 3
+  assert all(report.ok and not report.warnings for report in reports)